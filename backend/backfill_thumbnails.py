@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+缩略图回填脚本
+为 uploads 目录中已有的图片生成缩略图（新上传的图片会自动生成）
+
+生成的缩略图写入 image_thumbnails 表；已有清单文件但还没有记录的图片（旧版本生成的缩略图）直接补写记录
+
+用法：
+    python backfill_thumbnails.py            # 只处理还没有缩略图的图片
+    python backfill_thumbnails.py --force    # 全部重新生成（例如修改了 THUMBNAIL_SIZES，之后需重启服务）
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import select
+from config import settings
+from database import SessionLocal
+from database.models import ImageThumbnail
+from utils.image_store import image_store
+from utils.thumbnails import Image, manifest_path, parse_sizes, render_thumbnails
+
+def record(db, image_name: str, variants: dict):
+    db.merge(ImageThumbnail(image_path=image_name, variants=json.dumps(variants)))
+
+def main():
+    parser = argparse.ArgumentParser(description="为已上传的图片生成缩略图")
+    parser.add_argument("--force", action="store_true", help="重新生成已有的缩略图")
+    parser.add_argument("--workers", type=int, default=settings.THUMBNAIL_WORKERS, help="进程数")
+    args = parser.parse_args()
+
+    if Image is None:
+        print("✗ 未安装 Pillow，请先执行 pip install -r requirements.txt")
+        return
+
+    sizes = parse_sizes(settings.THUMBNAIL_SIZES)
+    images = sorted(image_store.iter_images())
+    db = SessionLocal()
+    if not args.force:
+        recorded = set(db.execute(select(ImageThumbnail.image_path)).scalars())
+        pending = []
+        backfilled = 0
+        for path in images:
+            manifest = manifest_path(image_store.thumb_dir(path.name), path.name)
+            if not manifest.exists():
+                pending.append(path)
+            elif path.name not in recorded:
+                with open(manifest, encoding="utf-8") as f:
+                    record(db, path.name, json.load(f)["variants"])
+                backfilled += 1
+        db.commit()
+        if backfilled:
+            print(f"✓ 已有缩略图补写记录 {backfilled} 张")
+        images = pending
+
+    print(f"待处理图片 {len(images)} 张，缩略图尺寸 {sizes}，进程数 {args.workers}")
+    start = time.perf_counter()
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(render_thumbnails, str(path), str(image_store.thumb_dir(path.name)), sizes): path
+            for path in images
+        }
+        for future in as_completed(futures):
+            try:
+                record(db, futures[future].name, future.result())
+                done += 1
+            except Exception as e:
+                failed += 1
+                print(f"✗ {futures[future].name}: {e}")
+            if (done + failed) % 100 == 0:
+                db.commit()
+                print(f"已处理 {done + failed}/{len(images)}")
+    db.commit()
+    db.close()
+
+    print(f"✓ 完成：成功 {done} 张，失败 {failed} 张，用时 {time.perf_counter() - start:.1f} 秒")
+
+if __name__ == "__main__":
+    main()
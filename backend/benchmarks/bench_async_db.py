@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+数据库访问方式并发吞吐对比
+
+在同一个 FastAPI 应用中分别用同步会话（改造前的 SessionLocal）和异步会话
+（AsyncSessionLocal）执行一条耗时查询，并发请求后比较吞吐量。
+同步会话会阻塞事件循环，并发请求只能排队执行。
+
+用法：
+    python benchmarks/bench_async_db.py                 # 使用临时 SQLite 文件
+    python benchmarks/bench_async_db.py --mysql         # 使用 config.py 中的 MySQL
+    python benchmarks/bench_async_db.py -n 400 -c 50 --delay 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="同步/异步数据库会话并发吞吐对比")
+    parser.add_argument("-n", "--requests", type=int, default=200, help="每种方式的请求总数")
+    parser.add_argument("-c", "--concurrency", type=int, default=50, help="并发数")
+    parser.add_argument("--delay", type=float, default=0.02, help="模拟的单条查询耗时（秒）")
+    parser.add_argument("--mysql", action="store_true", help="使用 MySQL 而不是临时 SQLite 文件")
+    return parser.parse_args()
+
+async def run(path: str, client, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+async def main():
+    args = parse_args()
+    if not args.mysql:
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    import httpx
+    from fastapi import FastAPI
+    from sqlalchemy import event, text
+    from database import engine, async_engine, SessionLocal, AsyncSessionLocal, IS_MYSQL
+
+    if not IS_MYSQL:
+        # SQLite 没有 SLEEP()，注册一个同名函数模拟慢查询
+        @event.listens_for(engine, "connect")
+        @event.listens_for(async_engine.sync_engine, "connect")
+        def register_sleep(dbapi_connection, connection_record):
+            dbapi_connection.create_function("SLEEP", 1, lambda seconds: time.sleep(seconds) or 0)
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_query():
+        db = SessionLocal()
+        try:
+            db.execute(text("SELECT SLEEP(:delay)"), {"delay": args.delay})
+        finally:
+            db.close()
+        return {}
+
+    @app.get("/async")
+    async def async_query():
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT SLEEP(:delay)"), {"delay": args.delay})
+        return {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热连接池
+        await run("/sync", client, 5, 5)
+        await run("/async", client, 5, 5)
+
+        print(f"请求数 {args.requests}，并发 {args.concurrency}，单条查询 {args.delay * 1000:.0f}ms，"
+              f"数据库 {'MySQL' if IS_MYSQL else 'SQLite'}")
+        results = {}
+        for name, path in (("同步会话（改造前）", "/sync"), ("异步会话（改造后）", "/async")):
+            elapsed = await run(path, client, args.requests, args.concurrency)
+            results[path] = args.requests / elapsed
+            print(f"  {name}: {elapsed:.2f}s，{results[path]:.1f} req/s")
+        print(f"  吞吐提升: {results['/async'] / results['/sync']:.1f}x")
+
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
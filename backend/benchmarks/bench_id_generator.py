@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+ID 生成器测试：多进程同时生成用户/商品/交易 ID
+
+检查点：
+- 各进程通过数据库租约分到不同的 worker id，生成的 ID 全部唯一，长度与主键列一致
+- 同一进程内生成的 ID 严格递增
+- 时钟回拨时 ID 仍然唯一且递增
+- 统计每个进程和总体的生成速度
+
+用法：
+    python benchmarks/bench_id_generator.py
+    python benchmarks/bench_id_generator.py -p 16 -n 200000
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+KINDS = {
+    "user": 10,
+    "product": 12,
+    "transaction": 15,
+}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="多进程 ID 唯一性与吞吐测试")
+    parser.add_argument("-p", "--processes", type=int, default=8, help="进程数")
+    parser.add_argument("-n", "--count", type=int, default=100000, help="每个进程每种 ID 的生成数量")
+    return parser.parse_args()
+
+def generate(args):
+    """子进程：生成 count 个各类 ID，返回 (worker id, {类型: (ID 列表, 耗时)})"""
+    kind_names, count = args
+    from utils import id_generator
+
+    generators = {
+        "user": id_generator.user_ids,
+        "product": id_generator.product_ids,
+        "transaction": id_generator.transaction_ids,
+    }
+    results = {}
+    for kind in kind_names:
+        generator = generators[kind]
+        start = time.perf_counter()
+        ids = [generator.next_id() for _ in range(count)]
+        results[kind] = (ids, time.perf_counter() - start)
+    return id_generator.worker_ids.get(), results
+
+def check_clock_backwards() -> bool:
+    """模拟时钟回拨 5 秒，检查 ID 仍然递增"""
+    from utils import id_generator
+
+    generator = id_generator.SnowflakeGenerator("T", 15, 12, id_generator.worker_ids)
+    real_time = time.time
+    ids = [generator.next_id() for _ in range(1000)]
+    try:
+        id_generator.time.time = lambda: real_time() - 5
+        ids += [generator.next_id() for _ in range(10000)]
+    finally:
+        id_generator.time.time = real_time
+    ids += [generator.next_id() for _ in range(1000)]
+    ok = ids == sorted(ids) and len(set(ids)) == len(ids) and generator.clock_backwards > 0
+    print(f"时钟回拨：生成 {len(ids)} 个 ID，回拨 {generator.clock_backwards} 次，结果{'正确' if ok else '错误'}")
+    return ok
+
+def main():
+    args = parse_args()
+    # worker id 租约写在临时 SQLite 数据库中，不占用正在运行的服务的 worker id
+    os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "id_workers.db")
+    import database.models  # noqa: F401  注册模型后再建表
+    from database import create_tables
+    create_tables()
+
+    failed = not check_clock_backwards()
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.processes) as pool:
+        outputs = pool.map(generate, [(list(KINDS), args.count)] * args.processes)
+    elapsed = time.perf_counter() - start
+
+    worker_ids = [worker_id for worker_id, _ in outputs]
+    if len(set(worker_ids)) != len(worker_ids):
+        print(f"✗ worker id 重复: {sorted(worker_ids)}")
+        failed = True
+
+    for kind, length in KINDS.items():
+        all_ids = set()
+        total = 0
+        rates = []
+        ordered = True
+        for _, results in outputs:
+            ids, seconds = results[kind]
+            total += len(ids)
+            all_ids.update(ids)
+            rates.append(len(ids) / seconds)
+            ordered = ordered and all(a < b for a, b in zip(ids, ids[1:]))
+        lengths_ok = all(len(i) == length for i in all_ids)
+        ok = len(all_ids) == total and ordered and lengths_ok
+        failed = failed or not ok
+        print(f"{kind}: {total} 个 ID，重复 {total - len(all_ids)} 个，进程内递增: {'是' if ordered else '否'}，"
+              f"长度{'正确' if lengths_ok else '错误'}，单进程 {min(rates):,.0f}-{max(rates):,.0f} 个/秒，"
+              f"总计 {sum(rates):,.0f} 个/秒")
+
+    print(f"{args.processes} 个进程，worker id {sorted(worker_ids)}，总耗时 {elapsed:.2f}s，结果{'错误' if failed else '正确'}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
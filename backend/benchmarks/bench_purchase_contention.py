@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+抢购并发测试：大量买家同时下单同一件商品
+
+检查点：
+- 只有一个请求下单成功，其余请求快速失败
+- transactions 表中只有一条该商品的交易记录，商品状态为 0（已锁定）
+- 统计成功/失败请求的延迟分布，失败请求的 p99 延迟不超过 --max-loser-p99（默认 1000ms）
+
+用法：
+    python benchmarks/bench_purchase_contention.py                  # 临时 SQLite 文件
+    python benchmarks/bench_purchase_contention.py --mysql          # config.py 中的 MySQL（会写入测试数据）
+    python benchmarks/bench_purchase_contention.py -n 5000 -c 500 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="同一商品的并发下单测试")
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="每轮下单请求数")
+    parser.add_argument("-c", "--concurrency", type=int, default=200, help="同时在途的请求数")
+    parser.add_argument("--buyers", type=int, default=200, help="参与抢购的买家数")
+    parser.add_argument("--rounds", type=int, default=1, help="测试轮数（每轮一件新商品）")
+    parser.add_argument("--mysql", action="store_true", help="使用 MySQL 而不是临时 SQLite 文件")
+    parser.add_argument("--max-loser-p99", type=float, default=1000, help="失败请求 p99 延迟上限（毫秒），超出时以退出码 1 结束")
+    return parser.parse_args()
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def seed(buyer_count):
+    """创建卖家、买家和分类，返回 (卖家ID, 买家 token 列表, 分类ID)"""
+    from database import SessionLocal, create_tables
+    from database.models import User, Category
+    from utils.helpers import generate_user_id
+    from utils.id_generator import worker_ids
+    from utils.security import create_access_token
+
+    create_tables()
+    # 先申请 worker id（写租约表），再开启写事务；SQLite 同一时刻只允许一个写事务
+    worker_ids.get()
+    db = SessionLocal()
+    try:
+        category = db.query(Category).filter(Category.name == "压测分类").first()
+        if not category:
+            category = Category(name="压测分类", description="并发测试数据")
+            db.add(category)
+            db.flush()
+
+        run_tag = str(int(time.time() * 1000))[-6:]
+        users = []
+        for i in range(buyer_count + 1):
+            user_id = generate_user_id()
+            while any(u.user_id == user_id for u in users):
+                user_id = generate_user_id()
+            users.append(User(
+                user_id=user_id,
+                username=f"bench{run_tag}_{i}",
+                password="-",
+                phone=f"1{run_tag}{i:04d}",
+                campus_card=f"B{run_tag}{i}"
+            ))
+        db.add_all(users)
+        db.commit()
+        seller, buyers = users[0], users[1:]
+        tokens = [create_access_token({"sub": u.user_id}) for u in buyers]
+        return seller.user_id, tokens, category.id
+    finally:
+        db.close()
+
+def create_product(seller_id, category_id):
+    from database import SessionLocal
+    from database.models import Product
+    from utils.helpers import generate_product_id
+
+    db = SessionLocal()
+    try:
+        product = Product(
+            product_id=generate_product_id(), name="抢购商品", description="并发测试",
+            price=100, seller_id=seller_id, category_id=category_id, status=1
+        )
+        db.add(product)
+        db.commit()
+        return product.product_id
+    finally:
+        db.close()
+
+def check_product(product_id):
+    from database import SessionLocal
+    from database.models import Product, Transaction
+
+    db = SessionLocal()
+    try:
+        status = db.query(Product.status).filter(Product.product_id == product_id).scalar()
+        count = db.query(Transaction).filter(Transaction.product_id == product_id).count()
+        return status, count
+    finally:
+        db.close()
+
+async def attack(client, product_id, tokens, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = []
+
+    async def buy(i):
+        headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/api/transactions/", json={"product_id": product_id}, headers=headers)
+            results.append((response.status_code, time.perf_counter() - start))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(buy(i) for i in range(total)))
+    return results, time.perf_counter() - start
+
+async def main():
+    args = parse_args()
+    if not args.mysql:
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+
+    import httpx
+    from main import app
+    from database import async_engine
+
+    seller_id, tokens, category_id = seed(args.buyers)
+    transport = httpx.ASGITransport(app=app)
+    failed = False
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        # 预热登录用户缓存，压测只测下单本身
+        for token in tokens:
+            await client.get("/api/users/profile", headers={"Authorization": f"Bearer {token}"})
+
+        for round_no in range(1, args.rounds + 1):
+            product_id = create_product(seller_id, category_id)
+            results, elapsed = await attack(client, product_id, tokens, args.requests, args.concurrency)
+
+            codes = {}
+            for code, _ in results:
+                codes[code] = codes.get(code, 0) + 1
+            winners = [t for code, t in results if code == 200]
+            losers = [t for code, t in results if code == 400]
+            status, count = check_product(product_id)
+            ok = len(winners) == 1 and count == 1 and status == 0 and len(losers) == len(results) - 1
+            failed = failed or not ok
+
+            print(f"第 {round_no} 轮：{args.requests} 个请求，并发 {args.concurrency}，耗时 {elapsed:.2f}s，"
+                  f"{args.requests / elapsed:.0f} req/s")
+            print(f"  状态码分布: {codes}")
+            print(f"  交易记录数: {count}，商品状态: {status}，结果{'正确' if ok else '错误'}")
+            if losers:
+                loser_p99 = percentile(losers, 99) * 1000
+                fast = loser_p99 <= args.max_loser_p99
+                failed = failed or not fast
+                print(f"  失败请求延迟: p50 {percentile(losers, 50) * 1000:.1f}ms，"
+                      f"p99 {loser_p99:.1f}ms，平均 {statistics.mean(losers) * 1000:.1f}ms"
+                      f"（上限 {args.max_loser_p99:.0f}ms，{'通过' if fast else '超出'}）")
+
+    await async_engine.dispose()
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    asyncio.run(main())
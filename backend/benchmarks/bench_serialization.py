@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+列表接口序列化微基准：比较每行数据从查询结果到 JSON 字节的耗时
+
+- 旧路径：逐行 _asdict() 并构造响应模型，FastAPI 按 response_model 重新校验、序列化，再由 JSONResponse 编码
+- 新路径：PageSerializer 用 TypeAdapter 一次校验整页，pydantic-core 直接输出 JSON 字节
+- fields：新路径只查询、输出列表卡片用到的字段（商品描述换成 description_snippet）
+
+数据来自内存 SQLite 的真实 Row 对象，不访问业务数据库。每种页大小还会检查旧路径和新路径输出的 JSON 内容一致。
+
+用法：
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --page-sizes 10,100 -n 2000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="列表接口序列化微基准")
+    parser.add_argument("--page-sizes", default="10,50,100", help="页大小，逗号分隔")
+    parser.add_argument("-n", "--repeat", type=int, default=500, help="每种页大小重复的次数")
+    return parser.parse_args()
+
+DESCRIPTION = "九成新，无笔记，可小刀。" * 20
+
+# 列表卡片用到的字段
+CARD_FIELDS = {
+    "商品列表": "product_id,name,price,thumbnails,category_name,description_snippet",
+    "交易列表": "transaction_id,created_at,amount,status,product_name,thumbnails",
+}
+
+def make_rows(count: int):
+    """在内存 SQLite 中生成商品行和交易行，列与列表接口的查询一致"""
+    from sqlalchemy import create_engine, text, DateTime
+    from config import settings
+
+    engine = create_engine("sqlite://")
+    start = datetime(2026, 1, 1, 12, 0, 0)
+    products, transactions = [], []
+    for i in range(count):
+        image_path = f"{i % 256:02x}/{i:064x}.jpg" if i % 3 else None
+        products.append({
+            "product_id": f"P{i:011d}", "name": f"二手教材{i}", "description": DESCRIPTION,
+            "price": 1000 + i * 37, "created_at": start + timedelta(minutes=i), "status": 1,
+            "seller_id": f"U{i % 50:09d}", "category_id": i % 5 + 1, "image_path": image_path,
+            "seller_username": f"seller{i % 50}", "seller_phone": "13800000000", "category_name": "图书",
+        })
+        transactions.append({
+            "transaction_id": f"T{i:014d}", "created_at": start + timedelta(minutes=i), "amount": 1000 + i * 37,
+            "status": i % 3, "buyer_id": f"U{i % 40:09d}", "seller_id": f"U{i % 50:09d}",
+            "product_id": f"P{i:011d}", "counterparty_username": f"seller{i % 50}", "counterparty_role": "卖家",
+            "product_name": f"二手教材{i}", "category_name": "图书", "image_path": image_path,
+        })
+
+    with engine.begin() as conn:
+        for table, rows in (("products", products), ("transactions", transactions)):
+            columns = list(rows[0])
+            conn.execute(text(f"CREATE TABLE {table} ({', '.join(columns)})"))
+            conn.execute(
+                text(f"INSERT INTO {table} VALUES ({', '.join(':' + c for c in columns)})"), rows
+            )
+        # 按 DateTime 类型取出，与 MySQL 驱动一样得到 datetime 而不是字符串
+        product_rows = conn.execute(text("SELECT * FROM products").columns(created_at=DateTime)).fetchall()
+        transaction_rows = conn.execute(text("SELECT * FROM transactions").columns(created_at=DateTime)).fetchall()
+        # 只含卡片字段的行（与路由按 fields 缩小 SELECT 后的结果相同）
+        card_product_rows = conn.execute(text(f"""
+            SELECT product_id, created_at, price, name, image_path, category_name,
+                   SUBSTR(description, 1, {settings.DESCRIPTION_SNIPPET_LENGTH + 1}) AS description_snippet
+            FROM products
+        """).columns(created_at=DateTime)).fetchall()
+        card_transaction_rows = conn.execute(text("""
+            SELECT transaction_id, created_at, amount, status, product_name, image_path FROM transactions
+        """).columns(created_at=DateTime)).fetchall()
+    return product_rows, transaction_rows, card_product_rows, card_transaction_rows
+
+def transaction_dict(row) -> dict:
+    """旧路径：与改动前 get_my_transactions 中逐行构造的字典相同"""
+    image_path = row.image_path
+    return {
+        "transaction_id": row.transaction_id, "created_at": row.created_at, "amount": row.amount,
+        "status": row.status, "buyer_id": row.buyer_id, "seller_id": row.seller_id,
+        "product_id": row.product_id, "counterparty_username": row.counterparty_username,
+        "counterparty_role": row.counterparty_role, "product_name": row.product_name,
+        "category_name": row.category_name, "product_image_path": image_path,
+        "product_image_url": f"http://localhost:8000/api/uploads/{image_path}" if image_path else None,
+    }
+
+def timed(func, repeat: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "bench.db"))
+
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from routers import products, transactions
+    from schemas.product import ProductListItem, ProductListResponse
+    from schemas.transaction import TransactionResponse, TransactionListResponse
+    from utils.fast_json import orjson, rows_to_dicts
+
+    page_sizes = [int(size) for size in args.page_sizes.split(",")]
+    product_rows, transaction_rows, card_product_rows, card_transaction_rows = make_rows(max(page_sizes))
+    loop = asyncio.new_event_loop()
+
+    def response_field(router, path):
+        return next(route for route in router.routes if route.path == path).response_field
+
+    def transaction_dicts(rows):
+        items = rows_to_dicts(rows)
+        for item in items:
+            image_path = item.pop("image_path")
+            item["product_image_path"] = image_path
+            item["product_image_url"] = f"http://localhost:8000/api/uploads/{image_path}" if image_path else None
+        return items
+
+    def strip_hidden(body, items_field, hidden):
+        """旧路径会把只在 fields 中请求才返回的字段输出为 null，比较前去掉"""
+        data = json.loads(body)
+        for item in data[items_field]:
+            for name in hidden:
+                item.pop(name, None)
+        return data
+
+    cases = [
+        (
+            "商品列表", response_field(products.router, "/available"), products.product_page,
+            product_rows, card_product_rows, ProductListResponse, "products",
+            lambda rows: [ProductListItem(**row._asdict()) for row in rows],
+            rows_to_dicts,
+        ),
+        (
+            "交易列表", response_field(transactions.router, "/my"), transactions.transaction_page,
+            transaction_rows, card_transaction_rows, TransactionListResponse, "transactions",
+            lambda rows: [TransactionResponse(**transaction_dict(row)) for row in rows],
+            transaction_dicts,
+        ),
+    ]
+
+    print(f"JSON 编码: {'orjson ' + orjson.__version__ if orjson else '标准库 json（未安装 orjson）'}，每种页大小重复 {args.repeat} 次")
+    print(f"{'接口':8s} {'每页':>4s} {'旧路径 µs/行':>12s} {'新路径 µs/行':>12s} {'fields µs/行':>12s} "
+          f"{'加速':>6s} {'旧 字节/行':>10s} {'fields 字节/行':>14s}")
+    failed = False
+    for name, field, serializer, all_rows, all_card_rows, page_model, items_field, build_models, build_dicts in cases:
+        selected = serializer.parse_fields(CARD_FIELDS[name])
+        for page_size in page_sizes:
+            rows = all_rows[:page_size]
+            card_rows = all_card_rows[:page_size]
+            page = {"total": 1000, "page": 1, "page_size": page_size, "total_pages": 1000 // page_size}
+
+            def old_path():
+                content = page_model(**{items_field: build_models(rows)}, **page)
+                serialized = loop.run_until_complete(
+                    serialize_response(field=field, response_content=content, is_coroutine=True)
+                )
+                return JSONResponse(serialized).body
+
+            def new_path():
+                return serializer.response(build_dicts(rows), **page).body
+
+            def sparse_path():
+                return serializer.response(build_dicts(card_rows), selected, **page).body
+
+            if strip_hidden(old_path(), items_field, serializer.optional_fields) != json.loads(new_path()):
+                print(f"✗ {name} 每页 {page_size} 行：两条路径输出的 JSON 不一致")
+                failed = True
+                continue
+            old = timed(old_path, args.repeat) / page_size * 1e6
+            new = timed(new_path, args.repeat) / page_size * 1e6
+            sparse = timed(sparse_path, args.repeat) / page_size * 1e6
+            old_bytes = len(old_path()) / page_size
+            sparse_bytes = len(sparse_path()) / page_size
+            print(f"{name:8s} {page_size:4d} {old:12.2f} {new:12.2f} {sparse:12.2f} "
+                  f"{old / new:5.1f}x {old_bytes:10.0f} {sparse_bytes:14.0f}")
+
+    loop.close()
+    if failed:
+        sys.exit(1)
+    print("✓ 两条路径输出一致")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+查询预算检查：在临时 SQLite 数据库上走一遍主要接口，统计每个路由执行的 SQL 条数
+
+以 QUERY_BUDGET_MODE=raise、N_PLUS_ONE_THRESHOLD=5 启动应用，并关闭登录用户缓存（每个请求都查一次用户，
+即最坏情况）。任何请求超出 @query_budget 声明的条数都会返回 500，脚本以退出码 1 结束，可以放进 CI。
+
+用法：
+    python benchmarks/check_query_budgets.py
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def main():
+    os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "budget.db")
+    os.environ["QUERY_BUDGET_MODE"] = "raise"
+    os.environ["N_PLUS_ONE_THRESHOLD"] = "5"
+    os.environ["AUTH_CACHE_ENABLED"] = "false"
+    os.environ["SEARCH_INDEX_ENABLED"] = "false"
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+    from database import SessionLocal
+    from database.models import Category
+    from utils.query_inspector import query_inspector
+    from utils.order_expiry import order_expiry
+
+    failures = []
+
+    def check(response, name):
+        if response.status_code != 200:
+            failures.append(f"{name}: {response.status_code} {response.text[:200]}")
+        return response
+
+    with TestClient(app_module.app, raise_server_exceptions=False) as client:
+        db = SessionLocal()
+        db.add_all([Category(name="电子产品"), Category(name="图书")])
+        db.commit()
+        db.close()
+
+        headers = {}
+        for username, phone in (("seller", "13800000001"), ("buyer", "13800000002")):
+            check(client.post("/api/auth/register", json={
+                "username": username, "password": "secret1", "phone": phone, "campus_card": username + "001"
+            }), "注册")
+            token = check(client.post("/api/auth/login", json={"username": username, "password": "secret1"}), "登录")
+            headers[username] = {"Authorization": "Bearer " + token.json().get("access_token", "")}
+
+        product_ids = []
+        for i in range(6):
+            response = check(client.post("/api/products/create", headers=headers["seller"], json={
+                "name": f"二手教材{i}", "description": "九成新", "price": 20 + i, "category_id": 1
+            }), "发布商品")
+            product_ids.append(response.json().get("product_id"))
+
+        check(client.get(f"/api/products/{product_ids[0]}"), "商品详情")
+        check(client.put(f"/api/products/{product_ids[1]}", headers=headers["seller"],
+                         json={"name": "改名", "category_id": 2}), "更新商品")
+        check(client.delete(f"/api/products/{product_ids[2]}", headers=headers["seller"]), "下架商品")
+        check(client.get("/api/products/available", headers=headers["buyer"], params={"page_size": 3}), "浏览商品")
+        check(client.get("/api/products/my", headers=headers["seller"]), "我的商品")
+        check(client.get("/api/products/facets", headers=headers["buyer"], params={"min_price": 20}), "分面计数")
+        check(client.get("/api/products/facets", headers=headers["buyer"], params={"keyword": "教材"}), "分面计数（关键词）")
+
+        order = check(client.post("/api/transactions/", headers=headers["buyer"],
+                                  json={"product_id": product_ids[0]}), "下单")
+        transaction_id = order.json().get("transaction_id")
+        check(client.put(f"/api/transactions/{transaction_id}/pay", headers=headers["buyer"]), "支付")
+        check(client.get(f"/api/transactions/{transaction_id}", headers=headers["seller"]), "交易详情")
+        check(client.get("/api/transactions/my", headers=headers["buyer"]), "我的交易")
+
+        # 回归检查：订单超时后，卖家可以下架该商品，买家的交易总数随之更新
+        order = check(client.post("/api/transactions/", headers=headers["buyer"],
+                                  json={"product_id": product_ids[3]}), "下单")
+        transaction_id = order.json().get("transaction_id")
+        pending = check(client.get("/api/transactions/my", headers=headers["buyer"], params={"status": 0}), "我的交易")
+        if pending.json().get("total") != 1:
+            failures.append(f"超时前待支付订单数应为 1，实际为 {pending.json().get('total')}")
+        client.portal.call(order_expiry.expire, [(transaction_id, product_ids[3])])
+        pending = check(client.get("/api/transactions/my", headers=headers["buyer"], params={"status": 0}), "我的交易")
+        if pending.json().get("total") != 0:
+            failures.append(f"订单超时后待支付订单数应为 0，实际为 {pending.json().get('total')}（交易总数缓存未失效）")
+        check(client.delete(f"/api/products/{product_ids[3]}", headers=headers["seller"]), "下架超时释放的商品")
+        response = client.delete(f"/api/products/{product_ids[0]}", headers=headers["seller"])
+        if response.status_code != 400:
+            failures.append(f"已售出的商品不应允许下架：{response.status_code}")
+
+    stats = query_inspector.stats()
+    print("各路由单个请求最多执行的 SQL 条数：")
+    for route, count in sorted(stats["max_statements"].items()):
+        print(f"  {route:50s} {count}")
+    if stats["n_plus_one"]:
+        failures.append(f"发现 {stats['n_plus_one']} 处疑似 N+1 查询")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print("✓ 所有请求都在查询预算之内")
+
+if __name__ == "__main__":
+    main()
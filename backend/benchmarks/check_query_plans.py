@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+执行计划检查：对各接口实际执行的每条 SQL 做 EXPLAIN，发现全表扫描或额外排序（filesort）就失败
+
+1. 检查 database/schema.sql 与 database/models.py 声明的索引是否一致，以及数据库中实际存在的索引是否与之相同
+   （已有数据库缺少或多出的索引会打印对应的 CREATE INDEX / DROP INDEX 语句）
+2. 默认在临时 SQLite 数据库中用 init_db.py 的合成数据生成器造数据并 ANALYZE，使优化器按真实的数据分布选择索引
+3. 以真实用户走一遍各接口（浏览的各种筛选和排序、游标翻页、分面计数、我的商品、发布/修改/下架、下单/支付、我的交易、导出等），
+   在执行每条 SQL 的同一连接上 EXPLAIN（SQLite 为 EXPLAIN QUERY PLAN）
+4. 计划中出现对表的全表扫描（SQLite 的 SCAN 表 不带索引，MySQL 的 type=ALL），
+   或需要额外排序（SQLite 的 USE TEMP B-TREE，MySQL 的 Using filesort / Using temporary）即判为失败；
+   确有理由的例外写在 ALLOWED 中并注明原因
+
+以退出码 1 结束表示有失败，可以放进 CI。
+
+用法：
+    python benchmarks/check_query_plans.py
+    python benchmarks/check_query_plans.py --users 5000 --products 100000 --transactions 20000
+    python benchmarks/check_query_plans.py --configured-db   # 使用 config 中配置的数据库（如 MySQL 测试库）
+
+--configured-db 要求数据库已有 init_db.py --synthetic 生成的数据，检查过程中会发布、下架商品和下单，不要对生产库运行。
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "schema.sql")
+
+# 小表允许全表扫描（facet_counts 每个 (分类, 价格分桶) 一行，分面计数时整表读取）
+SMALL_TABLES = {"categories", "facet_counts"}
+
+# 允许的例外：(请求名, 问题类型) -> 原因；请求名同时匹配带括号说明的变体，如 "我的交易" 匹配 "我的交易（按状态）"
+ALLOWED = {
+    ("我的交易", "额外排序"): "买家侧和卖家侧各自沿索引只取 offset+page_size 行，关联后合并排序的行数有上限",
+    ("导出我的交易", "额外排序"): "买家侧、卖家侧各沿索引取当前用户的交易ID，UNION ALL 后只排序这些行",
+    ("浏览商品（价格区间）", "额外排序"): "价格区间与按时间排序无法同时走一个索引，优化器按区间的选择性在 "
+                                         "idx_listing_price（排序区间内的行）和 idx_listing_newest（按时间顺序过滤）之间选择",
+    ("浏览商品（关键词）", "全表扫描"): "关闭搜索索引时的回退查询，LIKE '%关键词%' 无法使用索引；正常情况下走倒排索引",
+    ("分面计数（关键词）", "全表扫描"): "同上",
+    ("导出全部商品", "全表扫描"): "管理员导出，本来就要读全表",
+    ("导出全部交易", "全表扫描"): "管理员导出，本来就要读全表",
+}
+
+def allowed_reason(label: str, kind: str):
+    for (allowed_label, allowed_kind), reason in ALLOWED.items():
+        if kind == allowed_kind and (label == allowed_label or label.startswith(allowed_label + "（")):
+            return reason
+    return None
+
+# FROM/JOIN 后的表名和别名
+TABLE_ALIAS_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SQL_KEYWORDS = {"WHERE", "JOIN", "LEFT", "RIGHT", "INNER", "OUTER", "ON", "ORDER", "GROUP", "LIMIT", "UNION", "SET"}
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="各接口 SQL 执行计划检查")
+    parser.add_argument("--users", type=int, default=2000, help="合成用户数")
+    parser.add_argument("--products", type=int, default=20000, help="合成商品数")
+    parser.add_argument("--transactions", type=int, default=6000, help="合成交易数")
+    parser.add_argument("--configured-db", action="store_true", help="使用 config 中配置的数据库，不新建临时 SQLite")
+    return parser.parse_args()
+
+# ====================================================
+# 索引定义检查
+# ====================================================
+def schema_sql_indexes() -> dict:
+    """解析 schema.sql 中 CREATE TABLE 里的 INDEX 定义：{表名: {索引名: (列, ...)}}"""
+    with open(SCHEMA_PATH, encoding="utf-8") as f:
+        content = f.read()
+    indexes = {}
+    for table, body in re.findall(r"CREATE TABLE IF NOT EXISTS (\w+) \((.*?)\) ENGINE", content, re.S):
+        indexes[table] = {
+            name: tuple(column.split()[0] for column in columns.split(","))
+            for name, columns in re.findall(r"^\s*INDEX (\w+) \(([^)]*)\)", body, re.M)
+        }
+    return indexes
+
+def model_indexes() -> dict:
+    """models.py 中声明的非唯一索引：{表名: {索引名: (列, ...)}}"""
+    from database import Base, engine
+    import database.models  # noqa: F401
+    def column_name(expression):
+        # 倒序的列（desc("created_at")）编译为 "created_at DESC"，只比较列名
+        return str(expression.compile(dialect=engine.dialect, compile_kwargs={"include_table": False})).split()[0]
+    return {
+        table.name: {index.name: tuple(column_name(expression) for expression in index.expressions)
+                     for index in table.indexes if not index.unique}
+        for table in Base.metadata.sorted_tables
+    }
+
+def database_indexes(engine) -> dict:
+    """数据库中实际存在的非唯一索引"""
+    from sqlalchemy import inspect
+    inspector = inspect(engine)
+    return {
+        table: {index["name"]: tuple(index["column_names"])
+                for index in inspector.get_indexes(table) if not index.get("unique")}
+        for table in inspector.get_table_names()
+    }
+
+def compare_indexes(expected: dict, actual: dict, actual_name: str, failures: list, suggest_sql=False):
+    for table, indexes in expected.items():
+        existing = actual.get(table)
+        if existing is None:
+            failures.append(f"{actual_name} 中没有表 {table}")
+            continue
+        for name, columns in indexes.items():
+            if existing.get(name) == columns:
+                continue
+            message = f"{actual_name} 的 {table} 缺少索引 {name}({', '.join(columns)})"
+            if suggest_sql:
+                drop = f"DROP INDEX {name} ON {table}; " if name in existing else ""
+                message += f"：{drop}CREATE INDEX {name} ON {table} ({', '.join(columns)});"
+            failures.append(message)
+        for name, columns in existing.items():
+            if name not in indexes:
+                message = f"{actual_name} 的 {table} 多出索引 {name}({', '.join(columns)})"
+                if suggest_sql:
+                    message += f"：DROP INDEX {name} ON {table};"
+                failures.append(message)
+
+# ====================================================
+# 执行计划分析
+# ====================================================
+def table_aliases(statement: str) -> dict:
+    """语句中 别名/表名 -> 表名"""
+    aliases = {}
+    for table, alias in TABLE_ALIAS_PATTERN.findall(statement):
+        aliases[table] = table
+        if alias and alias.upper() not in SQL_KEYWORDS:
+            aliases[alias] = table
+    return aliases
+
+def plan_problems(dialect: str, statement: str, plan: list) -> list:
+    """返回 [(问题类型, 计划中的对应行)]"""
+    aliases = table_aliases(statement)
+    problems = []
+    if dialect == "sqlite":
+        # 子查询（MATERIALIZE / CO-ROUTINE）的结果集不是表，扫描它们不算全表扫描
+        subqueries = {row["detail"].split()[-1] for row in plan
+                      if row["detail"].startswith(("MATERIALIZE", "CO-ROUTINE"))}
+        for row in plan:
+            detail = row["detail"]
+            match = re.fullmatch(r"SCAN (\S+)", detail)
+            if match and match.group(1) not in subqueries and match.group(1) in aliases:
+                if aliases[match.group(1)] not in SMALL_TABLES:
+                    problems.append(("全表扫描", detail))
+            elif detail.startswith("USE TEMP B-TREE"):
+                problems.append(("额外排序", detail))
+    else:
+        for row in plan:
+            table = row.get("table") or ""
+            extra = row.get("Extra") or ""
+            if row.get("type") == "ALL" and table in aliases and aliases[table] not in SMALL_TABLES:
+                problems.append(("全表扫描", f"table={table} type=ALL rows={row.get('rows')}"))
+            if "Using filesort" in extra or "Using temporary" in extra:
+                problems.append(("额外排序", f"table={table} Extra={extra}"))
+    return problems
+
+class PlanRecorder:
+    """在执行每条 SQL 之后，用同一连接对它做 EXPLAIN，按当前请求名记录"""
+
+    def __init__(self):
+        self.label = None
+        self.plans = {}  # (请求名, 语句) -> 执行计划
+        self.errors = []
+
+    def instrument_engine(self, engine):
+        from sqlalchemy import event
+        from utils.query_inspector import explain_rows
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if self.label is None or executemany or (self.label, statement) in self.plans:
+                return
+            try:
+                plan = explain_rows(conn, statement, parameters)
+            except Exception as e:
+                self.errors.append(f"{self.label}: EXPLAIN 失败 {e}: {statement[:200]}")
+                return
+            if plan:
+                self.plans[(self.label, statement)] = plan
+
+# ====================================================
+# 数据准备
+# ====================================================
+def seed_temp_database(args):
+    from init_db import seed_synthetic_data
+    seed_args = argparse.Namespace(
+        users=args.users, products=args.products, transactions=args.transactions,
+        days=365, until="2026-06-01", seed=42, batch_size=5000, load_data=False, reset=False,
+    )
+    if not seed_synthetic_data(seed_args):
+        sys.exit(1)
+
+def analyze(engine):
+    """收集统计信息，让优化器按实际数据分布选择索引"""
+    from sqlalchemy import text
+    with engine.begin() as connection:
+        if engine.dialect.name == "sqlite":
+            connection.execute(text("ANALYZE"))
+        else:
+            connection.execute(text("ANALYZE TABLE users, categories, products, transactions, product_listings"))
+
+def pick_users(engine):
+    """选出发布商品最多的卖家和交易最多的买家，作为检查时登录的用户"""
+    from sqlalchemy import text
+    with engine.connect() as connection:
+        seller = connection.execute(text(
+            "SELECT seller_id, COUNT(*) AS n FROM products GROUP BY seller_id ORDER BY n DESC LIMIT 1"
+        )).first()
+        buyer = connection.execute(text(
+            "SELECT buyer_id, COUNT(*) AS n FROM transactions WHERE buyer_id != :seller_id "
+            "GROUP BY buyer_id ORDER BY n DESC LIMIT 1"
+        ), {"seller_id": seller.seller_id}).first()
+        if buyer is None:
+            return None
+        names = dict(connection.execute(text(
+            "SELECT user_id, username FROM users WHERE user_id IN (:seller_id, :buyer_id)"
+        ), {"seller_id": seller.seller_id, "buyer_id": buyer.buyer_id}).all())
+        target = connection.execute(text(
+            "SELECT product_id FROM product_listings WHERE seller_id NOT IN (:seller_id, :buyer_id) LIMIT 1"
+        ), {"seller_id": seller.seller_id, "buyer_id": buyer.buyer_id}).scalar()
+    return {
+        "seller": (seller.seller_id, names[seller.seller_id]),
+        "buyer": (buyer.buyer_id, names[buyer.buyer_id]),
+        "target_product": target,
+    }
+
+# ====================================================
+# 主流程
+# ====================================================
+def main():
+    args = parse_args()
+    if not args.configured_db:
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "plans.db")
+    os.environ["AUTH_CACHE_ENABLED"] = "false"
+    # 关闭倒排索引，关键词搜索走数据库里的回退查询
+    os.environ["SEARCH_INDEX_ENABLED"] = "false"
+
+    from config import settings
+    from database import engine, async_engine
+    from init_db import SYNTHETIC_PASSWORD
+
+    failures = []
+
+    # 1. schema.sql 与 models.py 的索引定义
+    expected = model_indexes()
+    compare_indexes(expected, schema_sql_indexes(), "schema.sql", failures)
+
+    # 2. 准备数据
+    if not args.configured_db:
+        seed_temp_database(args)
+    compare_indexes(expected, database_indexes(engine), "数据库", failures, suggest_sql=True)
+    analyze(engine)
+    users = pick_users(engine)
+    if users is None:
+        print("✗ 数据库中没有交易数据，请先运行 python init_db.py --synthetic")
+        sys.exit(1)
+    seller_id, seller_name = users["seller"]
+    buyer_id, buyer_name = users["buyer"]
+    settings.ADMIN_USER_IDS = seller_id
+
+    from fastapi.testclient import TestClient
+    import main as app_module
+
+    recorder = PlanRecorder()
+    recorder.instrument_engine(async_engine.sync_engine)
+
+    def call(label, method, url, headers=None, **kwargs):
+        recorder.label = label
+        try:
+            response = client.request(method, url, headers=headers, **kwargs)
+        finally:
+            recorder.label = None
+        if response.status_code != 200:
+            failures.append(f"{label}: {response.status_code} {response.text[:200]}")
+        return response
+
+    recorder.label = "服务启动"
+    with TestClient(app_module.app, raise_server_exceptions=False) as client:
+        recorder.label = None
+        call("注册", "POST", "/api/auth/register", json={
+            "username": "plancheck", "password": "secret1", "phone": "13900000000", "campus_card": "PLAN0001"
+        })
+        headers = {}
+        for role, username in (("seller", seller_name), ("buyer", buyer_name)):
+            token = call("登录", "POST", "/api/auth/login", json={"username": username, "password": SYNTHETIC_PASSWORD})
+            headers[role] = {"Authorization": "Bearer " + token.json().get("access_token", "")}
+        seller, buyer = headers["seller"], headers["buyer"]
+
+        call("个人信息", "GET", "/api/users/profile", seller)
+        call("修改手机号", "PUT", "/api/users/profile", seller, json={"phone": "13900000001"})
+        call("分类列表", "GET", "/api/products/categories/list")
+
+        # 浏览商品：各种筛选、排序和两种分页
+        browse_cases = {
+            "浏览商品": {},
+            "浏览商品（深页）": {"page": 50},
+            "浏览商品（分类）": {"category_id": 1},
+            "浏览商品（价格区间）": {"min_price": 10, "max_price": 200},
+            "浏览商品（分类+价格区间）": {"category_id": 2, "min_price": 10, "max_price": 200, "sort_by": "price_desc"},
+            "浏览商品（价格升序）": {"sort_by": "price_asc"},
+            "浏览商品（价格降序）": {"sort_by": "price_desc"},
+            "浏览商品（分类+价格升序）": {"category_id": 1, "sort_by": "price_asc"},
+            "浏览商品（关键词）": {"keyword": "教材"},
+            "浏览商品（卡片字段）": {"fields": "product_id,name,price,thumbnails,category_name"},
+        }
+        for label, params in browse_cases.items():
+            call(label, "GET", "/api/products/available", buyer, params=params)
+        for sort_by in ("newest", "price_asc", "price_desc"):
+            for category_id in (None, 3):
+                label = f"浏览商品（游标 {sort_by}{' 分类' if category_id else ''}）"
+                params = {"sort_by": sort_by, "cursor": ""}
+                if category_id:
+                    params["category_id"] = category_id
+                next_cursor = call(label, "GET", "/api/products/available", buyer, params=params).json().get("next_cursor")
+                if next_cursor:
+                    call(label, "GET", "/api/products/available", buyer, params={**params, "cursor": next_cursor})
+
+        call("分面计数", "GET", "/api/products/facets", seller, params={"category_id": 1, "min_price": 10})
+        call("分面计数（价格区间）", "GET", "/api/products/facets", seller, params={"min_price": 25, "max_price": 80})
+        call("分面计数（关键词）", "GET", "/api/products/facets", buyer, params={"keyword": "教材"})
+        call("我的商品", "GET", "/api/products/my", seller)
+        call("我的商品（深页）", "GET", "/api/products/my", seller, params={"page": 3, "fields": "product_id,name,price"})
+
+        # 商品写操作
+        product_ids = []
+        for i in range(3):
+            response = call("发布商品", "POST", "/api/products/create", seller, json={
+                "name": f"执行计划检查{i}", "description": "九成新", "price": 20 + i, "category_id": 1
+            })
+            product_ids.append(response.json().get("product_id"))
+        call("批量发布", "POST", "/api/products/bulk", {**seller, "Content-Type": "application/x-ndjson"},
+             content='{"name":"批量一","price":1,"category_id":1}\n{"name":"批量二","price":2,"category_id":2}\n')
+        call("商品详情", "GET", f"/api/products/{product_ids[0]}")
+        call("更新商品", "PUT", f"/api/products/{product_ids[1]}", seller, json={"name": "改名", "category_id": 2})
+        call("下架商品", "DELETE", f"/api/products/{product_ids[2]}", seller)
+
+        # 交易
+        order = call("下单", "POST", "/api/transactions/", buyer, json={"product_id": users["target_product"]})
+        transaction_id = order.json().get("transaction_id")
+        call("支付", "PUT", f"/api/transactions/{transaction_id}/pay", buyer)
+        call("交易详情", "GET", f"/api/transactions/{transaction_id}", buyer)
+        call("我的交易", "GET", "/api/transactions/my", buyer)
+        call("我的交易", "GET", "/api/transactions/my", buyer, params={"page": 2, "page_size": 5})
+        call("我的交易（按状态）", "GET", "/api/transactions/my", buyer, params={"status": 1})
+        call("我的交易（按分类）", "GET", "/api/transactions/my", buyer, params={"category_id": 1})
+        call("我的交易（按日期）", "GET", "/api/transactions/my", buyer, params={"start_date": "2026-01-01T00:00:00"})
+        first = call("我的交易（游标翻页）", "GET", "/api/transactions/my", buyer, params={"cursor": "", "page_size": 3})
+        if first.json().get("next_cursor"):
+            call("我的交易（游标翻页）", "GET", "/api/transactions/my", buyer,
+                 params={"cursor": first.json()["next_cursor"], "page_size": 3})
+        call("我的交易（卡片字段）", "GET", "/api/transactions/my", seller,
+             params={"fields": "transaction_id,amount,status,created_at"})
+
+        # 导出（流式响应读完才会执行完所有查询）
+        call("导出我的交易", "GET", "/api/exports/transactions/my", buyer)
+        call("导出全部交易", "GET", "/api/exports/transactions", seller, params={"status": 1})
+        call("导出全部商品", "GET", "/api/exports/products", seller, params={"status": 1})
+
+        # 后台任务中的查询
+        from utils.order_expiry import order_expiry
+        recorder.label = "查找超时订单"
+        client.portal.call(order_expiry.find_overdue)
+        recorder.label = None
+
+    # 3. 分析执行计划
+    dialect = engine.dialect.name
+    checked = {}
+    allowed = {}
+    for (label, statement), plan in recorder.plans.items():
+        checked[label] = checked.get(label, 0) + 1
+        for kind, detail in plan_problems(dialect, statement, plan):
+            reason = allowed_reason(label, kind)
+            if reason:
+                allowed[f"{label}: {kind} {detail}"] = reason
+                continue
+            preview = re.sub(r"\s+", " ", statement).strip()[:300]
+            lines = [" | ".join(f"{name}={value}" for name, value in row.items()) for row in plan]
+            failures.append(f"{label}: {kind} {detail}\n    {preview}\n      " + "\n      ".join(lines))
+    failures.extend(recorder.errors)
+
+    print(f"\n各请求检查的 SQL 条数（{dialect}）：")
+    for label, count in checked.items():
+        print(f"  {label:30s} {count}")
+    for line, reason in allowed.items():
+        print(f"  允许的例外 {line}（{reason}）")
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"✓ {len(recorder.plans)} 条 SQL 的执行计划都没有全表扫描和额外排序（{len(allowed)} 处允许的例外见上）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+接口压测：按真实比例混合请求，统计每个接口的吞吐量和 p50/p95/p99 延迟
+
+场景（虚拟用户登录后按权重随机选择，随机数种子固定，同样的参数每次生成同样的请求序列）：
+- 浏览可购买商品（随机组合分类、价格区间、关键词、排序、游标翻页），一半的浏览同时取筛选项的分面计数
+- 查看商品详情
+- 登录
+- 下单并支付
+- 查看我的交易记录
+
+默认在进程内用 httpx.ASGITransport 驱动应用，数据库为临时 SQLite 文件（客户端与服务端共用一个事件循环，
+适合比较不同提交之间的相对变化）；--mysql 改用 config.py 中的 MySQL；--url 压测已经启动的服务
+（数据库中需要已有商品分类，例如执行过 init_db.py）。
+
+结果写入 JSON 文件，--compare 指定基线文件时逐个接口比较 p95 和吞吐量，超出容忍度则以退出码 1 结束。
+
+用法：
+    python benchmarks/load_test.py                                  # 临时 SQLite，2000 个请求，并发 20
+    python benchmarks/load_test.py -n 10000 -c 50 --products 5000
+    python benchmarks/load_test.py --mysql
+    python benchmarks/load_test.py --url http://127.0.0.1:8000
+    python benchmarks/load_test.py -o base.json                     # 保存基线
+    python benchmarks/load_test.py --compare base.json              # 与基线比较
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# 各场景的权重
+SCENARIOS = {
+    "browse": 40,
+    "detail": 25,
+    "my_transactions": 15,
+    "buy": 15,
+    "login": 5,
+}
+
+KEYWORDS = ["教材", "台灯", "耳机", "自行车", "键盘", "显示器", "篮球", "吉他", "风扇", "书架"]
+ADJECTIVES = ["九成新", "全新未拆", "自用", "毕业转让", "低价出", "几乎没用过"]
+PASSWORD = "loadtest1"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="接口压测，输出每个接口的吞吐量和延迟分位数")
+    parser.add_argument("-n", "--requests", type=int, default=2000, help="请求总数（不含准备数据）")
+    parser.add_argument("-c", "--concurrency", type=int, default=20, help="虚拟用户数")
+    parser.add_argument("--products", type=int, default=1000, help="准备的商品数")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--url", help="压测已启动的服务，如 http://127.0.0.1:8000")
+    parser.add_argument("--mysql", action="store_true", help="进程内压测时使用 MySQL 而不是临时 SQLite 文件")
+    parser.add_argument("--bcrypt-rounds", type=int, help="进程内压测时的 bcrypt 代价因子（默认使用配置）")
+    parser.add_argument("-o", "--output", help="结果 JSON 文件，默认写到 benchmarks/results/")
+    parser.add_argument("--compare", help="基线结果 JSON 文件")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="允许的 p95 增幅 / 吞吐量降幅（比例）")
+    return parser.parse_args()
+
+# ----------------------------------------------------------------
+# 统计
+# ----------------------------------------------------------------
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    async def request(self, client, endpoint, method, url, expected=(200,), **kwargs):
+        """发送请求并按 endpoint（路由模板）记录耗时；状态码不在 expected 中时记为错误"""
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except Exception as e:
+            self.latencies[endpoint].append(time.perf_counter() - start)
+            self.statuses[endpoint][type(e).__name__] += 1
+            self.errors[endpoint] += 1
+            return None
+        self.latencies[endpoint].append(time.perf_counter() - start)
+        self.statuses[endpoint][str(response.status_code)] += 1
+        if response.status_code not in expected:
+            self.errors[endpoint] += 1
+        return response
+
+def percentile(sorted_values, p):
+    """最近秩法计算分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    endpoints = {}
+    all_latencies = []
+    for endpoint, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        all_latencies += values
+        endpoints[endpoint] = {
+            "requests": len(values),
+            "errors": recorder.errors[endpoint],
+            "throughput": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "max_ms": round(values[-1] * 1000, 2),
+            "statuses": dict(recorder.statuses[endpoint]),
+        }
+    all_latencies.sort()
+    total = {
+        "requests": len(all_latencies),
+        "errors": sum(recorder.errors.values()),
+        "elapsed_s": round(elapsed, 3),
+        "throughput": round(len(all_latencies) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(percentile(all_latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(all_latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(all_latencies, 99) * 1000, 2),
+    }
+    return {"total": total, "endpoints": endpoints}
+
+def print_summary(summary: dict):
+    print(f"\n{'接口':50s} {'请求数':>7s} {'错误':>5s} {'吞吐/s':>9s} {'p50ms':>8s} {'p95ms':>8s} {'p99ms':>8s} {'maxms':>8s}")
+    for endpoint, s in summary["endpoints"].items():
+        print(f"{endpoint:50s} {s['requests']:7d} {s['errors']:5d} {s['throughput']:9.1f} "
+              f"{s['p50_ms']:8.1f} {s['p95_ms']:8.1f} {s['p99_ms']:8.1f} {s['max_ms']:8.1f}")
+    t = summary["total"]
+    print(f"{'合计':50s} {t['requests']:7d} {t['errors']:5d} {t['throughput']:9.1f} "
+          f"{t['p50_ms']:8.1f} {t['p95_ms']:8.1f} {t['p99_ms']:8.1f}")
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list:
+    """逐个接口与基线比较，返回回归列表"""
+    regressions = []
+    print(f"\n与基线 {baseline.get('meta', {}).get('commit', '?')} 比较：")
+    for endpoint, current in summary["endpoints"].items():
+        base = baseline.get("endpoints", {}).get(endpoint)
+        if not base:
+            continue
+        p95_change = (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"] if base["p95_ms"] else 0
+        throughput_change = ((current["throughput"] - base["throughput"]) / base["throughput"]
+                             if base["throughput"] else 0)
+        mark = ""
+        if p95_change > tolerance:
+            regressions.append(f"{endpoint} p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+            mark = "  ✗"
+        if throughput_change < -tolerance:
+            regressions.append(f"{endpoint} 吞吐量 {base['throughput']}/s -> {current['throughput']}/s")
+            mark = "  ✗"
+        print(f"  {endpoint:50s} p95 {p95_change:+7.1%}  吞吐量 {throughput_change:+7.1%}{mark}")
+    return regressions
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+# ----------------------------------------------------------------
+# 准备数据
+# ----------------------------------------------------------------
+async def seed(client, args, rng: random.Random) -> dict:
+    """注册用户、批量导入商品，返回压测用的上下文"""
+    run_tag = f"{int(time.time()) % 100000:05d}"
+    categories = (await client.get("/api/products/categories/list")).json()
+    category_ids = [c["id"] for c in categories]
+    if not category_ids:
+        raise RuntimeError("数据库中没有商品分类")
+
+    users = []
+    for i in range(args.concurrency):
+        username = f"lt{run_tag}{i:03d}"
+        response = await client.post("/api/auth/register", json={
+            "username": username,
+            "password": PASSWORD,
+            "phone": f"139{run_tag}{i:03d}",
+            "campus_card": f"{run_tag}{i:04d}",
+        })
+        response.raise_for_status()
+        token = (await client.post("/api/auth/login", json={"username": username, "password": PASSWORD})).json()
+        users.append({
+            "username": username,
+            "user_id": response.json()["user_id"],
+            "headers": {"Authorization": f"Bearer {token['access_token']}"},
+        })
+
+    # 商品平均分给各个用户，每人一次批量导入
+    products = []
+    for index, user in enumerate(users):
+        count = args.products // len(users) + (1 if index < args.products % len(users) else 0)
+        lines = []
+        for _ in range(count):
+            keyword = rng.choice(KEYWORDS)
+            lines.append(json.dumps({
+                "name": f"{rng.choice(ADJECTIVES)}{keyword}"[:20],
+                "description": f"{keyword} {rng.choice(ADJECTIVES)}，校内自提",
+                "price": round(rng.uniform(5, 500), 2),
+                "category_id": rng.choice(category_ids),
+            }, ensure_ascii=False))
+        if not lines:
+            continue
+        response = await client.post(
+            "/api/products/bulk", content="\n".join(lines).encode(),
+            headers={**user["headers"], "Content-Type": "application/x-ndjson"}
+        )
+        response.raise_for_status()
+        products += [(r["product_id"], user["user_id"]) for r in response.json()["results"] if r["success"]]
+
+    rng.shuffle(products)
+    return {"users": users, "products": products, "category_ids": category_ids}
+
+# ----------------------------------------------------------------
+# 虚拟用户
+# ----------------------------------------------------------------
+async def browse(client, recorder, user, ctx, rng):
+    params = {"page_size": rng.choice([10, 20])}
+    choice = rng.random()
+    if choice < 0.3:
+        params["category_id"] = rng.choice(ctx["category_ids"])
+    elif choice < 0.5:
+        low = rng.choice([0, 20, 50, 100])
+        params.update(min_price=low, max_price=low + rng.choice([50, 100, 300]))
+    elif choice < 0.7:
+        params["keyword"] = rng.choice(KEYWORDS)
+    if rng.random() < 0.3:
+        params["sort_by"] = rng.choice(["price_asc", "price_desc"])
+    use_cursor = rng.random() < 0.5
+    if use_cursor:
+        params["cursor"] = ""
+    response = await recorder.request(client, "GET /api/products/available", "GET",
+                                      "/api/products/available", params=params, headers=user["headers"])
+    # 浏览页同时渲染筛选项的分类计数和价格分布
+    if rng.random() < 0.5:
+        facet_params = {k: v for k, v in params.items() if k in ("keyword", "category_id", "min_price", "max_price")}
+        await recorder.request(client, "GET /api/products/facets", "GET", "/api/products/facets",
+                               params=facet_params, headers=user["headers"])
+    # 一部分用户继续翻到第二页
+    if use_cursor and response is not None and response.status_code == 200 and rng.random() < 0.3:
+        next_cursor = response.json().get("next_cursor")
+        if next_cursor:
+            await recorder.request(client, "GET /api/products/available", "GET", "/api/products/available",
+                                   params={**params, "cursor": next_cursor}, headers=user["headers"])
+
+async def detail(client, recorder, user, ctx, rng):
+    product_id, _ = rng.choice(ctx["all_products"])
+    await recorder.request(client, "GET /api/products/{product_id}", "GET", f"/api/products/{product_id}")
+
+async def login(client, recorder, user, ctx, rng):
+    await recorder.request(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                           json={"username": user["username"], "password": PASSWORD})
+
+async def buy(client, recorder, user, ctx, rng):
+    pool = ctx["products"]
+    # 从待售商品池中取一件别人发布的商品
+    for _ in range(len(pool)):
+        product_id, seller_id = pool.pop()
+        if seller_id != user["user_id"]:
+            break
+        pool.insert(0, (product_id, seller_id))
+    else:
+        await browse(client, recorder, user, ctx, rng)
+        return
+    # 并发下单被别人抢先时返回 400，属于正常结果
+    response = await recorder.request(client, "POST /api/transactions/", "POST", "/api/transactions/",
+                                      expected=(200, 400), json={"product_id": product_id},
+                                      headers=user["headers"])
+    if response is not None and response.status_code == 200:
+        transaction_id = response.json()["transaction_id"]
+        await recorder.request(client, "PUT /api/transactions/{transaction_id}/pay", "PUT",
+                               f"/api/transactions/{transaction_id}/pay", headers=user["headers"])
+
+async def my_transactions(client, recorder, user, ctx, rng):
+    params = {"page_size": 10}
+    if rng.random() < 0.5:
+        params["cursor"] = ""
+    await recorder.request(client, "GET /api/transactions/my", "GET", "/api/transactions/my",
+                           params=params, headers=user["headers"])
+
+ACTIONS = {
+    "browse": browse,
+    "detail": detail,
+    "my_transactions": my_transactions,
+    "buy": buy,
+    "login": login,
+}
+
+async def virtual_user(index, client, recorder, ctx, args, budget):
+    rng = random.Random(args.seed * 1000 + index)
+    user = ctx["users"][index]
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name] for name in names]
+    while budget[0] > 0:
+        budget[0] -= 1
+        action = rng.choices(names, weights)[0]
+        await ACTIONS[action](client, recorder, user, ctx, rng)
+
+# ----------------------------------------------------------------
+# 主流程
+# ----------------------------------------------------------------
+async def drive(client, args) -> dict:
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    ctx = await seed(client, args, rng)
+    ctx["all_products"] = list(ctx["products"])
+    print(f"准备数据完成：用户 {len(ctx['users'])} 个，商品 {len(ctx['products'])} 件，"
+          f"用时 {time.perf_counter() - start:.1f}s")
+
+    recorder = Recorder()
+    budget = [args.requests]
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        virtual_user(i, client, recorder, ctx, args, budget) for i in range(args.concurrency)
+    ))
+    return summarize(recorder, time.perf_counter() - start)
+
+async def run(args) -> dict:
+    import httpx
+
+    timeout = httpx.Timeout(60.0)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            return await drive(client, args)
+
+    # 进程内压测：导入应用前设置好数据库等配置
+    if not args.mysql:
+        os.environ["SQLITE_PATH"] = os.path.join(tempfile.mkdtemp(), "load_test.db")
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    os.environ.setdefault("SEARCH_INDEX_PATH", os.path.join(tempfile.mkdtemp(), "search_index.json"))
+
+    import main as app_module
+    from database import SessionLocal, IS_MYSQL
+    from database.models import Category
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with app_module.app.router.lifespan_context(app_module.app):
+        if not IS_MYSQL:
+            db = SessionLocal()
+            try:
+                db.add_all([Category(name=name) for name in ("教材书籍", "电子产品", "生活用品", "运动器材", "其他")])
+                db.commit()
+            finally:
+                db.close()
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=timeout) as client:
+            return await drive(client, args)
+
+def main():
+    args = parse_args()
+    summary = asyncio.run(run(args))
+    print_summary(summary)
+
+    commit = git_commit()
+    result = {
+        "meta": {
+            "commit": commit,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "target": args.url or ("mysql" if args.mysql else "sqlite"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "products": args.products,
+            "seed": args.seed,
+            "scenarios": SCENARIOS,
+        },
+        **summary,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {output}")
+
+    failed = summary["total"]["errors"] > 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"✗ {regression}")
+        failed = failed or bool(regressions)
+    if summary["total"]["errors"]:
+        print(f"✗ 有 {summary['total']['errors']} 个请求返回了非预期的状态码")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,212 @@
+import itertools
+import time
+from typing import Dict, List, Optional
+from fastapi import Depends, Request
 from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
 from config import settings
 
-# 数据库引擎配置
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=False,  # 关闭SQL日志以减少输出
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    connect_args={
-        "charset": "utf8mb4",
-        "autocommit": False
-    }
-)
+IS_MYSQL = settings.DATABASE_URL.startswith("mysql")
+
+def _engine_options(url: str) -> dict:
+    """引擎公共参数，连接池大小等由 config.Settings 配置（本地 SQLite 使用驱动默认的连接池）"""
+    if not url.startswith("mysql"):
+        return dict(echo=False, pool_pre_ping=settings.DB_POOL_PRE_PING, connect_args={"timeout": 30})
+    return dict(
+        echo=False,  # 关闭SQL日志以减少输出
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        connect_args={
+            "charset": "utf8mb4",
+            "autocommit": False
+        }
+    )
+
+# 数据库引擎配置（同步引擎：建表、初始化脚本、启动时构建搜索索引等使用）
+engine = create_engine(settings.DATABASE_URL, **_engine_options(settings.DATABASE_URL))
+
+# 异步引擎：所有 async def 路由通过它访问数据库，不会阻塞事件循环
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **_engine_options(settings.ASYNC_DATABASE_URL))
 
 # 添加连接事件处理
-@event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
-    if 'mysql' in str(type(dbapi_connection)):
-        cursor = dbapi_connection.cursor()
+    cursor = dbapi_connection.cursor()
+    if IS_MYSQL:
         cursor.execute("SET sql_mode='STRICT_TRANS_TABLES'")
-        cursor.close()
+    else:
+        # 本地 SQLite：WAL 模式下读写互不阻塞，并发写入时等待锁而不是立即报错
+        cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
+
+event.listen(engine, "connect", set_sqlite_pragma)
+event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False：提交后仍可直接读取对象属性，避免隐式的同步懒加载
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
-def get_db():
+class ReplicaRouter:
+    """只读副本路由
+
+    - 只读会话按轮询分配到健康的副本；建立连接失败的副本在 retry_seconds 内不再分配
+    - 读己之写：用户通过主库会话提交过写操作后，sticky_seconds 内该用户的读请求仍走主库，
+      避免副本复制延迟导致刚写入的数据读不到（记录在进程内，多 worker 部署时需要负载均衡按用户粘滞）
+    - 没有配置副本或所有副本都不可用时，由调用方退回主库
+    """
+
+    def __init__(self, urls: List[str], sticky_seconds: int, retry_seconds: int):
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self.replicas = []
+        for url in urls:
+            replica_engine = create_async_engine(url, **_engine_options(url))
+            event.listen(replica_engine.sync_engine, "connect", set_sqlite_pragma)
+            self.replicas.append({
+                "name": replica_engine.url.render_as_string(hide_password=True),
+                "engine": replica_engine,
+                "sessionmaker": async_sessionmaker(
+                    replica_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+                ),
+                "down_until": 0.0,
+                "sessions": 0,
+                "failures": 0,
+                "last_error": None,
+            })
+        self._cycle = itertools.cycle(range(len(self.replicas))) if self.replicas else None
+        self._last_write: Dict[str, float] = {}
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    # ------------------------------------------------------------
+    # 读己之写
+    # ------------------------------------------------------------
+    def mark_write(self, key: Optional[str]):
+        if not key or not self.enabled:
+            return
+        now = time.monotonic()
+        self._last_write[key] = now + self.sticky_seconds
+        if len(self._last_write) > 10000:
+            self._last_write = {k: v for k, v in self._last_write.items() if v > now}
+
+    def is_sticky(self, key: Optional[str]) -> bool:
+        expires = self._last_write.get(key) if key else None
+        return expires is not None and expires > time.monotonic()
+
+    # ------------------------------------------------------------
+    # 分配副本
+    # ------------------------------------------------------------
+    async def open_session(self) -> Optional[AsyncSession]:
+        """返回一个已连上副本的会话；没有可用副本时返回 None"""
+        now = time.monotonic()
+        for _ in range(len(self.replicas)):
+            replica = self.replicas[next(self._cycle)]
+            if replica["down_until"] > now:
+                continue
+            session = replica["sessionmaker"]()
+            try:
+                # 提前取得连接，副本不可用时在这里发现并换下一个
+                await session.connection()
+            except Exception as e:
+                await session.close()
+                replica["failures"] += 1
+                replica["down_until"] = now + self.retry_seconds
+                replica["last_error"] = str(e)
+                print(f"只读副本 {replica['name']} 不可用，{self.retry_seconds} 秒内改用其他副本或主库: {e}")
+                continue
+            replica["sessions"] += 1
+            return session
+        return None
+
+    @property
+    def engines(self):
+        return [replica["engine"] for replica in self.replicas]
+
+    async def dispose(self):
+        for replica in self.replicas:
+            await replica["engine"].dispose()
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": [
+                {
+                    "name": replica["name"],
+                    "healthy": replica["down_until"] <= now,
+                    "sessions": replica["sessions"],
+                    "failures": replica["failures"],
+                    "last_error": replica["last_error"],
+                }
+                for replica in self.replicas
+            ],
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+        }
+
+
+replica_router = ReplicaRouter(
+    [url.strip() for url in settings.DB_REPLICA_URLS.split(",") if url.strip()],
+    sticky_seconds=settings.DB_REPLICA_STICKY_SECONDS,
+    retry_seconds=settings.DB_REPLICA_RETRY_SECONDS,
+)
+
+def _write_key(request: Request) -> Optional[str]:
+    """读己之写按登录凭证区分用户"""
+    return request.headers.get("authorization")
+
+@event.listens_for(Session, "after_commit")
+def _remember_write(session):
+    # 主库会话提交后，该用户后续的读请求在一段时间内走主库
+    replica_router.mark_write(session.info.get("write_key"))
+
+async def get_db(request: Request):
+    """FastAPI 依赖：每个请求一个异步会话（主库）"""
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info["write_key"] = _write_key(request)
+        yield db
+
+async def get_read_db(request: Request, db: AsyncSession = Depends(get_db)):
+    """FastAPI 依赖：只读路由使用的会话
+
+    配置了 DB_REPLICA_URLS 时轮询分配到健康的只读副本；该用户刚写过数据或副本都不可用时使用主库会话。
+    """
+    if not replica_router.enabled:
+        yield db
+        return
+    if replica_router.is_sticky(_write_key(request)):
+        replica_router.sticky_reads += 1
+        yield db
+        return
+    session = await replica_router.open_session()
+    if session is None:
+        replica_router.primary_reads += 1
+        yield db
+        return
+    try:
+        yield session
+    finally:
+        await session.close()
+
+async def read_session() -> AsyncSession:
+    """后台任务和流式导出使用的只读会话（副本优先，不可用时为主库），用完需要关闭"""
+    if replica_router.enabled:
+        session = await replica_router.open_session()
+        if session is not None:
+            return session
+        replica_router.primary_reads += 1
+    return AsyncSessionLocal()
+
+def get_sync_db():
+    """同步会话，供脚本和后台任务使用"""
     db = SessionLocal()
     try:
         yield db
@@ -46,4 +226,4 @@ def test_connection():
         return True
     except Exception as e:
         print(f"数据库连接测试失败: {e}")
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,15 @@
+"""
+商品变更日志（product_changes 表）的写入
+
+修改商品的操作在提交前调用 record_product_changes，与商品的修改处于同一事务；
+各进程的搜索索引由 search/sync.py 按变更日志同步。
+"""
+
+from typing import Iterable
+from sqlalchemy import insert
+from .models import ProductChange
+
+async def record_product_changes(db, product_ids: Iterable[str]):
+    product_ids = list(dict.fromkeys(product_ids))
+    if product_ids:
+        await db.execute(insert(ProductChange), [{"product_id": product_id} for product_id in product_ids])
@@ -0,0 +1,230 @@
+"""
+在售商品读模型（product_listings 表）的维护
+
+写操作在提交前调用这里的函数，与 products 表的修改处于同一事务：
+- add_listings：新发布的商品（INSERT ... SELECT，只有 status=1 的商品会写入）
+- remove_listings：下单、下架等使商品离开在售状态的操作
+- refresh_listings：修改商品、订单超时释放等状态或内容可能变化的操作（先删后插）
+- update_seller_listings：卖家修改手机号
+调用前需要先 flush，让 INSERT ... SELECT 读到本事务中未提交的修改。
+add_listings / remove_listings 同时增减分面计数（facet_counts 表），计数与读模型总是一起提交。
+
+rebuild_listings / check_listings 供启动时和 rebuild_listings.py 使用，
+check_facet_counts / repair_facet_counts 供分面计数的定期核对使用（同步连接）。
+"""
+
+import random
+from bisect import bisect_right
+from typing import Dict, Iterable, List
+from sqlalchemy import select, insert, delete, update, func, case, literal_column
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from config import settings
+from . import IS_MYSQL
+from .models import Product, User, Category, ProductListing, FacetCount
+
+# 价格分布的分桶边界（分），第一个桶从 0 开始，最后一个桶没有上限
+BUCKET_EDGES = sorted({int(edge) for edge in settings.FACET_PRICE_BUCKETS.split(",") if edge.strip() and int(edge) > 0})
+FACET_COLUMNS = ["category_id", "bucket_min", "slot", "listing_count"]
+
+LISTING_COLUMNS = [
+    "product_id", "name", "description", "price", "created_at", "seller_id",
+    "category_id", "image_path", "seller_username", "seller_phone", "category_name",
+]
+
+def _source():
+    """读模型应有的内容：status=1 的商品关联卖家和分类"""
+    return select(
+        Product.product_id,
+        Product.name,
+        Product.description,
+        Product.price,
+        Product.created_at,
+        Product.seller_id,
+        Product.category_id,
+        Product.image_path,
+        User.username,
+        User.phone,
+        Category.name,
+    ).join(User, Product.seller_id == User.user_id)\
+     .join(Category, Product.category_id == Category.id)\
+     .where(Product.status == 1)
+
+def bucket_min(price):
+    """价格所在分桶的下限（边界写成 SQL 字面量，SELECT 和 GROUP BY 中的表达式完全相同）"""
+    if not BUCKET_EDGES:
+        return literal_column("0")
+    return case(
+        *[(price >= literal_column(str(edge)), literal_column(str(edge))) for edge in reversed(BUCKET_EDGES)],
+        else_=literal_column("0")
+    )
+
+def price_bucket(price: int) -> int:
+    """与 bucket_min 相同，在 Python 中计算"""
+    i = bisect_right(BUCKET_EDGES, price)
+    return BUCKET_EDGES[i - 1] if i else 0
+
+def _listing_counts():
+    """读模型中各 (分类, 价格分桶) 的商品数"""
+    bucket = bucket_min(ProductListing.price)
+    return select(ProductListing.category_id, bucket, func.count())\
+        .group_by(ProductListing.category_id, bucket)
+
+def _increment_counts():
+    """累加计数的 upsert：行不存在时插入，存在时 listing_count 加上给定值"""
+    facets = FacetCount.__table__
+    if IS_MYSQL:
+        statement = mysql_insert(facets)
+        return statement.on_duplicate_key_update(
+            listing_count=facets.c.listing_count + statement.inserted.listing_count
+        )
+    statement = sqlite_insert(facets)
+    return statement.on_conflict_do_update(
+        index_elements=["category_id", "bucket_min", "slot"],
+        set_={"listing_count": facets.c.listing_count + statement.excluded.listing_count}
+    )
+
+async def _change_counts(db, product_ids: List[str], sign: int, lock: bool = False):
+    """按读模型中这些商品的分类和价格增减分面计数，返回找到的商品数
+
+    只读取本次写入的几行，在 Python 中按分桶汇总后用一条 upsert（executemany）累加到随机选的一个分片上；
+    同一事务的各分桶用同一个分片并按主键顺序写入，并发事务之间不会互相死锁。
+    """
+    query = select(ProductListing.category_id, ProductListing.price)\
+        .where(ProductListing.product_id.in_(product_ids))
+    rows = (await db.execute(query.with_for_update() if lock else query)).all()
+    counts: Dict[tuple, int] = {}
+    for category_id, price in rows:
+        key = (category_id, price_bucket(price))
+        counts[key] = counts.get(key, 0) + sign
+    if counts:
+        slot = random.randrange(max(settings.FACET_COUNTER_SLOTS, 1))
+        await db.execute(_increment_counts(), [
+            {"category_id": category_id, "bucket_min": bucket, "slot": slot, "listing_count": count}
+            for (category_id, bucket), count in sorted(counts.items())
+        ])
+    return len(rows)
+
+async def add_listings(db, product_ids: Iterable[str]):
+    product_ids = list(product_ids)
+    if product_ids:
+        await db.execute(insert(ProductListing).from_select(
+            LISTING_COLUMNS, _source().where(Product.product_id.in_(product_ids))
+        ))
+        await _change_counts(db, product_ids, 1)
+
+async def remove_listings(db, product_ids: Iterable[str]):
+    product_ids = list(product_ids)
+    # 先锁住要删除的行并从计数中减去，再删除
+    if product_ids and await _change_counts(db, product_ids, -1, lock=True):
+        await db.execute(
+            delete(ProductListing).where(ProductListing.product_id.in_(product_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+async def refresh_listings(db, product_ids: Iterable[str]):
+    product_ids = list(product_ids)
+    await remove_listings(db, product_ids)
+    await add_listings(db, product_ids)
+
+async def update_seller_listings(db, seller_id: str, **values):
+    """卖家信息（seller_phone 等）变化时同步到其所有在售商品"""
+    await db.execute(
+        update(ProductListing).where(ProductListing.seller_id == seller_id).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+# ------------------------------------------------------------
+# 重建与一致性检查（同步连接）
+# ------------------------------------------------------------
+def rebuild_listings(connection) -> int:
+    """清空读模型并从 products 表重新生成（分面计数一起重建），调用方负责提交"""
+    connection.execute(delete(ProductListing))
+    connection.execute(insert(ProductListing).from_select(LISTING_COLUMNS, _source()))
+    rebuild_facet_counts(connection)
+    return connection.execute(select(func.count()).select_from(ProductListing)).scalar()
+
+def rebuild_facet_counts(connection):
+    """从读模型重新统计分面计数（都写在分片 0），调用方负责提交"""
+    bucket = bucket_min(ProductListing.price)
+    connection.execute(delete(FacetCount))
+    connection.execute(insert(FacetCount).from_select(FACET_COLUMNS, select(
+        ProductListing.category_id, bucket, literal_column("0"), func.count()
+    ).group_by(ProductListing.category_id, bucket)))
+
+def facet_counts_need_rebuild(connection) -> bool:
+    """分面计数为空而读模型中有商品，或修改了 FACET_PRICE_BUCKETS 后分桶与配置不一致"""
+    buckets = set(connection.execute(select(FacetCount.bucket_min).distinct()).scalars())
+    if buckets:
+        return not buckets <= {0, *BUCKET_EDGES}
+    return connection.execute(select(ProductListing.product_id).limit(1)).first() is not None
+
+def check_facet_counts(connection) -> List[Dict[str, int]]:
+    """比较分面计数（各分片之和）和读模型的实际统计，返回不一致的 (分类, 分桶)"""
+    expected = {(row[0], row[1]): row[2] for row in connection.execute(_listing_counts())}
+    actual = {
+        (row[0], row[1]): row[2] for row in connection.execute(
+            select(FacetCount.category_id, FacetCount.bucket_min, func.sum(FacetCount.listing_count))
+            .group_by(FacetCount.category_id, FacetCount.bucket_min)
+        )
+    }
+    return [
+        {"category_id": key[0], "bucket_min": key[1], "expected": expected.get(key, 0), "actual": actual.get(key, 0)}
+        for key in sorted(set(expected) | set(actual))
+        if expected.get(key, 0) != actual.get(key, 0)
+    ]
+
+def repair_facet_counts(connection, mismatches: List[Dict[str, int]]):
+    """把 check_facet_counts 找到的差额累加到分片 0，调用方负责提交
+
+    累加而不是覆盖：核对之后提交的正常写入同时修改读模型和计数，不改变差额。
+    """
+    if mismatches:
+        connection.execute(_increment_counts(), [
+            {"category_id": row["category_id"], "bucket_min": row["bucket_min"], "slot": 0,
+             "listing_count": row["expected"] - row["actual"]}
+            for row in mismatches
+        ])
+
+def listings_need_rebuild(connection) -> bool:
+    """读模型为空而 products 中有在售商品（新部署或数据由脚本直接写入）"""
+    if connection.execute(select(ProductListing.product_id).limit(1)).first():
+        return False
+    return connection.execute(select(Product.product_id).where(Product.status == 1).limit(1)).first() is not None
+
+def check_listings(connection, sample_size: int = 10) -> Dict[str, object]:
+    """逐行比较读模型和应有内容（两边都按 product_id 顺序流式读取后归并），返回缺失、多余和内容不一致的商品"""
+    expected = connection.execution_options(stream_results=True).execute(
+        _source().order_by(Product.product_id)
+    )
+    actual = connection.execution_options(stream_results=True).execute(
+        select(*(getattr(ProductListing, column) for column in LISTING_COLUMNS)).order_by(ProductListing.product_id)
+    )
+    missing: List[str] = []
+    extra: List[str] = []
+    stale: List[str] = []
+    counts = {"missing": 0, "extra": 0, "stale": 0, "checked": 0}
+
+    def record(kind, bucket, product_id):
+        counts[kind] += 1
+        if len(bucket) < sample_size:
+            bucket.append(product_id)
+
+    expected_row = expected.fetchone()
+    actual_row = actual.fetchone()
+    while expected_row is not None or actual_row is not None:
+        if actual_row is None or (expected_row is not None and expected_row[0] < actual_row[0]):
+            record("missing", missing, expected_row[0])
+            expected_row = expected.fetchone()
+        elif expected_row is None or actual_row[0] < expected_row[0]:
+            record("extra", extra, actual_row[0])
+            actual_row = actual.fetchone()
+        else:
+            counts["checked"] += 1
+            if tuple(expected_row) != tuple(actual_row):
+                record("stale", stale, expected_row[0])
+            expected_row = expected.fetchone()
+            actual_row = actual.fetchone()
+    expected.close()
+    actual.close()
+    return {**counts, "missing_ids": missing, "extra_ids": extra, "stale_ids": stale}
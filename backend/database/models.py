@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, TIMESTAMP, ForeignKey, DateTime, SmallInteger
+from sqlalchemy import desc, Column, String, Integer, BigInteger, Text, TIMESTAMP, ForeignKey, DateTime, SmallInteger, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from . import Base
@@ -13,6 +13,12 @@ class User(Base):
     campus_card = Column(String(20), nullable=False)
     created_at = Column(TIMESTAMP, default=func.now())
     
+    # 索引与 schema.sql 保持一致（benchmarks/check_query_plans.py 会检查）
+    __table_args__ = (
+        Index("idx_users_phone", "phone"),  # 注册时检查手机号是否已被占用
+        Index("idx_users_campus_card", "campus_card"),  # 注册时检查校园卡号是否已被占用
+    )
+    
     # 关系
     products_sold = relationship("Product", foreign_keys="Product.seller_id", back_populates="seller")
     transactions_as_buyer = relationship("Transaction", foreign_keys="Transaction.buyer_id", back_populates="buyer")
@@ -42,6 +48,12 @@ class Product(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=False)
     image_path = Column(String(255))
     
+    __table_args__ = (
+        Index("idx_products_seller_time", "seller_id", "created_at"),  # 我的商品：按卖家筛选、按发布时间倒序
+        Index("idx_category", "category_id"),  # 分类外键
+        Index("idx_image_path", "image_path"),  # 图片回收时统计引用
+    )
+    
     # 关系
     seller = relationship("User", foreign_keys=[seller_id], back_populates="products_sold")
     category = relationship("Category", back_populates="products")
@@ -53,12 +65,109 @@ class Transaction(Base):
     transaction_id = Column(String(15), primary_key=True)
     created_at = Column(TIMESTAMP, default=func.now())
     amount = Column(Integer, nullable=False)  # 支付金额，单位：分
-    status = Column(SmallInteger, nullable=False, default=0)  # 0-未支付，1-已成交
+    status = Column(SmallInteger, nullable=False, default=0)  # 0-未支付，1-已成交，2-已过期（超时未支付）
     buyer_id = Column(String(10), ForeignKey("users.user_id"), nullable=False)
     seller_id = Column(String(10), ForeignKey("users.user_id"), nullable=False)
     product_id = Column(String(12), ForeignKey("products.product_id"), nullable=False)
     
+    __table_args__ = (
+        # 我的交易：买家侧和卖家侧分别沿索引按 (created_at, transaction_id) 倒序取数据，不需要额外排序
+        Index("idx_buyer_time", "buyer_id", "created_at", "transaction_id"),
+        Index("idx_seller_time", "seller_id", "created_at", "transaction_id"),
+        Index("idx_product", "product_id"),  # 下架商品时检查是否有交易
+        Index("idx_status", "status"),  # 启动时加载未支付订单、定期查找超时未处理的订单
+    )
+    
     # 关系
     buyer = relationship("User", foreign_keys=[buyer_id], back_populates="transactions_as_buyer")
     seller = relationship("User", foreign_keys=[seller_id], back_populates="transactions_as_seller")
-    product = relationship("Product", back_populates="transactions")
\ No newline at end of file
+    product = relationship("Product", back_populates="transactions")
+
+class ProductListing(Base):
+    """在售商品读模型：只保存 status=1 的商品，卖家和分类信息冗余存储
+
+    浏览商品时只查这一张表，不再关联 users 和 categories；每种排序方式都有对应的索引。
+    商品的发布、修改、下架、下单和订单超时释放与本表的维护在同一事务中完成（见 database/listings.py），
+    rebuild_listings.py 可以检查一致性或整表重建。
+    """
+    __tablename__ = "product_listings"
+    
+    product_id = Column(String(12), primary_key=True)
+    name = Column(String(20), nullable=False)
+    description = Column(Text)
+    price = Column(Integer, nullable=False)  # 价格，单位：分
+    created_at = Column(TIMESTAMP)
+    seller_id = Column(String(10), nullable=False)
+    category_id = Column(Integer, nullable=False)
+    image_path = Column(String(255))
+    seller_username = Column(String(20), nullable=False)
+    seller_phone = Column(String(11), nullable=False)
+    category_name = Column(String(50), nullable=False)
+    
+    __table_args__ = (
+        # sort_by=newest / price_asc / price_desc，以及按分类筛选后的同样排序；
+        # 同价格时按发布时间倒序，price_desc 反向扫描 idx_listing_price，price_asc 正向扫描 idx_listing_price_asc
+        Index("idx_listing_newest", "created_at", "product_id"),
+        Index("idx_listing_price", "price", "created_at", "product_id"),
+        Index("idx_listing_price_asc", "price", desc("created_at"), desc("product_id")),
+        Index("idx_listing_category_newest", "category_id", "created_at", "product_id"),
+        Index("idx_listing_category_price", "category_id", "price", "created_at", "product_id"),
+        Index("idx_listing_category_price_asc", "category_id", "price", desc("created_at"), desc("product_id")),
+        Index("idx_listing_seller", "seller_id"),  # 卖家修改手机号时更新
+    )
+
+class FacetCount(Base):
+    """在售商品的分面计数：每个 (分类, 价格分桶) 最多 FACET_COUNTER_SLOTS 行，读取时相加
+
+    与 product_listings 在同一事务中增减（database/listings.py），所有 worker 和服务器读到的计数相同；
+    每个写事务随机累加其中一行，同一分桶的并发下单、发布不会都等待同一行的锁。单行的计数可能为负。
+    """
+    __tablename__ = "facet_counts"
+    
+    category_id = Column(Integer, primary_key=True, autoincrement=False)
+    bucket_min = Column(Integer, primary_key=True, autoincrement=False)  # 价格分桶的下限（分）：0 或 FACET_PRICE_BUCKETS 中的边界
+    slot = Column(Integer, primary_key=True, autoincrement=False)  # 0 到 FACET_COUNTER_SLOTS-1
+    listing_count = Column(Integer, nullable=False, default=0)
+
+class ProductChange(Base):
+    """商品变更日志：每次修改商品时在同一事务中写入一行
+
+    搜索索引保存在每个进程的内存中，各进程定期读取本表，把其他进程（其他 worker 或其他服务器）
+    写入的商品变化同步到自己的索引（见 search/sync.py）。超过保留时间的记录由同步任务删除。
+    """
+    __tablename__ = "product_changes"
+    
+    change_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    product_id = Column(String(12), nullable=False)
+    changed_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        Index("idx_changes_time", "changed_at"),  # 按时间读取新的变化、删除过期记录
+    )
+
+class IdWorkerLease(Base):
+    """ID 生成器的 worker id 租约：每个进程占用一行并定期续约，多台服务器上的进程也不会使用相同的 worker id
+
+    见 utils/id_generator.py 中的 WorkerIdAllocator。
+    """
+    __tablename__ = "id_worker_leases"
+    
+    worker_id = Column(Integer, primary_key=True, autoincrement=False)
+    owner = Column(String(100), nullable=False)  # 主机名:进程号:随机串
+    renewed_at = Column(TIMESTAMP, nullable=False)
+
+class ImageThumbnail(Base):
+    """已生成的缩略图：上传后生成完或回填脚本生成时写入一行
+
+    序列化商品时只查进程内的缓存，缓存中没有的图片在后台批量从本表读取，不在请求中读取清单文件。
+    见 utils/thumbnails.py 中的 ThumbnailPipeline。
+    """
+    __tablename__ = "image_thumbnails"
+    
+    image_path = Column(String(255), primary_key=True)  # 原图文件名，与 products.image_path 相同
+    variants = Column(Text, nullable=False)  # JSON：{尺寸: {格式: 相对 uploads 目录的路径}}
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    
+    __table_args__ = (
+        Index("idx_thumbnails_time", "created_at"),  # 启动时预加载最近生成的缩略图
+    )
@@ -11,6 +11,9 @@ CREATE TABLE IF NOT EXISTS categories (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间'
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='商品分类表';
 
+-- 索引按实际查询的形状设计，与 backend/database/models.py 中声明的完全一致（SQLite 的索引名全库唯一，不同表不能重名）；
+-- 修改后运行 python benchmarks/check_query_plans.py 检查两处是否同步、各接口的查询是否走索引
+
 -- 用户表
 CREATE TABLE IF NOT EXISTS users (
     user_id VARCHAR(10) NOT NULL PRIMARY KEY COMMENT '用户ID，系统生成',
@@ -18,7 +21,9 @@ CREATE TABLE IF NOT EXISTS users (
     password VARCHAR(64) NOT NULL COMMENT '密码，加密存储',
     phone VARCHAR(11) NOT NULL COMMENT '联系电话',
     campus_card VARCHAR(20) NOT NULL COMMENT '校园卡号/学号',
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '注册时间'
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '注册时间',
+    INDEX idx_users_phone (phone),
+    INDEX idx_users_campus_card (campus_card)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='用户表';
 
 -- 商品表
@@ -32,11 +37,9 @@ CREATE TABLE IF NOT EXISTS products (
     seller_id VARCHAR(10) NOT NULL COMMENT '卖家ID',
     category_id INT NOT NULL COMMENT '分类ID',
     image_path VARCHAR(255) DEFAULT NULL COMMENT '商品照片存储路径',
-    INDEX idx_seller (seller_id),
+    INDEX idx_products_seller_time (seller_id, created_at),
     INDEX idx_category (category_id),
-    INDEX idx_status (status),
-    INDEX idx_created_at (created_at DESC),
-    INDEX idx_name_price (name, price),
+    INDEX idx_image_path (image_path),
     FOREIGN KEY (seller_id) REFERENCES users(user_id) ON DELETE CASCADE,
     FOREIGN KEY (category_id) REFERENCES categories(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='商品表';
@@ -46,12 +49,12 @@ CREATE TABLE IF NOT EXISTS transactions (
     transaction_id VARCHAR(15) NOT NULL PRIMARY KEY COMMENT '交易ID，系统生成',
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '交易时间',
     amount INT NOT NULL COMMENT '支付金额，单位：分',
-    status TINYINT NOT NULL DEFAULT 0 COMMENT '交易状态：0-未完成支付，1-已成交',
+    status TINYINT NOT NULL DEFAULT 0 COMMENT '交易状态：0-未完成支付，1-已成交，2-已过期（超时未支付）',
     buyer_id VARCHAR(10) NOT NULL COMMENT '买家ID',
     seller_id VARCHAR(10) NOT NULL COMMENT '卖家ID',
     product_id VARCHAR(12) NOT NULL COMMENT '商品ID',
-    INDEX idx_buyer_time (buyer_id, created_at DESC),
-    INDEX idx_seller_time (seller_id, created_at DESC),
+    INDEX idx_buyer_time (buyer_id, created_at, transaction_id),
+    INDEX idx_seller_time (seller_id, created_at, transaction_id),
     INDEX idx_product (product_id),
     INDEX idx_status (status),
     FOREIGN KEY (buyer_id) REFERENCES users(user_id) ON DELETE CASCADE,
@@ -59,6 +62,62 @@ CREATE TABLE IF NOT EXISTS transactions (
     FOREIGN KEY (product_id) REFERENCES products(product_id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='交易记录表';
 
+-- 在售商品读模型：只保存 status=1 的商品，卖家和分类信息冗余存储，浏览商品时单表查询
+-- 由商品的写操作在同一事务中维护（backend/database/listings.py），python rebuild_listings.py 检查或重建
+CREATE TABLE IF NOT EXISTS product_listings (
+    product_id VARCHAR(12) NOT NULL PRIMARY KEY COMMENT '商品ID',
+    name VARCHAR(20) NOT NULL COMMENT '商品名称',
+    description TEXT DEFAULT NULL COMMENT '商品描述',
+    price INT NOT NULL COMMENT '商品价格，单位：分',
+    created_at TIMESTAMP NULL DEFAULT NULL COMMENT '发布时间（与商品表相同）',
+    seller_id VARCHAR(10) NOT NULL COMMENT '卖家ID',
+    category_id INT NOT NULL COMMENT '分类ID',
+    image_path VARCHAR(255) DEFAULT NULL COMMENT '商品照片存储路径',
+    seller_username VARCHAR(20) NOT NULL COMMENT '卖家用户名',
+    seller_phone VARCHAR(11) NOT NULL COMMENT '卖家联系电话',
+    category_name VARCHAR(50) NOT NULL COMMENT '分类名称',
+    INDEX idx_listing_newest (created_at, product_id),
+    INDEX idx_listing_price (price, created_at, product_id),
+    INDEX idx_listing_price_asc (price, created_at DESC, product_id DESC),
+    INDEX idx_listing_category_newest (category_id, created_at, product_id),
+    INDEX idx_listing_category_price (category_id, price, created_at, product_id),
+    INDEX idx_listing_category_price_asc (category_id, price, created_at DESC, product_id DESC),
+    INDEX idx_listing_seller (seller_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='在售商品读模型';
+
+-- 在售商品的分面计数：每个 (分类, 价格分桶) 分成最多 FACET_COUNTER_SLOTS 行，读取时相加；
+-- 与 product_listings 在同一事务中增减（backend/database/listings.py）
+CREATE TABLE IF NOT EXISTS facet_counts (
+    category_id INT NOT NULL COMMENT '分类ID',
+    bucket_min INT NOT NULL COMMENT '价格分桶的下限，单位：分',
+    slot INT NOT NULL COMMENT '计数分片',
+    listing_count INT NOT NULL DEFAULT 0 COMMENT '在售商品数（单个分片可能为负）',
+    PRIMARY KEY (category_id, bucket_min, slot)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='在售商品分面计数';
+
+-- 商品变更日志：修改商品时在同一事务中写入，各进程据此同步内存中的搜索索引（backend/search/sync.py）
+CREATE TABLE IF NOT EXISTS product_changes (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '变更ID',
+    product_id VARCHAR(12) NOT NULL COMMENT '商品ID',
+    changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '变更时间',
+    INDEX idx_changes_time (changed_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='商品变更日志';
+
+-- ID 生成器的 worker id 租约：每个服务进程占用一行并定期续约（backend/utils/id_generator.py）
+CREATE TABLE IF NOT EXISTS id_worker_leases (
+    worker_id INT NOT NULL PRIMARY KEY COMMENT 'worker id',
+    owner VARCHAR(100) NOT NULL COMMENT '持有者（主机名:进程号:随机串）',
+    renewed_at TIMESTAMP NOT NULL COMMENT '最近一次续约时间'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='worker id 租约';
+
+-- 已生成的缩略图：上传后生成完或回填脚本生成时写入（backend/utils/thumbnails.py）
+CREATE TABLE IF NOT EXISTS image_thumbnails (
+    image_path VARCHAR(255) NOT NULL PRIMARY KEY COMMENT '原图文件名',
+    variants TEXT NOT NULL COMMENT '缩略图 JSON：{尺寸: {格式: 路径}}',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '生成时间',
+    INDEX idx_thumbnails_time (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='已生成的缩略图';
+
 -- 创建视图：商品浏览视图（只显示正常状态的商品）
 CREATE OR REPLACE VIEW view_products_available AS
 SELECT 
@@ -123,8 +182,3 @@ INSERT INTO categories (name, description) VALUES
 ('服装鞋包', '衣服、鞋子、包包等'),
 ('运动器材', '球类、健身器材等'),
 ('其他', '其他类型的商品');
-
--- 为用户表添加额外索引
-CREATE INDEX idx_users_username ON users(username);
-CREATE INDEX idx_users_campus_card ON users(campus_card);
-CREATE INDEX idx_users_phone ON users(phone);
\ No newline at end of file
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+图片回收脚本
+删除超过宽限期（IMAGE_GC_GRACE_HOURS）仍未被任何商品引用的图片及其缩略图
+服务运行时会按 IMAGE_GC_INTERVAL_MINUTES 自动执行，这里用于手动执行或预览
+
+用法：
+    python gc_uploads.py             # 执行回收
+    python gc_uploads.py --dry-run   # 只统计，不删除
+"""
+
+import argparse
+import asyncio
+from database import async_engine
+from utils.image_store import image_store
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+async def run(dry_run: bool):
+    try:
+        references = await image_store.reference_counts()
+        print(f"被商品引用的图片 {len(references)} 张，引用总数 {sum(references.values())}")
+        result = await image_store.collect(dry_run=dry_run)
+    finally:
+        await async_engine.dispose()
+    action = "可回收" if dry_run else "已删除"
+    print(f"✓ {action}未引用图片 {result['deleted']} 张，释放 {format_size(result['reclaimed_bytes'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="回收未被商品引用的图片")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    args = parser.parse_args()
+    asyncio.run(run(args.dry_run))
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,23 @@
 """
 数据库初始化脚本
 用于创建数据库和初始化数据
+
+用法：
+    python init_db.py                                   # 创建数据库、表结构和默认分类
+    python init_db.py --synthetic                       # 生成合成测试数据（默认 10 万用户 / 100 万商品 / 30 万交易）
+    python init_db.py --synthetic --users 1000000 --products 5000000 --transactions 2000000 --seed 7
+    python init_db.py --synthetic --load-data --reset   # 用 LOAD DATA LOCAL INFILE 导入，并先清空已有数据
 """
 
+import argparse
+import bisect
+import math
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
 import pymysql
 from config import settings
 
@@ -102,8 +117,333 @@ def check_data():
         print(f"✗ 数据检查失败：{e}")
         return False
 
+# ================================================================
+# 合成测试数据
+# ================================================================
+SYNTHETIC_PASSWORD = "password123"  # 所有合成用户的登录密码
+
+# 分类名: (热度权重, 价格中位数（元）, 价格离散度, 商品名用词)
+CATEGORY_PROFILES = {
+    "电子产品": (30, 800, 0.9, ["手机", "笔记本电脑", "平板", "耳机", "显示器", "机械键盘", "鼠标", "充电宝", "相机"]),
+    "书籍教材": (25, 25, 0.5, ["高等数学", "线性代数", "大学英语", "考研真题", "专业课教材", "C语言程序设计", "小说"]),
+    "生活用品": (20, 30, 0.7, ["台灯", "电风扇", "收纳箱", "床垫", "吹风机", "电热水壶", "晾衣架"]),
+    "服装鞋包": (12, 60, 0.7, ["运动鞋", "羽绒服", "双肩包", "卫衣", "牛仔裤", "帆布鞋"]),
+    "运动器材": (8, 80, 0.8, ["篮球", "羽毛球拍", "自行车", "哑铃", "瑜伽垫", "滑板"]),
+    "其他": (5, 40, 1.0, ["吉他", "手办", "绿植", "游戏卡带", "电动车头盔"]),
+}
+DEFAULT_PROFILE = (5, 50, 0.8, ["闲置物品"])
+CONDITIONS = ["全新", "九成新", "八成新", "自用", "毕业转让", "低价出", "几乎没用过", "急出"]
+
+SELLER_RATIO = 0.3  # 发布过商品的用户比例
+SELLER_ZIPF = 0.7  # 卖家发布量的长尾程度（越大越集中在少数卖家）
+GROWTH = 1.5  # 数据量随时间增长的程度，1 表示均匀分布
+
+USER_COLUMNS = ("user_id", "username", "password", "phone", "campus_card", "created_at")
+PRODUCT_COLUMNS = ("product_id", "name", "description", "price", "created_at", "status",
+                   "seller_id", "category_id", "image_path")
+TRANSACTION_COLUMNS = ("transaction_id", "created_at", "amount", "status", "buyer_id", "seller_id", "product_id")
+
+def spread_times(rng, count, start, end):
+    """在 [start, end) 之间生成 count 个非递减的时间戳（秒），越接近 end 越密集"""
+    span = end - start
+    exponent = 1 / GROWTH
+    for i in range(count):
+        yield start + span * ((i + rng.random()) / count) ** exponent
+
+def format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+class SQLiteWriter:
+    """SQLITE_PATH 模式：executemany 批量插入"""
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+    def categories(self):
+        return self.connection.execute("SELECT id, name FROM categories ORDER BY id").fetchall()
+
+    def count(self, table):
+        return self.connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def reset(self):
+        for table in ("product_listings", "transactions", "products", "users"):
+            self.connection.execute(f"DELETE FROM {table}")
+        self.connection.commit()
+
+    def write(self, table, columns, rows):
+        placeholders = ", ".join("?" * len(columns))
+        self.connection.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+class MySQLWriter:
+    """MySQL 模式：多行 INSERT（pymysql 的 executemany 会合并成多行 VALUES），或 LOAD DATA LOCAL INFILE"""
+
+    def __init__(self, load_data):
+        self.load_data = load_data
+        self.connection = pymysql.connect(
+            host=settings.DB_HOST,
+            port=settings.DB_PORT,
+            user=settings.DB_USER,
+            password=settings.DB_PASSWORD,
+            database=settings.DB_NAME,
+            charset='utf8mb4',
+            local_infile=load_data
+        )
+        with self.connection.cursor() as cursor:
+            # 导入期间跳过唯一性和外键检查（数据由生成器保证正确）
+            cursor.execute("SET SESSION unique_checks=0, foreign_key_checks=0")
+
+    def categories(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT id, name FROM categories ORDER BY id")
+            return cursor.fetchall()
+
+    def count(self, table):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            return cursor.fetchone()[0]
+
+    def reset(self):
+        with self.connection.cursor() as cursor:
+            for table in ("product_listings", "transactions", "products", "users"):
+                cursor.execute(f"TRUNCATE TABLE {table}")
+        self.connection.commit()
+
+    def write(self, table, columns, rows):
+        with self.connection.cursor() as cursor:
+            if self.load_data:
+                self._load_data(cursor, table, columns, rows)
+            else:
+                placeholders = ", ".join(["%s"] * len(columns))
+                cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})", rows)
+        self.connection.commit()
+
+    def _load_data(self, cursor, table, columns, rows):
+        def field(value):
+            if value is None:
+                return "\\N"
+            return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".tsv", delete=False) as f:
+            for row in rows:
+                f.write("\t".join(field(value) for value in row))
+                f.write("\n")
+        try:
+            cursor.execute(
+                f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+                f"FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' ({', '.join(columns)})",
+                (f.name,)
+            )
+        finally:
+            os.remove(f.name)
+
+    def close(self):
+        self.connection.close()
+
+def seed_synthetic_data(args):
+    """生成合成的用户、商品和交易数据，同样的参数和种子每次生成完全相同的数据"""
+    from utils.id_generator import HistoricalIdGenerator, EPOCH_MS
+    from utils.security import get_password_hash
+
+    if settings.SQLITE_PATH:
+        import database.models  # noqa: F401  注册模型后再建表
+        from database import create_tables
+        create_tables()
+        writer = SQLiteWriter(settings.SQLITE_PATH)
+        if not writer.categories():
+            writer.write("categories", ("name",), [(name,) for name in CATEGORY_PROFILES])
+    else:
+        writer = MySQLWriter(args.load_data)
+
+    try:
+        categories = writer.categories()
+        if not categories:
+            print("✗ 没有商品分类，请先运行 python init_db.py 创建表结构")
+            return False
+        if writer.count("users"):
+            if not args.reset:
+                print("✗ 数据库中已有用户数据，加 --reset 先清空用户、商品和交易表")
+                return False
+            writer.reset()
+            print("✓ 已清空用户、商品和交易表")
+
+        if args.transactions > args.products:
+            print(f"交易数不能超过商品数，已调整为 {args.products}")
+            args.transactions = args.products
+
+        rng = random.Random(args.seed)
+        # 按历史时间生成 ID，使用保留的 worker id，不与运行中服务生成的 ID 冲突
+        user_ids = HistoricalIdGenerator("", 10, 4)
+        product_ids = HistoricalIdGenerator("P", 12, 9)
+        transaction_ids = HistoricalIdGenerator("T", 15, 12)
+
+        now = datetime.strptime(args.until, "%Y-%m-%d").timestamp() if args.until else time.time()
+        end = now - 3600
+        start = max(end - args.days * 86400, EPOCH_MS / 1000 + 1)
+        password_hash = get_password_hash(SYNTHETIC_PASSWORD)
+        total_rows = 0
+        started = time.perf_counter()
+
+        def report(label, done, total):
+            elapsed = time.perf_counter() - started
+            print(f"  {label} {done}/{total}，累计 {total_rows} 行，{total_rows / elapsed * 60:,.0f} 行/分钟")
+
+        # 1. 用户
+        users = []
+        batch = []
+        for index, created in enumerate(spread_times(rng, args.users, start, end)):
+            user_id = user_ids.next_id(created)
+            users.append((user_id, created))
+            batch.append((
+                user_id,
+                f"user{index:07d}",
+                password_hash,
+                f"1{rng.choice('3456789')}{index:09d}",
+                f"{rng.randint(2018, 2025)}{index:08d}",
+                format_time(created),
+            ))
+            if len(batch) >= args.batch_size:
+                writer.write("users", USER_COLUMNS, batch)
+                total_rows += len(batch)
+                batch = []
+        if batch:
+            writer.write("users", USER_COLUMNS, batch)
+            total_rows += len(batch)
+        report("用户", args.users, args.users)
+
+        # 卖家：随机挑选一部分用户，发布量按 Zipf 分布集中在少数卖家
+        sellers = rng.sample(users, max(1, int(len(users) * SELLER_RATIO)))
+        seller_weights = []
+        cumulative = 0.0
+        for rank in range(len(sellers)):
+            cumulative += 1 / (rank + 1) ** SELLER_ZIPF
+            seller_weights.append(cumulative)
+
+        profiles = [(category_id, CATEGORY_PROFILES.get(name, DEFAULT_PROFILE)) for category_id, name in categories]
+        category_weights = []
+        cumulative = 0.0
+        for _, profile in profiles:
+            cumulative += profile[0]
+            category_weights.append(cumulative)
+
+        # 2. 商品和交易：按发布时间顺序生成，从 P 个商品中恰好抽取 T 个产生交易
+        pending_cutoff = now - settings.ORDER_PAYMENT_TIMEOUT_MINUTES * 60
+        products_batch = []
+        transactions_batch = []
+        remaining = args.transactions
+        for index, created in enumerate(spread_times(rng, args.products, start, end)):
+            seller_id, seller_created = sellers[bisect.bisect_left(seller_weights, rng.random() * seller_weights[-1])]
+            category_id, (_, median, sigma, words) = profiles[
+                bisect.bisect_left(category_weights, rng.random() * category_weights[-1])
+            ]
+            price = max(100, min(10_000_000, int(rng.lognormvariate(math.log(median), sigma) * 100)))
+            condition = rng.choice(CONDITIONS)
+            word = rng.choice(words)
+            product_id = product_ids.next_id(created)
+            status = 1 if rng.random() < 0.93 else 3  # 少量已下架
+
+            if rng.random() < remaining / (args.products - index):
+                remaining -= 1
+                buyer_id = seller_id
+                while buyer_id == seller_id:
+                    buyer_id = users[rng.randrange(len(users))][0]
+                paid_at = min(created + rng.expovariate(1 / (2 * 86400)), now - 60)
+                if paid_at > pending_cutoff:
+                    transaction_status, status = 0, 0  # 刚下单未支付，商品锁定
+                elif rng.random() < 0.85:
+                    transaction_status, status = 1, 2  # 已成交，商品已售出
+                else:
+                    transaction_status, status = 2, 1  # 超时取消，商品重新上架
+                # 交易 ID 的时间部分取商品发布时间，使 ID 按生成顺序单调递增、不重复
+                transactions_batch.append((
+                    transaction_ids.next_id(created),
+                    format_time(paid_at),
+                    price,
+                    transaction_status,
+                    buyer_id,
+                    seller_id,
+                    product_id,
+                ))
+
+            products_batch.append((
+                product_id,
+                f"{condition}{word}"[:20],
+                f"{condition}的{word}，校内当面交易" if rng.random() < 0.9 else None,
+                price,
+                format_time(created),
+                status,
+                seller_id,
+                category_id,
+                None,
+            ))
+            if len(products_batch) >= args.batch_size:
+                writer.write("products", PRODUCT_COLUMNS, products_batch)
+                total_rows += len(products_batch)
+                products_batch = []
+                if transactions_batch:
+                    writer.write("transactions", TRANSACTION_COLUMNS, transactions_batch)
+                    total_rows += len(transactions_batch)
+                    transactions_batch = []
+                if (index + 1) % (args.batch_size * 20) == 0 and index + 1 < args.products:
+                    report("商品", index + 1, args.products)
+        if products_batch:
+            writer.write("products", PRODUCT_COLUMNS, products_batch)
+            total_rows += len(products_batch)
+        if transactions_batch:
+            writer.write("transactions", TRANSACTION_COLUMNS, transactions_batch)
+            total_rows += len(transactions_batch)
+        report("商品", args.products, args.products)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✓ 生成完成：用户 {args.users}，商品 {args.products}，交易 {args.transactions}，"
+          f"共 {total_rows} 行，用时 {elapsed:.1f} 秒（{total_rows / elapsed * 60:,.0f} 行/分钟）")
+    print(f"  所有合成用户的密码均为 {SYNTHETIC_PASSWORD}")
+
+    # 数据直接写入了 products 表，重新生成在售商品读模型
+    from database import engine
+    from database.listings import rebuild_listings
+    started = time.perf_counter()
+    with engine.begin() as connection:
+        count = rebuild_listings(connection)
+    print(f"✓ 在售商品读模型已重建：{count} 件，用时 {time.perf_counter() - started:.1f} 秒")
+
+    # 搜索索引文件已过期，下次启动时从数据库重建
+    if os.path.exists(settings.SEARCH_INDEX_PATH):
+        os.remove(settings.SEARCH_INDEX_PATH)
+        print(f"  已删除过期的搜索索引文件 {settings.SEARCH_INDEX_PATH}")
+    return True
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="数据库初始化")
+    parser.add_argument("--synthetic", action="store_true", help="生成合成测试数据（需要已创建表结构）")
+    parser.add_argument("--users", type=int, default=100000, help="用户数")
+    parser.add_argument("--products", type=int, default=1000000, help="商品数")
+    parser.add_argument("--transactions", type=int, default=300000, help="交易数（每件商品最多一笔）")
+    parser.add_argument("--days", type=int, default=365, help="数据的时间跨度（天）")
+    parser.add_argument("--until", help="数据的截止日期 YYYY-MM-DD，默认当前时间；固定后同样的种子生成相同的数据（密码哈希的盐除外）")
+    parser.add_argument("--seed", type=int, default=42, help="随机数种子")
+    parser.add_argument("--batch-size", type=int, default=5000, help="每批写入的行数")
+    parser.add_argument("--load-data", action="store_true", help="MySQL 使用 LOAD DATA LOCAL INFILE 导入（服务端需开启 local_infile）")
+    parser.add_argument("--reset", action="store_true", help="先清空已有的用户、商品和交易数据")
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_args()
+    if args.synthetic:
+        print("=" * 50)
+        print("生成合成测试数据")
+        print("=" * 50)
+        seed_synthetic_data(args)
+        return
+
     print("=" * 50)
     print("数据库初始化脚本")
     print("=" * 50)
@@ -1,7 +1,7 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
+from sqlalchemy import text
 import os
 import sys
 
@@ -9,8 +9,21 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import settings
-from database import engine, Base, test_connection, create_tables
-from routers import auth, products, users, transactions, upload
+from database import engine, async_engine, Base, SessionLocal, test_connection, create_tables, replica_router
+from database.listings import listings_need_rebuild, rebuild_listings, facet_counts_need_rebuild, rebuild_facet_counts
+from search import load_or_build_index, save_index, index_sync
+from utils.principal_cache import principal_cache
+from utils.security import password_hasher, get_admin_user
+from utils.order_expiry import order_expiry
+from utils.thumbnails import thumbnail_pipeline
+from utils.image_store import image_store
+from utils.listing_facets import listing_facets
+from utils.id_generator import worker_ids
+from utils.metrics import metrics, MetricsMiddleware
+from utils.query_inspector import query_inspector, QueryInspectorMiddleware
+from utils.fast_json import FastJSONResponse
+from schemas.user import UserPrincipal
+from routers import auth, products, users, transactions, upload, exports
 
 # ----------------------------------------------------------------
 # 【修正】先定义 app 实例，然后才能使用 @app.on_event
@@ -18,7 +31,8 @@ from routers import auth, products, users, transactions, upload
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    description="校园二手商品交易系统API"
+    description="校园二手商品交易系统API",
+    default_response_class=FastJSONResponse  # orjson 编码，列表接口直接返回编码好的 JSON
 )
 
 # ----------------------------------------------------------------
@@ -35,6 +49,51 @@ def startup_db_init():
     print("正在创建数据库表...")
     create_tables()
     print("数据库初始化完成")
+    principal_cache.start()
+
+    # 在售商品读模型为空（新部署或数据由脚本直接导入）时从 products 表生成
+    with engine.begin() as connection:
+        if listings_need_rebuild(connection):
+            count = rebuild_listings(connection)
+            print(f"在售商品读模型已重建，共 {count} 件商品")
+        elif facet_counts_need_rebuild(connection):
+            rebuild_facet_counts(connection)
+            print("商品分面计数已重建")
+
+    if settings.SEARCH_INDEX_ENABLED:
+        db = SessionLocal()
+        try:
+            mode = load_or_build_index(db)
+            print(f"搜索索引已就绪（{'从磁盘加载' if mode == 'loaded' else '从数据库构建'}）")
+        finally:
+            db.close()
+
+@app.on_event("startup")
+async def startup_order_expiry():
+    worker_id = await worker_ids.start()
+    print(f"ID 生成器 worker id: {worker_id}")
+    count = await order_expiry.start()
+    print(f"未支付订单超时调度已启动，待处理订单 {count} 个")
+    image_store.start()
+    listing_facets.start()
+    count = await thumbnail_pipeline.start()
+    print(f"缩略图记录已预加载 {count} 条")
+    if settings.SEARCH_INDEX_ENABLED:
+        await index_sync.start()
+
+@app.on_event("shutdown")
+async def shutdown_cleanup():
+    await order_expiry.stop()
+    await image_store.stop()
+    await listing_facets.stop()
+    if settings.SEARCH_INDEX_ENABLED:
+        await index_sync.stop()
+        save_index()
+    password_hasher.shutdown()
+    thumbnail_pipeline.shutdown()
+    await worker_ids.stop()
+    await async_engine.dispose()
+    await replica_router.dispose()
 
 # 配置CORS
 app.add_middleware(
@@ -45,26 +104,83 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 静态文件服务
+# 请求与数据库指标，由 /metrics 导出
+if settings.METRICS_ENABLED:
+    metrics.instrument_engine(engine, "sync")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    for i, replica_engine in enumerate(replica_router.engines):
+        metrics.instrument_engine(replica_engine.sync_engine, f"replica{i}")
+    metrics.gauge("order_expiry_pending", "本进程队列中等待支付超时的订单数", lambda: order_expiry.pending)
+    app.add_middleware(MetricsMiddleware, registry=metrics)
+
+# 慢查询日志 / N+1 检测 / 查询预算
+if query_inspector.enabled:
+    query_inspector.instrument_engine(engine)
+    query_inspector.instrument_engine(async_engine.sync_engine)
+    for replica_engine in replica_router.engines:
+        query_inspector.instrument_engine(replica_engine.sync_engine)
+    app.add_middleware(QueryInspectorMiddleware, inspector=query_inspector)
+
+# 上传的图片统一由 /api/uploads 提供（routers/upload.py）
 if not os.path.exists(settings.UPLOAD_DIR):
     os.makedirs(settings.UPLOAD_DIR)
 
-app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads")
-
 # 注册路由
 app.include_router(auth.router, prefix="/api/auth", tags=["认证"])
 app.include_router(users.router, prefix="/api/users", tags=["用户"])
 app.include_router(products.router, prefix="/api/products", tags=["商品"])
 app.include_router(transactions.router, prefix="/api/transactions", tags=["交易"])
 app.include_router(upload.router, prefix="/api", tags=["文件上传"])
+app.include_router(exports.router, prefix="/api/exports", tags=["数据导出"])
 
 @app.get("/")
 async def root():
     return {"message": "校园二手商品交易系统API", "version": settings.VERSION}
 
+async def _database_status() -> str:
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return "connected"
+    except Exception as e:
+        print(f"健康检查：数据库连接失败: {e}")
+        return "disconnected"
+
 @app.get("/api/health")
 async def health_check():
-    return {"status": "healthy", "database": "connected"}
+    """存活检查（不需要登录）：只返回服务和数据库是否可用"""
+    database = await _database_status()
+    return {
+        "status": "healthy" if database == "connected" else "unhealthy",
+        "database": database
+    }
+
+@app.get("/api/health/details")
+async def health_details(admin: UserPrincipal = Depends(get_admin_user)):
+    """各缓存、后台任务、worker id 租约和只读副本的状态（管理员）
+
+    包含副本地址、错误信息等内部信息，不对外公开；数值类指标同样可以从 /metrics 抓取。
+    """
+    database = await _database_status()
+    return {
+        "status": "healthy" if database == "connected" else "unhealthy",
+        "database": database,
+        "auth_cache": principal_cache.stats(),
+        "order_expiry": order_expiry.stats(),
+        "thumbnails": thumbnail_pipeline.stats(),
+        "image_store": image_store.stats(),
+        "listing_facets": listing_facets.stats(),
+        "search_sync": index_sync.stats(),
+        "id_worker": worker_ids.stats(),
+        "queries": query_inspector.stats(),
+        "replicas": replica_router.stats()
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="未启用监控指标")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+已有数据库的结构升级（可重复运行）
+
+按 database/models.py 的定义把已部署的数据库（MySQL 或 SQLite）升级到当前版本：
+1. 创建缺少的表（product_listings、facet_counts、product_changes 等），新表的索引随表一起创建
+2. 已有的表补建缺少的索引；同名但列不同的索引重建（如 idx_buyer_time / idx_seller_time 增加了 transaction_id）
+3. 删除已被新索引代替的旧索引（OBSOLETE_INDEXES）；其他不在 models.py 中的索引只打印，不删除
+4. 主键变化的派生表（RESHAPED_TABLES，如 facet_counts 增加了 slot 列）删除后按新结构重建
+5. product_listings 为空而 products 中有在售商品时，从 products 表生成；facet_counts 为空时从 product_listings 统计
+每一步都先检查数据库的当前状态，已经升级过的数据库再次运行不会做任何修改。
+
+MySQL 上每张表的增删索引合并为一条 ALTER TABLE，外键依赖的索引（如 products.seller_id）在任何时刻都存在。
+大表建索引耗时较长，建议在低峰期运行，先用 --dry-run 查看将要执行的语句。
+
+用法：
+    python migrate_db.py              # 升级
+    python migrate_db.py --dry-run    # 只打印将要执行的语句
+"""
+
+import argparse
+import sys
+import time
+from sqlalchemy import inspect, text
+import database.models  # noqa: F401  注册模型后再建表
+from database import engine, Base, IS_MYSQL
+from database.listings import listings_need_rebuild, rebuild_listings, facet_counts_need_rebuild, rebuild_facet_counts
+
+# 已被代替的旧索引：(表名, 索引名) -> 原因
+OBSOLETE_INDEXES = {
+    ("products", "idx_seller"): "由 idx_products_seller_time(seller_id, created_at) 代替",
+    ("products", "idx_status"): "浏览商品改查 product_listings，不再按状态筛选商品表",
+    ("products", "idx_created_at"): "浏览商品改查 product_listings",
+    ("products", "idx_name_price"): "关键词搜索走倒排索引，回退查询为 LIKE '%关键词%'，用不到该索引",
+    ("users", "idx_users_username"): "username 已有唯一索引",
+}
+
+# 主键增加了列的派生表：表名 -> 新增的列；数据可以重新统计，旧结构的表直接删除重建
+RESHAPED_TABLES = {
+    "facet_counts": "slot",  # 计数分片，同一分桶的并发写入分散到多行
+}
+
+def reshaped_tables(connection) -> list:
+    inspector = inspect(connection)
+    tables = inspector.get_table_names()
+    return [
+        table for table, column in RESHAPED_TABLES.items()
+        if table in tables and column not in {c["name"] for c in inspector.get_columns(table)}
+    ]
+
+def expected_indexes() -> dict:
+    """models.py 中声明的非唯一索引：{表名: {索引名: (列定义, ...)}}，倒序的列带 DESC"""
+    return {
+        table.name: {
+            index.name: tuple(str(expression.compile(dialect=engine.dialect, compile_kwargs={"include_table": False}))
+                              for expression in index.expressions)
+            for index in table.indexes if not index.unique
+        }
+        for table in Base.metadata.sorted_tables
+    }
+
+def _column_names(specs: tuple) -> tuple:
+    """去掉列定义中的排序方向，与数据库反射出的列名比较"""
+    return tuple(spec.split()[0] for spec in specs)
+
+def existing_indexes(connection) -> dict:
+    inspector = inspect(connection)
+    return {
+        table: {index["name"]: tuple(index["column_names"])
+                for index in inspector.get_indexes(table) if not index.get("unique")}
+        for table in inspector.get_table_names()
+    }
+
+def plan_statements(expected: dict, existing: dict, report: bool = True) -> list:
+    """返回需要执行的 SQL（只包含已有的表；缺少的表由 create_all 连同索引一起创建）"""
+    statements = []
+    for table, indexes in expected.items():
+        current = existing.get(table)
+        if current is None:
+            continue
+        adds = [(name, columns) for name, columns in indexes.items() if current.get(name) != _column_names(columns)]
+        drops = [name for name, _ in adds if name in current]
+        drops += [name for name in current if (table, name) in OBSOLETE_INDEXES and name not in indexes]
+        for name in current:
+            if report and name not in indexes and (table, name) not in OBSOLETE_INDEXES:
+                print(f"  保留 {table}.{name}({', '.join(current[name])})：不在 models.py 中，请确认是否仍需要")
+        if not adds and not drops:
+            continue
+        if IS_MYSQL:
+            clauses = [f"DROP INDEX {name}" for name in drops]
+            clauses += [f"ADD INDEX {name} ({', '.join(columns)})" for name, columns in adds]
+            statements.append(f"ALTER TABLE {table} " + ", ".join(clauses))
+        else:
+            statements += [f"DROP INDEX {name}" for name in drops]
+            statements += [f"CREATE INDEX {name} ON {table} ({', '.join(columns)})" for name, columns in adds]
+    return statements
+
+def main():
+    parser = argparse.ArgumentParser(description="升级已有数据库的表结构和索引")
+    parser.add_argument("--dry-run", action="store_true", help="只打印将要执行的语句")
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        reshaped = reshaped_tables(connection)
+        existing = existing_indexes(connection)
+    for table in reshaped:
+        print(f"  DROP TABLE {table};（旧结构，缺少 {RESHAPED_TABLES[table]} 列，删除后按新结构重建）")
+        existing.pop(table, None)
+        if not args.dry_run:
+            Base.metadata.tables[table].drop(bind=engine)
+    missing_tables = [table.name for table in Base.metadata.sorted_tables if table.name not in existing]
+    statements = plan_statements(expected_indexes(), existing)
+
+    if missing_tables:
+        print(f"创建表: {', '.join(missing_tables)}")
+        if not args.dry_run:
+            Base.metadata.create_all(bind=engine, tables=[Base.metadata.tables[name] for name in missing_tables])
+    for statement in statements:
+        print(f"  {statement};")
+        if not args.dry_run:
+            start = time.perf_counter()
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+            print(f"    完成，用时 {time.perf_counter() - start:.1f} 秒")
+    for (table, name), reason in OBSOLETE_INDEXES.items():
+        if name in existing.get(table, {}):
+            print(f"  删除 {table}.{name}：{reason}")
+
+    if args.dry_run:
+        if "product_listings" in missing_tables:
+            print("将从 products 表生成 product_listings")
+        if "facet_counts" in missing_tables:
+            print("将从 product_listings 统计 facet_counts")
+        print("✓ 以上为将要执行的修改（--dry-run，未执行）" if missing_tables or statements else "✓ 数据库已是最新结构")
+        return
+
+    with engine.begin() as connection:
+        if listings_need_rebuild(connection):
+            start = time.perf_counter()
+            count = rebuild_listings(connection)
+            print(f"✓ 在售商品读模型已生成，共 {count} 件，用时 {time.perf_counter() - start:.1f} 秒")
+        elif facet_counts_need_rebuild(connection):
+            rebuild_facet_counts(connection)
+            print("✓ 分面计数已从在售商品读模型统计")
+
+    with engine.connect() as connection:
+        remaining = plan_statements(expected_indexes(), existing_indexes(connection), report=False)
+    if remaining:
+        print(f"✗ 仍有 {len(remaining)} 条修改未生效")
+        sys.exit(1)
+    print("✓ 数据库已升级到当前结构" if missing_tables or statements else "✓ 数据库已是最新结构")
+
+if __name__ == "__main__":
+    main()
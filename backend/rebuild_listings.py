@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+在售商品读模型（product_listings）和分面计数（facet_counts）的一致性检查与重建
+
+读模型和分面计数由商品相关的写操作在同一事务中维护。直接修改数据库、导入数据或升级部署后，
+可以用这里检查是否与 products / users / categories 一致，不一致时重建。
+服务启动时如果读模型为空、或分面计数为空或与 FACET_PRICE_BUCKETS 不一致，会自动重建。
+分面计数另有服务中的后台任务每 FACET_RECONCILE_MINUTES 分钟核对并修正一次。
+
+用法：
+    python rebuild_listings.py             # 检查，不一致时重建
+    python rebuild_listings.py --check     # 只检查，不一致时退出码为 1
+    python rebuild_listings.py --force     # 不检查，直接重建
+"""
+
+import argparse
+import sys
+import time
+import database.models  # noqa: F401  注册模型后再建表
+from database import engine, create_tables
+from database.listings import check_listings, rebuild_listings, check_facet_counts
+
+def check() -> bool:
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        result = check_listings(connection)
+        facet_mismatches = check_facet_counts(connection)
+    elapsed = time.perf_counter() - start
+    print(f"已比较 {result['checked']} 件在售商品，用时 {elapsed:.1f} 秒")
+    for kind, label in (("missing", "读模型中缺失"), ("extra", "读模型中多余（商品已不在售）"), ("stale", "内容不一致")):
+        if result[kind]:
+            print(f"✗ {label} {result[kind]} 件，例如: {', '.join(result[kind + '_ids'])}")
+    for mismatch in facet_mismatches[:10]:
+        print(f"✗ 分面计数不一致：分类 {mismatch['category_id']} 价格分桶 {mismatch['bucket_min']} "
+              f"应为 {mismatch['expected']}，实际 {mismatch['actual']}")
+    consistent = not (result["missing"] or result["extra"] or result["stale"] or facet_mismatches)
+    if consistent:
+        print("✓ 读模型和分面计数与商品表一致")
+    return consistent
+
+def rebuild():
+    start = time.perf_counter()
+    with engine.begin() as connection:
+        count = rebuild_listings(connection)
+    print(f"✓ 读模型和分面计数已重建，共 {count} 件在售商品，用时 {time.perf_counter() - start:.1f} 秒")
+
+def main():
+    parser = argparse.ArgumentParser(description="检查或重建在售商品读模型")
+    parser.add_argument("--check", action="store_true", help="只检查，不重建")
+    parser.add_argument("--force", action="store_true", help="不检查，直接重建")
+    args = parser.parse_args()
+
+    create_tables()
+    if args.force:
+        rebuild()
+        return
+    if check():
+        return
+    if args.check:
+        sys.exit(1)
+    rebuild()
+
+if __name__ == "__main__":
+    main()
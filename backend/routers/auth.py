@@ -1,40 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from database import get_db
 from database.models import User
 from schemas.user import UserCreate, UserLogin, UserResponse, Token
-from utils.security import verify_password, get_password_hash, create_access_token
+from utils.security import password_hasher, create_access_token
 from utils.helpers import generate_user_id, validate_phone, validate_campus_card
+from utils.query_inspector import query_budget
 from config import settings
 
 router = APIRouter()
 
 @router.post("/register", response_model=UserResponse, summary="用户注册")
-async def register(user: UserCreate, db: Session = Depends(get_db)):
+@query_budget(3)
+async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     """用户注册接口"""
     
-    # 检查用户名是否已存在
-    if db.query(User).filter(User.username == user.username).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="用户名已存在"
-        )
-    
-    # 检查手机号是否已存在
-    if db.query(User).filter(User.phone == user.phone).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="手机号已被注册"
-        )
-    
-    # 检查校园卡号是否已存在
-    if db.query(User).filter(User.campus_card == user.campus_card).first():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="校园卡号已被注册"
-        )
-    
     # 验证手机号格式
     if not validate_phone(user.phone):
         raise HTTPException(
@@ -49,9 +31,28 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
             detail="校园卡号格式不正确"
         )
     
+    # 一次查询检查用户名、手机号、校园卡号是否已被占用（MySQL 默认排序规则不区分大小写，比较时保持一致）
+    existing = (await db.execute(
+        select(User.username, User.phone, User.campus_card).where(or_(
+            User.username == user.username,
+            User.phone == user.phone,
+            User.campus_card == user.campus_card
+        ))
+    )).all()
+    for field, detail in (
+        ("username", "用户名已存在"),
+        ("phone", "手机号已被注册"),
+        ("campus_card", "校园卡号已被注册"),
+    ):
+        if any(getattr(row, field).lower() == getattr(user, field).lower() for row in existing):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=detail
+            )
+    
     # 创建新用户
     user_id = generate_user_id()
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     
     db_user = User(
         user_id=user_id,
@@ -62,26 +63,35 @@ async def register(user: UserCreate, db: Session = Depends(get_db)):
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @router.post("/login", response_model=Token, summary="用户登录")
-async def login(user: UserLogin, db: Session = Depends(get_db)):
+@query_budget(2)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_db)):
     """用户登录接口"""
     
     # 查找用户
-    db_user = db.query(User).filter(User.username == user.username).first()
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first()
     
     # 验证用户和密码
-    if not db_user or not verify_password(user.password, db_user.password):
+    password_ok, new_hash = False, None
+    if db_user:
+        password_ok, new_hash = await password_hasher.verify_and_update(user.password, db_user.password)
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="用户名或密码错误",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # bcrypt 代价因子调整过，用新的配置重新保存密码哈希
+    if new_hash:
+        db_user.password = new_hash
+        await db.commit()
+    
     # 创建访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
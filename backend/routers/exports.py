@@ -0,0 +1,158 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, union_all
+from typing import Optional
+from datetime import datetime
+import csv
+import io
+import json
+from database import read_session
+from database.models import Product, Transaction
+from schemas.user import UserPrincipal
+from utils.security import get_current_user, get_admin_user
+from config import settings
+
+router = APIRouter()
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+TRANSACTION_COLUMNS = (
+    Transaction.transaction_id, Transaction.created_at, Transaction.amount, Transaction.status,
+    Transaction.buyer_id, Transaction.seller_id, Transaction.product_id, Product.name.label("product_name")
+)
+
+PRODUCT_COLUMNS = (
+    Product.product_id, Product.name, Product.description, Product.price, Product.status,
+    Product.seller_id, Product.category_id, Product.image_path, Product.created_at
+)
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+async def _stream_rows(stmt, data_format: str):
+    """用服务端游标逐批读取查询结果并编码为 CSV / NDJSON
+
+    响应开始发送后路由的数据库会话已经关闭，所以这里单独打开一个会话（配置了只读副本时走副本），
+    直到最后一行发送完才释放连接。每批只在内存中保留 EXPORT_FETCH_SIZE 行。
+    """
+    async with await read_session() as db:
+        result = await db.stream(stmt)
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if data_format == "csv" else None
+        if writer is not None:
+            # 带 BOM，Excel 打开时中文不乱码
+            buffer.write("\ufeff")
+            writer.writerow(columns)
+
+        async for rows in result.partitions(settings.EXPORT_FETCH_SIZE):
+            for row in rows:
+                values = [_export_value(value) for value in row]
+                if writer is not None:
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(columns, values)), ensure_ascii=False))
+                    buffer.write("\n")
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+        tail = buffer.getvalue()
+        if tail:
+            yield tail.encode("utf-8")
+
+def _export_response(stmt, data_format: str, filename: str) -> StreamingResponse:
+    if data_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="导出格式只支持 csv 或 ndjson"
+        )
+    return StreamingResponse(
+        _stream_rows(stmt, data_format),
+        media_type=EXPORT_MEDIA_TYPES[data_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{data_format}"'}
+    )
+
+def _transactions_stmt(after: Optional[str]):
+    stmt = (
+        select(*TRANSACTION_COLUMNS)
+        .join(Product, Product.product_id == Transaction.product_id)
+        .order_by(Transaction.transaction_id)
+    )
+    if after:
+        stmt = stmt.where(Transaction.transaction_id > after)
+    return stmt
+
+def _my_transactions_stmt(user_id: str, after: Optional[str]):
+    """买家侧和卖家侧分别按 buyer_id / seller_id 走 idx_buyer_time / idx_seller_time 取交易ID，
+    UNION ALL 后再关联交易和商品并按交易ID排序（与「我的交易」列表的 MY_TRANSACTIONS_SIDE_SQL 相同的写法），
+    避免 buyer_id = ? OR seller_id = ? 扫描整张交易表；不能购买自己的商品，两侧不会有重复的交易
+    """
+    sides = []
+    for side_column in (Transaction.buyer_id, Transaction.seller_id):
+        side = select(Transaction.transaction_id).where(side_column == user_id)
+        if after:
+            side = side.where(Transaction.transaction_id > after)
+        sides.append(side)
+    mine = union_all(*sides).subquery("m")
+    return (
+        select(*TRANSACTION_COLUMNS)
+        .select_from(mine)
+        .join(Transaction, Transaction.transaction_id == mine.c.transaction_id)
+        .join(Product, Product.product_id == Transaction.product_id)
+        .order_by(Transaction.transaction_id)
+    )
+
+# ====================================================
+# 1. 导出我的交易记录 (GET /transactions/my)
+# ====================================================
+@router.get("/transactions/my", summary="导出我的交易记录")
+async def export_my_transactions(
+    data_format: str = Query("csv", alias="format", description="导出格式: csv/ndjson"),
+    after: Optional[str] = Query(None, description="从该交易ID之后继续导出（断点续传）"),
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """流式导出当前用户买入和卖出的全部交易记录
+
+    按交易ID升序输出，金额单位为分。连接中断后把收到的最后一个交易ID作为 after 重新请求即可续传。
+    """
+    return _export_response(_my_transactions_stmt(current_user.user_id, after), data_format, "my_transactions")
+
+# ====================================================
+# 2. 导出全部交易记录 (GET /transactions) - 管理员
+# ====================================================
+@router.get("/transactions", summary="导出全部交易记录（管理员）")
+async def export_transactions(
+    data_format: str = Query("csv", alias="format", description="导出格式: csv/ndjson"),
+    after: Optional[str] = Query(None, description="从该交易ID之后继续导出（断点续传）"),
+    status_filter: Optional[int] = Query(None, alias="status", ge=0, le=2, description="交易状态"),
+    admin: UserPrincipal = Depends(get_admin_user)
+):
+    """流式导出全站交易记录，用于对账；按交易ID升序输出，金额单位为分"""
+    stmt = _transactions_stmt(after)
+    if status_filter is not None:
+        stmt = stmt.where(Transaction.status == status_filter)
+    return _export_response(stmt, data_format, "transactions")
+
+# ====================================================
+# 3. 导出全部商品 (GET /products) - 管理员
+# ====================================================
+@router.get("/products", summary="导出全部商品（管理员）")
+async def export_products(
+    data_format: str = Query("csv", alias="format", description="导出格式: csv/ndjson"),
+    after: Optional[str] = Query(None, description="从该商品ID之后继续导出（断点续传）"),
+    status_filter: Optional[int] = Query(None, alias="status", ge=0, le=3, description="商品状态"),
+    admin: UserPrincipal = Depends(get_admin_user)
+):
+    """流式导出全站商品；按商品ID升序输出，价格单位为分"""
+    stmt = select(*PRODUCT_COLUMNS).order_by(Product.product_id)
+    if after:
+        stmt = stmt.where(Product.product_id > after)
+    if status_filter is not None:
+        stmt = stmt.where(Product.status == status_filter)
+    return _export_response(stmt, data_format, "products")
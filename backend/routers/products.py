@@ -1,26 +1,80 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, text
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, text, bindparam, select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional, List
-from database import get_db
-from database.models import User, Product, Category, Transaction # 确保导入 Transaction
-from schemas.product import ProductCreate, ProductResponse, ProductUpdate, ProductSearch, ProductListResponse
+import csv
+import json
+from database import get_db, get_read_db
+from database.listings import add_listings, remove_listings, refresh_listings
+from database.changes import record_product_changes
+from database.models import User, Product, Category, Transaction, ProductListing # 确保导入 Transaction
+from schemas.product import (
+    ProductCreate, ProductResponse, ProductUpdate, ProductSearch, ProductListItem, ProductListResponse,
+    ProductBulkRowResult, ProductBulkResponse, ProductFacetsResponse
+)
+from schemas.user import UserPrincipal
 from utils.security import get_current_user
 from utils.helpers import generate_product_id
+from utils.pagination import encode_cursor, decode_cursor, parse_cursor_datetime
+from utils.streaming import iter_lines, iter_csv_records
+from search import product_index
+from utils.image_store import image_store
+from utils.thumbnails import thumbnail_pipeline, add_thumbnails
+from utils.listing_facets import listing_facets, facets_from_pairs
+from utils.query_inspector import query_budget
+from utils.fast_json import PageSerializer, rows_to_dicts
+from config import settings
 
 router = APIRouter()
 
+# 列表接口直接输出 JSON 字节，避免 FastAPI 按 response_model 重复校验
+product_page = PageSerializer(
+    ProductListResponse, "products", ProductListItem, optional_fields=("description_snippet",)
+)
+
+FIELDS_DESCRIPTION = "只返回这些字段，逗号分隔（如 product_id,name,price,thumbnails,category_name,description_snippet）；不传时返回全部字段"
+
+def _parse_fields(serializer: PageSerializer, fields: Optional[str]):
+    try:
+        return serializer.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def _product_response(product: Product, seller_username: str, seller_phone: str, category_name: str) -> ProductResponse:
+    """用已加载的商品对象组装 ProductResponse（字段与商品详情的关联查询一致）"""
+    return ProductResponse(
+        product_id=product.product_id,
+        name=product.name,
+        description=product.description,
+        price=product.price,
+        created_at=product.created_at,
+        status=product.status,
+        seller_id=product.seller_id,
+        category_id=product.category_id,
+        image_path=product.image_path,
+        seller_username=seller_username,
+        seller_phone=seller_phone,
+        category_name=category_name,
+        thumbnails=thumbnail_pipeline.variants(product.image_path)
+    )
+
 @router.post("/create", response_model=ProductResponse, summary="发布商品")
+@query_budget(8)
 async def create_product(
     product: ProductCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """发布新商品"""
     
     try:
         # 检查分类是否存在
-        category = db.query(Category).filter(Category.id == product.category_id).first()
+        category = (await db.execute(select(Category).where(Category.id == product.category_id))).scalars().first()
         if not category:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -41,45 +95,251 @@ async def create_product(
         )
         
         db.add(db_product)
-        db.commit()
-        db.refresh(db_product)
-        
-        # 关联查询返回完整信息
-        result = db.query(
-            Product.product_id,
-            Product.name,
-            Product.description,
-            Product.price,
-            Product.created_at,
-            Product.status,
-            Product.seller_id,
-            Product.category_id,
-            Product.image_path,
-            User.username.label("seller_username"),
-            User.phone.label("seller_phone"),
-            Category.name.label("category_name")
-        ).join(User, Product.seller_id == User.user_id)\
-         .join(Category, Product.category_id == Category.id)\
-         .filter(Product.product_id == product_id)\
-         .first()
+        await db.flush()
+        await add_listings(db, [product_id])
+        await record_product_changes(db, [product_id])
+        # 图片被引用，刷新修改时间，不会被正在进行的回收删除
+        image_store.touch(product.image_path)
+        await db.commit()
+        # created_at 由数据库生成，只需取回这一列；卖家和分类信息已在手边，不必再做关联查询
+        await db.refresh(db_product, ["created_at"])
+        product_index.add_product(db_product)
         
-        return ProductResponse(**result._asdict())
+        return _product_response(db_product, current_user.username, current_user.phone, category.name)
     except HTTPException:
         raise
     except Exception as e:
         import traceback
         print(f"创建商品失败: {e}")
         print(traceback.format_exc())
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"创建商品失败: {str(e)}"
         )
 
 
+# ====================================================
+# 1.1 批量导入商品 (POST /bulk)
+# ====================================================
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/json-lines")
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" if err["loc"] else err["msg"]
+        for err in e.errors()
+    )
+
+async def _iter_bulk_rows(request: Request, data_format: str):
+    """逐行解析请求体，产出 (字段字典, 错误信息)，两者只有一个不为空"""
+    lines = iter_lines(request.stream())
+    if data_format == "ndjson":
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield None, "不是合法的 JSON"
+                continue
+            if not isinstance(row, dict):
+                yield None, "每行必须是一个 JSON 对象"
+                continue
+            yield row, None
+        return
+
+    header = None
+    async for record in iter_csv_records(lines):
+        if not record.strip():
+            continue
+        try:
+            values = next(csv.reader([record]))
+        except csv.Error as e:
+            if header is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"CSV 表头格式错误: {e}"
+                )
+            yield None, f"CSV 格式错误: {e}"
+            continue
+        if header is None:
+            header = [name.strip().lower() for name in values]
+            continue
+        if len(values) != len(header):
+            yield None, f"列数与表头不一致（{len(values)} != {len(header)}）"
+            continue
+        # 空单元格视为未填写
+        yield {name: (value if value.strip() else None) for name, value in zip(header, values)}, None
+
+@router.post("/bulk", response_model=ProductBulkResponse, summary="批量导入商品")
+async def bulk_create_products(
+    request: Request,
+    data_format: Optional[str] = Query(None, alias="format", description="数据格式: csv/ndjson，默认根据 Content-Type 判断"),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量导入商品
+
+    请求体为 CSV（首行为表头，列名同发布商品：name,description,price,category_id,image_path）
+    或 NDJSON（每行一个 JSON 对象）。请求体边接收边解析，每行用 ProductCreate 校验，
+    合法的行每 BULK_IMPORT_CHUNK_SIZE 行用 executemany 插入一次，全部行在同一个事务中提交。
+    校验失败的行不会插入，在返回结果中列出原因。
+    """
+    if data_format is None:
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type in ("text/csv", "application/csv"):
+            data_format = "csv"
+        elif content_type in NDJSON_CONTENT_TYPES:
+            data_format = "ndjson"
+    if data_format not in ("csv", "ndjson"):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="只支持 CSV (text/csv) 或 NDJSON (application/x-ndjson) 格式"
+        )
+
+    # 分类表很小，一次性读入代替逐行查询
+    category_ids = set((await db.execute(select(Category.id))).scalars().all())
+    # 同一批商品使用同一个发布时间（数据库时间）
+    created_at = (await db.execute(select(func.current_timestamp()))).scalar()
+
+    insert_stmt = Product.__table__.insert()
+    chunk_size = settings.BULK_IMPORT_CHUNK_SIZE
+    results = []
+    pending = []
+    inserted = []
+    touched_images = set()
+    row_no = 0
+
+    try:
+        async for row, error in _iter_bulk_rows(request, data_format):
+            row_no += 1
+            if row_no > settings.BULK_IMPORT_MAX_ROWS:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"单次最多导入 {settings.BULK_IMPORT_MAX_ROWS} 行"
+                )
+            if error is None:
+                try:
+                    product = ProductCreate(**row)
+                    if product.category_id not in category_ids:
+                        error = "商品分类不存在"
+                except ValidationError as e:
+                    error = _format_validation_error(e)
+            if error is not None:
+                results.append(ProductBulkRowResult(row=row_no, success=False, error=error))
+                continue
+
+            if product.image_path and product.image_path not in touched_images:
+                image_store.touch(product.image_path)
+                touched_images.add(product.image_path)
+
+            product_id = generate_product_id()
+            pending.append({
+                "product_id": product_id,
+                "name": product.name,
+                "description": product.description,
+                "price": product.price,
+                "created_at": created_at,
+                "status": 1,
+                "seller_id": current_user.user_id,
+                "category_id": product.category_id,
+                "image_path": product.image_path
+            })
+            results.append(ProductBulkRowResult(row=row_no, success=True, product_id=product_id))
+
+            if len(pending) >= chunk_size:
+                await db.execute(insert_stmt, pending)
+                await add_listings(db, [values["product_id"] for values in pending])
+                await record_product_changes(db, [values["product_id"] for values in pending])
+                inserted.extend(pending)
+                pending = []
+
+        if pending:
+            await db.execute(insert_stmt, pending)
+            await add_listings(db, [values["product_id"] for values in pending])
+            await record_product_changes(db, [values["product_id"] for values in pending])
+            inserted.extend(pending)
+        await db.commit()
+    except HTTPException:
+        await db.rollback()
+        raise
+    except Exception as e:
+        import traceback
+        print(f"批量导入商品失败: {e}")
+        print(traceback.format_exc())
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"批量导入商品失败: {str(e)}"
+        )
+
+    for values in inserted:
+        product_index.add(
+            values["product_id"], values["name"], values["description"], values["status"],
+            values["category_id"], values["price"], values["seller_id"], values["created_at"]
+        )
+
+    return ProductBulkResponse(
+        total=row_no,
+        created=len(inserted),
+        failed=row_no - len(inserted),
+        results=results
+    )
+
 # ====================================================
 # 2. 浏览可用商品 (GET /available)
 # ====================================================
+# 浏览商品只查在售商品读模型 product_listings（见 database/listings.py），卖家和分类信息已冗余在表中。
+# 列表字段 -> SELECT 中的列（thumbnails 由 image_path 计算，description_snippet 只取描述的开头）
+PRODUCT_LIST_COLUMNS = {
+    "product_id": "p.product_id",
+    "name": "p.name",
+    "description": "p.description",
+    "price": "p.price",
+    "created_at": "p.created_at",
+    "status": "1 as status",  # 读模型中都是在售商品
+    "seller_id": "p.seller_id",
+    "category_id": "p.category_id",
+    "image_path": "p.image_path",
+    "thumbnails": "p.image_path",
+    "seller_username": "p.seller_username",
+    "seller_phone": "p.seller_phone",
+    "category_name": "p.category_name",
+    "description_snippet": "SUBSTR(p.description, 1, {snippet_length}) as description_snippet",
+}
+# 不传 fields 时查询的列
+PRODUCT_LIST_DEFAULT_FIELDS = (
+    "product_id", "name", "description", "price", "created_at", "status", "seller_id",
+    "category_id", "image_path", "seller_username", "seller_phone", "category_name",
+)
+# 排序和分页游标用到的列，总是查询
+PRODUCT_LIST_KEY_FIELDS = ("product_id", "created_at", "price")
+
+def _product_list_select(selected) -> str:
+    """按请求的字段拼出 SELECT 列表"""
+    names = PRODUCT_LIST_DEFAULT_FIELDS if selected is None else PRODUCT_LIST_KEY_FIELDS + tuple(sorted(selected))
+    columns = dict.fromkeys(PRODUCT_LIST_COLUMNS[name] for name in names)
+    # 多取一个字符，用来判断是否需要加省略号
+    return ",\n            ".join(columns).format(snippet_length=settings.DESCRIPTION_SNIPPET_LENGTH + 1)
+
+# 各排序方式的 (ORDER BY, 游标翻页条件)；同价格时按发布时间倒序，product_id 作为同值时的决胜键
+CURSOR_SORTS = {
+    "newest": (
+        "p.created_at DESC, p.product_id DESC",
+        "(p.created_at < :cursor_time OR (p.created_at = :cursor_time AND p.product_id < :cursor_id))"
+    ),
+    "price_asc": (
+        "p.price ASC, p.created_at DESC, p.product_id DESC",
+        "(p.price > :cursor_price OR (p.price = :cursor_price AND (p.created_at < :cursor_time"
+        " OR (p.created_at = :cursor_time AND p.product_id < :cursor_id))))"
+    ),
+    "price_desc": (
+        "p.price DESC, p.created_at DESC, p.product_id DESC",
+        "(p.price < :cursor_price OR (p.price = :cursor_price AND (p.created_at < :cursor_time"
+        " OR (p.created_at = :cursor_time AND p.product_id < :cursor_id))))"
+    ),
+}
+
 @router.get("/available", response_model=ProductListResponse, summary="浏览可用商品")
 async def get_available_products(
         keyword: Optional[str] = Query(None, description="搜索关键词"),
@@ -88,21 +348,43 @@ async def get_available_products(
         max_price: Optional[float] = Query(None, ge=0, description="最高价格"),
         page: int = Query(1, ge=1, description="页码"),
         page_size: int = Query(10, ge=1, le=100, description="每页数量"),
-        sort_by: str = Query("newest", description="排序方式: newest/price_asc/price_desc"), 
-        current_user: Optional[User] = Depends(get_current_user), 
-        db: Session = Depends(get_db)
+        sort_by: str = Query("newest", description="排序方式: newest/price_asc/price_desc/relevance（需要关键词）"), 
+        cursor: Optional[str] = Query(None, description="分页游标，传入后按游标翻页且不再统计总数；首页传空字符串"),
+        fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+        current_user: Optional[UserPrincipal] = Depends(get_current_user), 
+        db: AsyncSession = Depends(get_read_db)
 ):
-    """获取可购买的商品列表（只显示状态为1的商品，并排除当前用户自己发布的商品）"""
+    """获取可购买的商品列表（只显示状态为1的商品，并排除当前用户自己发布的商品）
+
+    两种分页方式：
+    - page/page_size：LIMIT/OFFSET 分页，并返回 total/total_pages（旧接口，保持兼容）
+    - cursor：按上一页返回的 next_cursor 继续翻页，不做 COUNT，深页与首页代价相同
+
+    列表卡片只需要少数字段时传 fields（如 product_id,name,price,thumbnails,category_name），
+    查询的列和返回的数据都只包含这些字段；description_snippet 是截断后的描述，代替完整的 description。
+    """
+    selected = _parse_fields(product_page, fields)
     min_price_fen = round(min_price * 100) if min_price is not None else None
     max_price_fen = round(max_price * 100) if max_price is not None else None
 
+    # 有关键词时走倒排索引，按名称和描述检索
+    if keyword and settings.SEARCH_INDEX_ENABLED and product_index.ready:
+        return await search_available_products(
+            db, keyword, category_id, min_price_fen, max_price_fen,
+            current_user.user_id if current_user else None,
+            page, page_size, sort_by, cursor, selected
+        )
+
+    use_cursor = cursor is not None
+    if sort_by not in CURSOR_SORTS:
+        sort_by = "newest"
+
     sql_params = {
-        "status": 1,
         "offset": (page - 1) * page_size,
         "limit": page_size
     }
 
-    where_conditions = ["p.status = :status"]
+    where_conditions = []
 
     if current_user:
         where_conditions.append("p.seller_id != :exclude_seller_id")
@@ -121,76 +403,180 @@ async def get_available_products(
         where_conditions.append("p.price <= :max_price")
         sql_params["max_price"] = max_price_fen
 
-    where_clause = ' AND '.join(where_conditions)
+    filter_clause = ("WHERE " + " AND ".join(where_conditions)) if where_conditions else ""
     
-    order_by_clause = "p.created_at DESC" 
-    if sort_by == "price_asc":
-        order_by_clause = "p.price ASC, p.created_at DESC"
-    elif sort_by == "price_desc":
-        order_by_clause = "p.price DESC, p.created_at DESC"
-    elif sort_by == "newest":
-        order_by_clause = "p.created_at DESC"
-        
-    count_sql = f"""
-        SELECT COUNT(p.product_id) 
-        FROM products p
-        WHERE {where_clause}
-    """
-    count_params = {k: v for k, v in sql_params.items() if k not in ['offset', 'limit']}
-    total = db.execute(text(count_sql), count_params).scalar()
+    # 两种分页方式使用同一排序，正好是读模型上某个索引的顺序，不需要额外排序
+    order_by_clause, seek_condition = CURSOR_SORTS[sort_by]
+
+    if use_cursor:
+        if cursor:
+            try:
+                if sort_by == "newest":
+                    cursor_time, cursor_id = decode_cursor(cursor, sort_by, 2)
+                else:
+                    cursor_price, cursor_time, cursor_id = decode_cursor(cursor, sort_by, 3)
+                    if not isinstance(cursor_price, int):
+                        raise ValueError("无效的分页游标")
+                    sql_params["cursor_price"] = cursor_price
+                cursor_time = parse_cursor_datetime(cursor_time)
+                if not isinstance(cursor_id, str):
+                    raise ValueError("无效的分页游标")
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=str(e)
+                )
+            where_conditions.append(seek_condition)
+            sql_params["cursor_time"] = cursor_time
+            sql_params["cursor_id"] = cursor_id
+        # 多取一行用来判断是否还有下一页
+        sql_params["offset"] = 0
+        sql_params["limit"] = page_size + 1
+
+    where_clause = ("WHERE " + " AND ".join(where_conditions)) if where_conditions else ""
+
+    total = None
+    if not use_cursor:
+        count_sql = f"""
+            SELECT COUNT(*)
+            FROM product_listings p
+            {filter_clause}
+        """
+        count_params = {k: v for k, v in sql_params.items() if k not in ['offset', 'limit']}
+        total = (await db.execute(text(count_sql), count_params)).scalar()
     
     sql = f"""
         SELECT 
-            p.product_id,
-            p.name,
-            p.description,
-            p.price,
-            p.created_at,
-            p.status,
-            p.seller_id,
-            p.category_id,
-            p.image_path,
-            u.username as seller_username,
-            u.phone as seller_phone,
-            c.name as category_name
-        FROM products p
-        JOIN users u ON p.seller_id = u.user_id
-        JOIN categories c ON p.category_id = c.id
-        WHERE {where_clause}
+            {_product_list_select(selected)}
+        FROM product_listings p
+        {where_clause}
         ORDER BY {order_by_clause} 
         LIMIT :limit OFFSET :offset
     """
     
-    products = db.execute(text(sql), sql_params).fetchall()
-
-    product_list = []
-    for product in products:
-        product_dict = {
-            "product_id": product.product_id,
-            "name": product.name,
-            "description": product.description,
-            "price": product.price,
-            "created_at": product.created_at,
-            "status": product.status, 
-            "seller_id": product.seller_id,
-            "category_id": product.category_id,
-            "image_path": product.image_path,
-            "seller_username": product.seller_username,
-            "seller_phone": product.seller_phone,
-            "category_name": product.category_name
-        }
-        product_list.append(ProductResponse(**product_dict))
+    products = (await db.execute(text(sql), sql_params)).fetchall()
+
+    next_cursor = None
+    if use_cursor and len(products) > page_size:
+        products = products[:page_size]
+        last = products[-1]
+        last_key = (last.created_at,) if sort_by == "newest" else (last.price, last.created_at)
+        next_cursor = encode_cursor(sort_by, *last_key, last.product_id)
 
-    total_pages = (total + page_size - 1) // page_size if total else 0
+    total_pages = (total + page_size - 1) // page_size if total else (None if use_cursor else 0)
 
-    return ProductListResponse(
-        products=product_list,
+    return product_page.response(
+        add_thumbnails(rows_to_dicts(products), "image_path", selected),
+        selected,
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
+    )
+
+async def search_available_products(db, keyword, category_id, min_price_fen, max_price_fen,
+                              exclude_seller_id, page, page_size, sort_by, cursor, selected=None):
+    """通过搜索索引获取商品：过滤、排序和分页在索引中完成，只回表取当前页
+
+    检索在线程池中执行，命中很多的关键词不会阻塞事件循环。游标为上一页最后一个结果的
+    (排序键, product_id)，翻到深页不需要跳过前面的结果。
+    """
+    if sort_by not in ("newest", "price_asc", "price_desc"):
+        sort_by = "relevance"
+    offset = (page - 1) * page_size
+    after = None
+    if cursor is not None:
+        offset = 0
+    if cursor:
+        try:
+            first, second, product_id = decode_cursor(cursor, f"search_{sort_by}", 3)
+            second_type = str if sort_by == "newest" else (int, float)
+            if not isinstance(first, (int, float)) or not isinstance(second, second_type) \
+                    or not isinstance(product_id, str):
+                raise ValueError("无效的分页游标")
+            after = ((first, second), product_id)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+
+    product_ids, total, next_after = await run_in_threadpool(
+        product_index.search,
+        keyword, sort_by=sort_by, offset=offset, limit=page_size,
+        category_id=category_id, min_price=min_price_fen, max_price=max_price_fen,
+        exclude_seller_id=exclude_seller_id, after=after
+    )
+
+    rows = []
+    if product_ids:
+        sql = text(f"""
+            SELECT 
+                {_product_list_select(selected)}
+            FROM product_listings p
+            WHERE p.product_id IN :product_ids
+        """).bindparams(bindparam("product_ids", expanding=True))
+        rows = rows_to_dicts((await db.execute(sql, {"product_ids": product_ids})).fetchall())
+        # 按索引返回的顺序排列
+        position = {pid: i for i, pid in enumerate(product_ids)}
+        rows.sort(key=lambda row: position[row["product_id"]])
+
+    next_cursor = None
+    if cursor is not None and next_after is not None:
+        (first, second), product_id = next_after
+        next_cursor = encode_cursor(f"search_{sort_by}", first, second, product_id)
+
+    return product_page.response(
+        add_thumbnails(rows, "image_path", selected),
+        selected,
+        total=total,
+        page=page,
+        page_size=page_size,
+        total_pages=(total + page_size - 1) // page_size,
+        next_cursor=next_cursor
     )
 
+# ====================================================
+# 2.1 浏览筛选的分面计数 (GET /facets)
+# ====================================================
+@router.get("/facets", response_model=ProductFacetsResponse, summary="浏览筛选的分类计数和价格分布")
+@query_budget(4)
+async def get_product_facets(
+        keyword: Optional[str] = Query(None, description="搜索关键词"),
+        category_id: Optional[int] = Query(None, description="分类ID"),
+        min_price: Optional[float] = Query(None, ge=0, description="最低价格"),
+        max_price: Optional[float] = Query(None, ge=0, description="最高价格"),
+        current_user: UserPrincipal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    """与浏览商品相同的筛选条件下，返回商品总数、各分类的商品数和价格分布（价格单位为分）
+
+    categories 只按价格区间筛选、price_buckets 只按分类筛选，用户切换分类或价格区间之前就能看到对应的数量。
+    没有关键词时读 facet_counts 表中的分面计数（utils/listing_facets.py），再查询当前用户自己的在售商品用于扣除；
+    有关键词时统计搜索索引的命中结果，搜索索引关闭时退回数据库查询。
+    """
+    min_price_fen = round(min_price * 100) if min_price is not None else None
+    max_price_fen = round(max_price * 100) if max_price is not None else None
+
+    if keyword:
+        if settings.SEARCH_INDEX_ENABLED and product_index.ready:
+            pairs = await run_in_threadpool(product_index.match_listings, keyword, current_user.user_id)
+        else:
+            pairs = (await db.execute(text("""
+                SELECT p.category_id, p.price
+                FROM product_listings p
+                WHERE p.seller_id != :exclude_seller_id AND p.name LIKE :keyword
+            """), {"exclude_seller_id": current_user.user_id, "keyword": f"%{keyword}%"})).all()
+        return facets_from_pairs(pairs, listing_facets.bucket_edges, category_id, min_price_fen, max_price_fen)
+
+    # 浏览商品不显示自己发布的商品，分面计数中也要扣除
+    own_listings = (await db.execute(
+        select(ProductListing.category_id, ProductListing.price)
+        .where(ProductListing.seller_id == current_user.user_id)
+    )).all()
+    return await listing_facets.facets(db, category_id, min_price_fen, max_price_fen, own_listings)
+
 # ====================================================
 # 3. 我的商品 (GET /my)
 # ====================================================
@@ -198,42 +584,50 @@ async def get_available_products(
 async def get_my_products(
     page: int = Query(1, ge=1, description="页码"),
     page_size: int = Query(10, ge=1, le=100, description="每页数量"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """获取我发布的商品"""
-    
-    query = db.query(
-        Product.product_id,
-        Product.name,
-        Product.description,
-        Product.price,
-        Product.created_at,
-        Product.status,
-        Product.seller_id,
-        Product.category_id,
-        Product.image_path,
-        Category.name.label("category_name")
-    ).join(Category, Product.category_id == Category.id)\
-     .filter(Product.seller_id == current_user.user_id)\
+    """获取我发布的商品（不包含卖家信息，fields 的用法同浏览商品）"""
+    selected = _parse_fields(product_page, fields)
+    columns = {
+        "product_id": Product.product_id,
+        "name": Product.name,
+        "description": Product.description,
+        "price": Product.price,
+        "created_at": Product.created_at,
+        "status": Product.status,
+        "seller_id": Product.seller_id,
+        "category_id": Product.category_id,
+        "image_path": Product.image_path,
+        "category_name": Category.name.label("category_name"),
+        "description_snippet": func.substr(
+            Product.description, 1, settings.DESCRIPTION_SNIPPET_LENGTH + 1
+        ).label("description_snippet"),
+    }
+    names = PRODUCT_LIST_DEFAULT_FIELDS if selected is None else ("product_id",) + tuple(sorted(selected))
+    # thumbnails 由 image_path 计算
+    names = dict.fromkeys("image_path" if name == "thumbnails" else name for name in names)
+    query = select(*(columns[name] for name in names if name in columns))
+    if "category_name" in names:
+        query = query.join(Category, Product.category_id == Category.id)
+    query = query.where(Product.seller_id == current_user.user_id)\
      .order_by(Product.created_at.desc())\
      .offset((page - 1) * page_size)\
      .limit(page_size)
     
-    products = query.all()
+    products = (await db.execute(query)).all()
     
     # 获取总数
-    total = db.query(Product).filter(Product.seller_id == current_user.user_id).count()
-    
-    product_list = []
-    for product in products:
-        product_dict = product._asdict()
-        product_list.append(ProductResponse(**product_dict))
+    total = (await db.execute(
+        select(func.count(Product.product_id)).where(Product.seller_id == current_user.user_id)
+    )).scalar()
     
     total_pages = (total + page_size - 1) // page_size
     
-    return ProductListResponse(
-        products=product_list,
+    return product_page.response(
+        add_thumbnails(rows_to_dicts(products), "image_path", selected),
+        selected,
         total=total,
         page=page,
         page_size=page_size,
@@ -244,13 +638,14 @@ async def get_my_products(
 # 4. 商品详情 (GET /{product_id})
 # ====================================================
 @router.get("/{product_id}", response_model=ProductResponse, summary="商品详情")
+@query_budget(1)
 async def get_product_detail(
     product_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取商品详情"""
     
-    product = db.query(
+    product = (await db.execute(select(
         Product.product_id,
         Product.name,
         Product.description,
@@ -265,8 +660,7 @@ async def get_product_detail(
         Category.name.label("category_name")
     ).join(User, Product.seller_id == User.user_id)\
      .join(Category, Product.category_id == Category.id)\
-     .filter(Product.product_id == product_id)\
-     .first()
+     .where(Product.product_id == product_id))).first()
     
     if not product:
         raise HTTPException(
@@ -276,26 +670,33 @@ async def get_product_detail(
     
     product_dict = product._asdict()
     
-    return ProductResponse(**product_dict)
+    return ProductResponse(**product_dict, thumbnails=thumbnail_pipeline.variants(product.image_path))
 
 # ====================================================
 # 5. 更新商品 (PUT /{product_id})
 # ====================================================
 @router.put("/{product_id}", response_model=ProductResponse, summary="更新商品")
+@query_budget(11)
 async def update_product(
     product_id: str,
     product_update: ProductUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """更新商品信息"""
     
-    product = db.query(Product).filter(Product.product_id == product_id).first()
-    if not product:
+    # 商品和分类名一起查出，更新后直接组装返回结果
+    row = (await db.execute(
+        select(Product, Category.name)
+        .join(Category, Product.category_id == Category.id)
+        .where(Product.product_id == product_id)
+    )).first()
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="商品不存在"
         )
+    product, category_name = row
     
     # 检查权限
     if product.seller_id != current_user.user_id:
@@ -306,47 +707,43 @@ async def update_product(
     
     # 更新商品信息
     update_data = product_update.dict(exclude_unset=True)
+    if update_data.get("category_id") and update_data["category_id"] != product.category_id:
+        category_name = (await db.execute(
+            select(Category.name).where(Category.id == update_data["category_id"])
+        )).scalar()
+        if category_name is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="商品分类不存在"
+            )
     for field, value in update_data.items():
         setattr(product, field, value)
+    if update_data.get("image_path"):
+        image_store.touch(update_data["image_path"])
     
-    db.commit()
-    db.refresh(product)
-    
-    # 获取更新后的完整信息
-    updated_product = db.query(
-        Product.product_id,
-        Product.name,
-        Product.description,
-        Product.price,
-        Product.created_at,
-        Product.status,
-        Product.seller_id,
-        Product.category_id,
-        Product.image_path,
-        User.username.label("seller_username"),
-        User.phone.label("seller_phone"),
-        Category.name.label("category_name")
-    ).join(User, Product.seller_id == User.user_id)\
-     .join(Category, Product.category_id == Category.id)\
-     .filter(Product.product_id == product_id)\
-     .first()
-    
-    product_dict = updated_product._asdict()
+    # 内容和状态都可能变化，读模型中这件商品先删后插
+    await db.flush()
+    await refresh_listings(db, [product_id])
+    await record_product_changes(db, [product_id])
+    await db.commit()
+    product_index.add_product(product)
     
-    return ProductResponse(**product_dict)
+    # 会话设置了 expire_on_commit=False，提交后属性仍然有效，无需 refresh 和重新查询
+    return _product_response(product, current_user.username, current_user.phone, category_name)
 
 # ====================================================
 # 6. 下架商品 (DELETE /{product_id})
 # ====================================================
 @router.delete("/{product_id}", summary="下架商品")
+@query_budget(8)
 async def delete_product(
     product_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """下架商品"""
     
-    product = db.query(Product).filter(Product.product_id == product_id).first()
+    product = (await db.execute(select(Product).where(Product.product_id == product_id))).scalars().first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -360,25 +757,31 @@ async def delete_product(
             detail="无权限操作此商品"
         )
     
-    # 检查商品是否已被交易
-    transaction = db.query(Transaction).filter(Transaction.product_id == product_id).first()
+    # 检查商品是否有进行中的订单（待支付或已完成）；已过期的订单不影响下架
+    transaction = (await db.execute(
+        select(Transaction.transaction_id)
+        .where(Transaction.product_id == product_id, Transaction.status.in_((0, 1)))
+    )).first()
     if transaction:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="商品已被交易，无法下架"
         )
     product.status = 3  # 设置为已下架
-    db.commit()
+    await remove_listings(db, [product_id])
+    await record_product_changes(db, [product_id])
+    await db.commit()
+    product_index.set_status(product_id, 3)
     return {"message": "商品下架成功"}
 
 # ====================================================
 # 7. 获取分类列表 (GET /categories/list)
 # ====================================================
 @router.get("/categories/list", response_model=List[dict], summary="获取分类列表")
-async def get_categories(db: Session = Depends(get_db)):
+async def get_categories(db: AsyncSession = Depends(get_read_db)):
     """获取所有商品分类"""
     
-    categories = db.query(Category).all()
+    categories = (await db.execute(select(Category))).scalars().all()
     
     return [
         {
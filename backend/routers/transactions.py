@@ -1,39 +1,59 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, text
-from typing import Optional, List
+from sqlalchemy import and_, or_, text, select, update, insert, func, literal
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Set
 from datetime import datetime
-from database import get_db
+from database import get_db, get_read_db
+from database.listings import remove_listings
+from database.changes import record_product_changes
 from database.models import User, Product, Transaction, Category
 from schemas.transaction import TransactionCreate, TransactionResponse, TransactionSearch, TransactionListResponse
+from schemas.user import UserPrincipal
 from utils.security import get_current_user
 from utils.helpers import generate_transaction_id
+from search import product_index
+from utils.order_expiry import order_expiry
+from utils.count_cache import transaction_count_cache
+from utils.thumbnails import thumbnail_pipeline, add_thumbnails
+from utils.pagination import encode_cursor, decode_cursor, parse_cursor_datetime
+from utils.query_inspector import query_budget
+from utils.fast_json import PageSerializer, rows_to_dicts
 
 router = APIRouter()
 
+# 列表接口直接输出 JSON 字节，避免 FastAPI 按 response_model 重复校验
+transaction_page = PageSerializer(TransactionListResponse, "transactions", TransactionResponse)
+
+# 本进程中正在抢占的商品ID：同一商品同一时刻只放一个请求去执行条件更新
+_claiming_products: Set[str] = set()
+
 @router.post("/", response_model=TransactionResponse, summary="创建交易订单")
+@query_budget(9)
 async def create_transaction(
     transaction: TransactionCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """创建交易订单（下单）"""
+    """创建交易订单（下单）
+
+    先用一次不加锁的主键查询过滤掉已不可购买的商品，抢购时绝大多数请求在这里
+    直接返回；剩下的请求用一条条件更新
+    UPDATE products SET status=0 WHERE product_id=? AND status=1
+    抢占商品，只有一个能成功，成功者再写交易记录。失败的请求都不会访问 transactions 表。
+    同一进程内，已有请求正在抢占的商品直接返回失败，不再排队执行条件更新
+    （SQLite 的写入是串行的，排队的 UPDATE 会让失败请求等待数秒）。
+    """
     
-    # 检查商品是否存在
-    product = db.query(Product).filter(Product.product_id == transaction.product_id).first()
+    product = (await db.execute(
+        select(Product.status, Product.seller_id)
+        .where(Product.product_id == transaction.product_id)
+    )).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="商品不存在"
         )
     
-    # 检查商品状态
-    if product.status != 1:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="商品不可购买"
-        )
-    
     # 检查是否是自己购买自己的商品
     if product.seller_id == current_user.user_id:
         raise HTTPException(
@@ -41,38 +61,73 @@ async def create_transaction(
             detail="不能购买自己的商品"
         )
     
-    # 检查商品是否已被下单
-    existing_transaction = db.query(Transaction).filter(
-        Transaction.product_id == transaction.product_id,
-        Transaction.status == 0
-    ).first()
-    
-    if existing_transaction:
+    # 检查商品状态
+    if product.status == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="商品已被下单，请等待卖家处理"
         )
+    if product.status != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="商品不可购买"
+        )
     
-    # 创建交易记录
-    transaction_id = generate_transaction_id()
-    db_transaction = Transaction(
-        transaction_id=transaction_id,
-        amount=product.price,
-        status=0,  # 未完成支付
-        buyer_id=current_user.user_id,
-        seller_id=product.seller_id,
-        product_id=transaction.product_id
-    )
-    
-    db.add(db_transaction)
+    # 本进程已有请求在抢占这件商品，结果要么是它成功，要么是商品已不可购买
+    if transaction.product_id in _claiming_products:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="商品已被下单，请等待卖家处理"
+        )
     
-    # 锁定商品（更新状态为0-不可选）
-    product.status = 0
-    db.commit()
-    db.refresh(db_transaction)
+    _claiming_products.add(transaction.product_id)
+    try:
+        # 结束只读事务，后面的条件更新从新的事务开始（SQLite 不允许读事务直接升级为写事务）
+        await db.rollback()
+        
+        # 抢占商品（更新状态为0-不可选），同一商品只有一个请求能成功
+        reserved = await db.execute(
+            update(Product)
+            .where(
+                Product.product_id == transaction.product_id,
+                Product.status == 1
+            )
+            .values(status=0)
+        )
+        if reserved.rowcount != 1:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="商品已被下单，请等待卖家处理"
+            )
+        await remove_listings(db, [transaction.product_id])
+        await record_product_changes(db, [transaction.product_id])
+        
+        # 创建交易记录，金额和卖家直接从已锁定的商品行中取
+        transaction_id = generate_transaction_id()
+        await db.execute(
+            insert(Transaction).from_select(
+                ["transaction_id", "created_at", "amount", "status", "buyer_id", "seller_id", "product_id"],
+                select(
+                    literal(transaction_id),
+                    func.current_timestamp(),
+                    Product.price,
+                    literal(0),  # 未完成支付
+                    literal(current_user.user_id),
+                    Product.seller_id,
+                    Product.product_id
+                ).where(Product.product_id == transaction.product_id)
+            )
+        )
+        await db.commit()
+    finally:
+        _claiming_products.discard(transaction.product_id)
+    product_index.set_status(transaction.product_id, 0)
+    transaction_count_cache.invalidate(current_user.user_id, product.seller_id)
+    order_expiry.schedule(transaction_id, transaction.product_id)
     
     # 获取交易详情
-    result = db.execute(text("""
+    result = await db.execute(text("""
         SELECT 
             t.transaction_id,
             t.created_at,
@@ -92,7 +147,8 @@ async def create_transaction(
                 ELSE '未知'
             END as counterparty_role,
             p.name as product_name,
-            c.name as category_name
+            c.name as category_name,
+            p.image_path as product_image_path
         FROM transactions t
         JOIN users u_buyer ON t.buyer_id = u_buyer.user_id
         JOIN users u_seller ON t.seller_id = u_seller.user_id
@@ -104,18 +160,21 @@ async def create_transaction(
     transaction_data = result.first()
     transaction_dict = transaction_data._asdict()
     
-    return TransactionResponse(**transaction_dict)
+    return TransactionResponse(
+        **transaction_dict, thumbnails=thumbnail_pipeline.variants(transaction_dict["product_image_path"])
+    )
 
 @router.put("/{transaction_id}/pay", response_model=TransactionResponse, summary="完成支付")
+@query_budget(6)
 async def complete_payment(
     transaction_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """完成支付"""
     
     # 获取交易记录
-    transaction = db.query(Transaction).filter(Transaction.transaction_id == transaction_id).first()
+    transaction = (await db.execute(select(Transaction).where(Transaction.transaction_id == transaction_id))).scalars().first()
     if not transaction:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -130,25 +189,45 @@ async def complete_payment(
         )
     
     # 检查交易状态
+    if transaction.status == 2:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="订单已超时取消，请重新下单"
+        )
     if transaction.status != 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="交易状态不正确"
         )
     
-    # 更新交易状态
-    transaction.status = 1  # 已成交
+    # 更新交易状态为已成交（条件更新，订单同时被过期处理时只有一方成功）
+    paid = await db.execute(
+        update(Transaction)
+        .where(Transaction.transaction_id == transaction_id, Transaction.status == 0)
+        .values(status=1)
+    )
+    if paid.rowcount != 1:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="订单已超时取消，请重新下单"
+        )
     
     # 更新商品状态
-    product = db.query(Product).filter(Product.product_id == transaction.product_id).first()
-    if product:
-        product.status = 2  # 商品已售出
+    await db.execute(
+        update(Product)
+        .where(Product.product_id == transaction.product_id)
+        .values(status=2)  # 商品已售出
+    )
+    await record_product_changes(db, [transaction.product_id])
     
-    db.commit()
-    db.refresh(transaction)
+    await db.commit()
+    order_expiry.discard(transaction_id)
+    product_index.set_status(transaction.product_id, 2)
+    transaction_count_cache.invalidate(transaction.buyer_id, transaction.seller_id)
     
     # 获取更新后的交易详情
-    result = db.execute(text("""
+    result = await db.execute(text("""
         SELECT 
             t.transaction_id,
             t.created_at,
@@ -168,7 +247,8 @@ async def complete_payment(
                 ELSE '未知'
             END as counterparty_role,
             p.name as product_name,
-            c.name as category_name
+            c.name as category_name,
+            p.image_path as product_image_path
         FROM transactions t
         JOIN users u_buyer ON t.buyer_id = u_buyer.user_id
         JOIN users u_seller ON t.seller_id = u_seller.user_id
@@ -180,142 +260,226 @@ async def complete_payment(
     transaction_data = result.first()
     transaction_dict = transaction_data._asdict()
     
-    return TransactionResponse(**transaction_dict)
+    return TransactionResponse(
+        **transaction_dict, thumbnails=thumbnail_pipeline.variants(transaction_dict["product_image_path"])
+    )
+
+
+# 买家侧、卖家侧分别走 idx_buyer_time / idx_seller_time 做范围扫描，
+# 各自按 (created_at, transaction_id) 倒序取前 N 条，再合并排序
+MY_TRANSACTIONS_SIDE_SQL = """
+    SELECT * FROM (
+        SELECT 
+            t.transaction_id,
+            t.created_at,
+            t.amount,
+            t.status,
+            t.buyer_id,
+            t.seller_id,
+            t.product_id,
+            t.{counterparty_column} AS counterparty_id,
+            '{counterparty_role}' AS counterparty_role
+        FROM transactions t{category_join}
+        WHERE t.{side_column} = :user_id{conditions}
+        ORDER BY t.created_at DESC, t.transaction_id DESC
+        LIMIT :side_limit
+    ) {alias}
+"""
+
+MY_TRANSACTIONS_COUNT_SQL = """
+    SELECT COUNT(*) FROM transactions t{category_join}
+    WHERE t.{side_column} = :user_id{conditions}
+"""
+
+# 列表字段 -> 外层 SELECT 中的列（图片路径、图片URL 和缩略图都由 p.image_path 得到）
+TRANSACTION_LIST_COLUMNS = {
+    "transaction_id": "m.transaction_id",
+    "created_at": "m.created_at",
+    "amount": "m.amount",
+    "status": "m.status",
+    "buyer_id": "m.buyer_id",
+    "seller_id": "m.seller_id",
+    "product_id": "m.product_id",
+    "counterparty_username": "u.username as counterparty_username",
+    "counterparty_role": "m.counterparty_role",
+    "product_name": "p.name as product_name",
+    "category_name": "c.name as category_name",
+    "product_image_path": "p.image_path",
+    "product_image_url": "p.image_path",
+    "thumbnails": "p.image_path",
+}
+# 排序和分页游标用到的列，总是查询
+TRANSACTION_LIST_KEY_FIELDS = ("transaction_id", "created_at")
 
+def _transaction_list_select(selected) -> tuple:
+    """按请求的字段拼出外层 SELECT 列表和需要的 JOIN"""
+    names = TRANSACTION_LIST_COLUMNS if selected is None else TRANSACTION_LIST_KEY_FIELDS + tuple(sorted(selected))
+    columns = list(dict.fromkeys(TRANSACTION_LIST_COLUMNS[name] for name in names))
+    joins = []
+    if any(column.startswith("u.") for column in columns):
+        joins.append("JOIN users u ON m.counterparty_id = u.user_id")
+    if any(column.startswith(("p.", "c.")) for column in columns):
+        joins.append("JOIN products p ON m.product_id = p.product_id")
+    if any(column.startswith("c.") for column in columns):
+        joins.append("JOIN categories c ON p.category_id = c.id")
+    return ",\n            ".join(columns), "\n        ".join(joins)
 
 @router.get("/my", response_model=TransactionListResponse, summary="我的交易记录")
+@query_budget(4)
 async def get_my_transactions(
-        status: Optional[int] = Query(None, ge=0, le=1, description="交易状态"),
+        status: Optional[int] = Query(None, ge=0, le=2, description="交易状态"),
         category_id: Optional[int] = Query(None, gt=0, description="分类ID"),
         start_date: Optional[datetime] = Query(None, description="开始日期"),
         end_date: Optional[datetime] = Query(None, description="结束日期"),
         page: int = Query(1, ge=1, description="页码"),
         page_size: int = Query(10, ge=1, le=100, description="每页数量"),
-        current_user: User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        cursor: Optional[str] = Query(None, description="分页游标，传入后按游标翻页且不再统计总数；首页传空字符串"),
+        fields: Optional[str] = Query(None, description="只返回这些字段，逗号分隔（如 transaction_id,amount,status,product_name,thumbnails）；不传时返回全部字段"),
+        current_user: UserPrincipal = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
 ):
-    """获取当前用户的交易记录（包含商品图片URL）"""
+    """获取当前用户的交易记录（包含商品图片URL）
 
-    # 构建查询条件
-    conditions = [
-        or_(
-            Transaction.buyer_id == current_user.user_id,
-            Transaction.seller_id == current_user.user_id
+    买家侧和卖家侧各自沿索引按时间倒序取数据后合并，所有筛选条件都以参数绑定。
+    page/page_size 分页返回总数（两侧分别 COUNT 后相加，并短暂缓存）；
+    cursor 分页不统计总数，任意深度的翻页代价都与首页相同。
+    传 fields 时只查询和返回这些字段，用不到的用户表、商品表、分类表不再关联。
+    """
+    try:
+        selected = transaction_page.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=str(e)
         )
-    ]
+    use_cursor = cursor is not None
+    params = {"user_id": current_user.user_id}
 
+    # 构建查询条件
+    conditions = []
     if status is not None:
-        conditions.append(Transaction.status == status)
-
+        conditions.append("t.status = :status")
+        params["status"] = status
     if start_date:
-        conditions.append(Transaction.created_at >= start_date)
-
+        conditions.append("t.created_at >= :start_date")
+        params["start_date"] = start_date
     if end_date:
-        conditions.append(Transaction.created_at <= end_date)
+        conditions.append("t.created_at <= :end_date")
+        params["end_date"] = end_date
+    category_join = ""
+    if category_id:
+        category_join = "\n        JOIN products cp ON cp.product_id = t.product_id AND cp.category_id = :category_id"
+        params["category_id"] = category_id
+
+    # 计算总数（游标分页时跳过）
+    total = None
+    if not use_cursor:
+        count_key = (status, category_id, start_date, end_date)
+        total = transaction_count_cache.get(current_user.user_id, count_key)
+        if total is None:
+            total = 0
+            for side_column in ("buyer_id", "seller_id"):
+                count_sql = MY_TRANSACTIONS_COUNT_SQL.format(
+                    category_join=category_join,
+                    side_column=side_column,
+                    conditions="".join(f" AND {c}" for c in conditions)
+                )
+                total += (await db.execute(text(count_sql), params)).scalar()
+            transaction_count_cache.put(current_user.user_id, count_key, total)
+
+    offset = (page - 1) * page_size
+    if use_cursor:
+        offset = 0
+        if cursor:
+            try:
+                cursor_time, cursor_id = decode_cursor(cursor, "my_transactions", 2)
+                cursor_time = parse_cursor_datetime(cursor_time)
+                if not isinstance(cursor_id, str):
+                    raise ValueError("无效的分页游标")
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=400,
+                    detail=str(e)
+                )
+            conditions.append("(t.created_at < :cursor_time OR (t.created_at = :cursor_time AND t.transaction_id < :cursor_id))")
+            params["cursor_time"] = cursor_time
+            params["cursor_id"] = cursor_id
+
+    # 每一侧最多取 offset + page_size（游标模式多取一条判断是否还有下一页）
+    limit = page_size + 1 if use_cursor else page_size
+    params["side_limit"] = offset + limit
+    params["limit"] = limit
+    params["offset"] = offset
+
+    sides = []
+    for side_column, counterparty_column, counterparty_role, alias in (
+        ("buyer_id", "seller_id", "卖家", "bought"),
+        ("seller_id", "buyer_id", "买家", "sold"),
+    ):
+        sides.append(MY_TRANSACTIONS_SIDE_SQL.format(
+            counterparty_column=counterparty_column,
+            counterparty_role=counterparty_role,
+            category_join=category_join,
+            side_column=side_column,
+            conditions="".join(f" AND {c}" for c in conditions),
+            alias=alias
+        ))
 
     # 从products表获取image_path，构建完整图片URL
-    query = db.execute(text("""
-        SELECT SQL_CALC_FOUND_ROWS 
-            t.transaction_id,
-            t.created_at,
-            t.amount,
-            t.status,
-            t.buyer_id,
-            t.seller_id,
-            t.product_id,
-            CASE 
-                WHEN u_buyer.user_id = :user_id AND u_buyer.user_id = t.buyer_id THEN u_seller.username
-                WHEN u_seller.user_id = :user_id AND u_seller.user_id = t.seller_id THEN u_buyer.username
-                ELSE '未知用户'
-            END as counterparty_username,
-            CASE 
-                WHEN u_buyer.user_id = :user_id AND u_buyer.user_id = t.buyer_id THEN '卖家'
-                WHEN u_seller.user_id = :user_id AND u_seller.user_id = t.seller_id THEN '买家'
-                ELSE '未知'
-            END as counterparty_role,
-            p.name as product_name,
-            c.name as category_name,
-            p.image_path  -- 从products表获取图片路径
-        FROM transactions t
-        JOIN users u_buyer ON t.buyer_id = u_buyer.user_id
-        JOIN users u_seller ON t.seller_id = u_seller.user_id
-        JOIN products p ON t.product_id = p.product_id  -- 关联商品表
-        JOIN categories c ON p.category_id = c.id
-        WHERE (t.buyer_id = :user_id OR t.seller_id = :user_id)
-    """ + (f" AND t.status = {status}" if status is not None else "") +
-                            (f" AND t.created_at >= '{start_date}'" if start_date else "") +
-                            (f" AND t.created_at <= '{end_date}'" if end_date else "") +
-                            (f" AND c.id = {category_id}" if category_id else "") +
-                            f" ORDER BY t.created_at DESC LIMIT {(page - 1) * page_size}, {page_size}"),
-                       {"user_id": current_user.user_id})
+    select_list, joins = _transaction_list_select(selected)
+    query = await db.execute(text(f"""
+        SELECT 
+            {select_list}
+        FROM (
+            {" UNION ALL ".join(sides)}
+        ) m
+        {joins}
+        ORDER BY m.created_at DESC, m.transaction_id DESC
+        LIMIT :limit OFFSET :offset
+    """), params)
 
     transactions = query.fetchall()
 
-    # 获取总数
-    total_query = db.execute(text("SELECT FOUND_ROWS()"))
-    total = total_query.scalar()
+    next_cursor = None
+    if use_cursor and len(transactions) > page_size:
+        transactions = transactions[:page_size]
+        last = transactions[-1]
+        next_cursor = encode_cursor("my_transactions", last.created_at, last.transaction_id)
 
-    transaction_list = []
     # 图片基础URL（与前端访问路径保持一致）
     IMAGE_BASE_URL = "http://localhost:8000/api/uploads/"
 
-    for transaction in transactions:
-        # 拼接完整的商品图片URL
-        product_image_url = None
-        if transaction.image_path:  # 使用products表中的image_path字段
-            product_image_url = f"{IMAGE_BASE_URL}{transaction.image_path}"
-
-        transaction_dict = {
-            "transaction_id": transaction.transaction_id,
-            "created_at": transaction.created_at,
-            "amount": transaction.amount,
-            "status": transaction.status,
-            "buyer_id": transaction.buyer_id,
-            "seller_id": transaction.seller_id,
-            "product_id": transaction.product_id,
-            "counterparty_username": transaction.counterparty_username,
-            "counterparty_role": transaction.counterparty_role,
-            "product_name": transaction.product_name,
-            "category_name": transaction.category_name,
-            "product_image_url": product_image_url  # 包含完整图片URL
-        }
-        transaction_list.append(TransactionResponse(** transaction_dict))
+    transaction_list = []
+    for transaction in rows_to_dicts(transactions):
+        # 使用products表中的image_path字段拼接完整的商品图片URL
+        image_path = transaction.pop("image_path", None)
+        transaction["product_image_path"] = image_path
+        transaction["product_image_url"] = f"{IMAGE_BASE_URL}{image_path}" if image_path else None
+        transaction_list.append(transaction)
 
-    total_pages = (total + page_size - 1) // page_size
+    total_pages = (total + page_size - 1) // page_size if total is not None else None
 
-    return TransactionListResponse(
-        transactions=transaction_list,
+    return transaction_page.response(
+        add_thumbnails(transaction_list, "product_image_path", selected),
+        selected,
         total=total,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 @router.get("/{transaction_id}", response_model=TransactionResponse, summary="交易详情")
+@query_budget(2)
 async def get_transaction_detail(
     transaction_id: str,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """获取交易详情"""
     
-    # 检查用户是否有权限查看此交易
-    transaction = db.query(Transaction).filter(
-        Transaction.transaction_id == transaction_id,
-        or_(
-            Transaction.buyer_id == current_user.user_id,
-            Transaction.seller_id == current_user.user_id
-        )
-    ).first()
-    
-    if not transaction:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="交易记录不存在或无权限查看"
-        )
-    
-    # 获取交易详情
-    result = db.execute(text("""
+    # 获取交易详情（只有买卖双方可以查看）
+    result = await db.execute(text("""
         SELECT 
             t.transaction_id,
             t.created_at,
@@ -335,22 +499,26 @@ async def get_transaction_detail(
                 ELSE '未知'
             END as counterparty_role,
             p.name as product_name,
-            c.name as category_name
+            c.name as category_name,
+            p.image_path as product_image_path
         FROM transactions t
         JOIN users u_buyer ON t.buyer_id = u_buyer.user_id
         JOIN users u_seller ON t.seller_id = u_seller.user_id
         JOIN products p ON t.product_id = p.product_id
         JOIN categories c ON p.category_id = c.id
         WHERE t.transaction_id = :transaction_id
+          AND (t.buyer_id = :user_id OR t.seller_id = :user_id)
     """), {"transaction_id": transaction_id, "user_id": current_user.user_id})
     
     transaction_data = result.first()
     if not transaction_data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
-            detail="交易记录不存在"
+            detail="交易记录不存在或无权限查看"
         )
     
     transaction_dict = transaction_data._asdict()
     
-    return TransactionResponse(**transaction_dict)
\ No newline at end of file
+    return TransactionResponse(
+        **transaction_dict, thumbnails=thumbnail_pipeline.variants(transaction_dict["product_image_path"])
+    )
\ No newline at end of file
@@ -1,74 +1,180 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
+import hashlib
 import os
-import shutil
-from datetime import datetime
+import re
+import secrets
 from pathlib import Path
-from database.models import User
+from typing import Optional
+from schemas.user import UserPrincipal
 from utils.security import get_current_user
+from utils.streaming import iter_form_file
+from utils.thumbnails import thumbnail_pipeline
+from utils.image_store import image_store, is_content_hashed, CONTENT_HASH_LENGTH
+from utils.static_files import file_response, IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL
+from config import settings
 
 router = APIRouter()
 
-# 上传目录
-UPLOAD_DIR = Path("uploads")
+# 上传目录（图片按内容哈希分目录保存，见 utils/image_store.py）
+UPLOAD_DIR = Path(settings.UPLOAD_DIR)
 UPLOAD_DIR.mkdir(exist_ok=True)
 
-@router.post("/upload", summary="上传文件")
+# 根据文件头（magic bytes）判断图片真实类型，不信任客户端的 Content-Type 和扩展名
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+)
+SNIFF_BYTES = 12
+
+# 可访问的文件：uploads 下的图片和 thumbs 下的缩略图；以 . 开头的临时文件不对外提供
+SERVABLE_PATH = re.compile(r"^(thumbs/)?[A-Za-z0-9_-][A-Za-z0-9_.-]*\.(jpg|jpeg|png|gif|webp)$", re.IGNORECASE)
+
+# multipart 边界和表单头的大致开销，Content-Length 超过 MAX_FILE_SIZE 加上这部分直接拒绝
+MULTIPART_OVERHEAD = 16 * 1024
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """返回图片对应的扩展名，不是支持的图片格式时返回 None"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return ".webp"
+    return None
+
+def _file_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"文件大小不能超过 {settings.MAX_FILE_SIZE // (1024 * 1024)}MB"
+    )
+
+def _not_image() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="只支持图片格式 (JPEG, PNG, GIF, WEBP)"
+    )
+
+UPLOAD_REQUEST_BODY = {
+    "required": True,
+    "content": {
+        "multipart/form-data": {
+            "schema": {
+                "type": "object",
+                "required": ["file"],
+                "properties": {"file": {"type": "string", "format": "binary"}},
+            }
+        }
+    },
+}
+
+@router.post("/upload", summary="上传文件", openapi_extra={"requestBody": UPLOAD_REQUEST_BODY})
 async def upload_file(
-    file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    request: Request,
+    current_user: UserPrincipal = Depends(get_current_user)
 ):
-    """上传商品图片"""
-    
-    # 检查文件类型
-    allowed_types = ["image/jpeg", "image/png", "image/gif", "image/webp"]
-    if file.content_type not in allowed_types:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="只支持图片格式 (JPEG, PNG, GIF, WEBP)"
-        )
-    
-    # 检查文件大小 (5MB)
-    file.file.seek(0, 2)
-    file_size = file.file.tell()
-    file.file.seek(0)
-    
-    if file_size > 5 * 1024 * 1024:
+    """上传商品图片（表单字段 file）
+
+    请求体边接收边写入临时文件：超过 MAX_FILE_SIZE 立即中止，
+    根据文件头判断图片类型，写完后原子重命名为正式文件名。
+    文件读写放在线程池中执行，不阻塞事件循环。
+    文件名是内容哈希，重复上传同一张图片只保留一份。
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD:
+        raise _file_too_large()
+
+    tmp_path = image_store.temp_path(secrets.token_hex(8))
+    buffer = await run_in_threadpool(open, tmp_path, "wb")
+    try:
+        size = 0
+        head = b""
+        ext = None
+        digest = hashlib.sha256()
+        async for chunk in iter_form_file(request.headers.get("content-type", ""), request.stream(), "file"):
+            size += len(chunk)
+            if size > settings.MAX_FILE_SIZE:
+                raise _file_too_large()
+            if ext is None:
+                # 攒够文件头再判断类型，判断通过前不写盘
+                head += chunk
+                if len(head) < SNIFF_BYTES:
+                    continue
+                ext = sniff_image_type(head)
+                if ext is None:
+                    raise _not_image()
+                chunk = head
+            digest.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+
+        if ext is None:
+            # 文件比 SNIFF_BYTES 还短
+            ext = sniff_image_type(head)
+            if ext is None:
+                raise _not_image()
+            digest.update(head)
+            await run_in_threadpool(buffer.write, head)
+        await run_in_threadpool(buffer.close)
+
+        filename = f"{digest.hexdigest()[:CONTENT_HASH_LENGTH]}{ext}"
+        await run_in_threadpool(image_store.save, tmp_path, filename)
+    except ValueError as e:
+        await run_in_threadpool(_discard, buffer, tmp_path)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="文件大小不能超过 5MB"
+            detail=str(e)
         )
-    
-    # 生成唯一文件名
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    ext = os.path.splitext(file.filename)[1]
-    filename = f"{current_user.user_id}_{timestamp}{ext}"
-    file_path = UPLOAD_DIR / filename
-    
-    # 保存文件
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+    except HTTPException:
+        await run_in_threadpool(_discard, buffer, tmp_path)
+        raise
     except Exception as e:
+        await run_in_threadpool(_discard, buffer, tmp_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"文件保存失败: {str(e)}"
         )
     
+    # 缩略图在后台进程中生成，不等待；重复上传的图片已经有缩略图，不会重新生成
+    thumbnail_pipeline.submit(filename)
+    
     return {
         "filename": filename,
-        "url": f"/uploads/{filename}"
+        "url": f"/api/uploads/{filename}"
     }
 
-@router.get("/uploads/{filename}", summary="获取上传的文件")
-async def get_uploaded_file(filename: str):
-    """获取上传的文件"""
-    file_path = UPLOAD_DIR / filename
-    
-    if not file_path.exists():
+def _discard(buffer, tmp_path: Path):
+    """上传失败时关闭并删除临时文件"""
+    buffer.close()
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+@router.api_route("/uploads/{file_path:path}", methods=["GET", "HEAD"], summary="获取上传的文件")
+async def get_uploaded_file(file_path: str, request: Request):
+    """获取上传的图片或缩略图
+
+    内容哈希命名的文件（及其缩略图）内容不会变，浏览器可以永久缓存；
+    旧的文件名每次都用 ETag 重新验证，未修改时返回 304。支持 Range 请求。
+    """
+    path = image_store.resolve(file_path) if SERVABLE_PATH.match(file_path) else None
+    if path is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="文件不存在"
         )
     
-    return FileResponse(file_path)
+    name = path.name
+    if is_content_hashed(name):
+        etag = f'"{name}"'
+        cache_control = IMMUTABLE_CACHE_CONTROL
+    else:
+        stat = path.stat()
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        cache_control = REVALIDATE_CACHE_CONTROL
+    
+    accel_redirect = None
+    if settings.UPLOAD_ACCEL_REDIRECT_PREFIX:
+        accel_redirect = f"{settings.UPLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{path.relative_to(image_store.root).as_posix()}"
+    return file_response(request, path, etag, cache_control, accel_redirect)
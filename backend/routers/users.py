@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Optional
 from database import get_db
 from database.models import User
-from schemas.user import UserResponse
+from database.listings import update_seller_listings
+from schemas.user import UserResponse, UserPrincipal
 from utils.security import get_current_user
+from utils.principal_cache import principal_cache
 
 router = APIRouter()
 
@@ -15,45 +17,49 @@ class UserUpdate(BaseModel):
     campus_card: Optional[str] = None
 
 @router.get("/profile", response_model=UserResponse, summary="获取用户信息")
-async def get_profile(current_user: User = Depends(get_current_user)):
+async def get_profile(current_user: UserPrincipal = Depends(get_current_user)):
     """获取当前用户信息"""
     return current_user
 
 @router.put("/profile", response_model=UserResponse, summary="更新用户信息")
 async def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """更新当前用户信息"""
     
+    user = (await db.execute(select(User).where(User.user_id == current_user.user_id))).scalars().first()
     if user_update.phone:
         # 检查手机号是否已被其他用户使用
-        existing_user = db.query(User).filter(
+        existing_user = (await db.execute(select(User.user_id).where(
             User.phone == user_update.phone,
             User.user_id != current_user.user_id
-        ).first()
+        ))).first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="手机号已被其他用户使用"
             )
-        current_user.phone = user_update.phone
+        user.phone = user_update.phone
+        # 在售商品读模型中冗余保存了卖家手机号
+        await update_seller_listings(db, user.user_id, seller_phone=user_update.phone)
     
     if user_update.campus_card:
         # 检查校园卡号是否已被其他用户使用
-        existing_user = db.query(User).filter(
+        existing_user = (await db.execute(select(User.user_id).where(
             User.campus_card == user_update.campus_card,
             User.user_id != current_user.user_id
-        ).first()
+        ))).first()
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="校园卡号已被其他用户使用"
             )
-        current_user.campus_card = user_update.campus_card
+        user.campus_card = user_update.campus_card
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(user)
+    principal_cache.invalidate_user(user.user_id)
     
-    return current_user
\ No newline at end of file
+    return user
\ No newline at end of file
@@ -1,10 +1,10 @@
-from .user import UserCreate, UserLogin, UserResponse, UserProfile
+from .user import UserCreate, UserLogin, UserResponse, UserProfile, UserPrincipal
 from .product import ProductCreate, ProductResponse, ProductUpdate, ProductSearch
 from .transaction import TransactionCreate, TransactionResponse, TransactionSearch
 from .category import CategoryResponse
 
 __all__ = [
-    "UserCreate", "UserLogin", "UserResponse", "UserProfile",
+    "UserCreate", "UserLogin", "UserResponse", "UserProfile", "UserPrincipal",
     "ProductCreate", "ProductResponse", "ProductUpdate", "ProductSearch",
     "TransactionCreate", "TransactionResponse", "TransactionSearch",
     "CategoryResponse"
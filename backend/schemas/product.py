@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Optional, Dict
 from datetime import datetime
+from config import settings
 
 class ProductCreate(BaseModel):
     name: str = Field(..., min_length=1, max_length=20, description="商品名称")
@@ -55,6 +56,7 @@ class ProductResponse(BaseModel):
     seller_username: Optional[str] = None
     seller_phone: Optional[str] = None
     category_name: Optional[str] = None
+    thumbnails: Optional[Dict[str, Dict[str, str]]] = None  # {尺寸: {webp/jpg: URL}}，尚未生成时为空；由路由填入
     
     @field_validator('price', mode='before')
     @classmethod
@@ -66,9 +68,47 @@ class ProductResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductListItem(ProductResponse):
+    """列表中的商品，可以用 fields 参数只返回部分字段"""
+    description_snippet: Optional[str] = None  # 截断的描述，只在 fields 中请求时返回
+
+    @field_validator('description_snippet')
+    @classmethod
+    def truncate_snippet(cls, v):
+        # SQL 中多取了一个字符，超出长度说明原文被截断
+        if v is not None and len(v) > settings.DESCRIPTION_SNIPPET_LENGTH:
+            return v[:settings.DESCRIPTION_SNIPPET_LENGTH].rstrip() + "…"
+        return v
+
 class ProductListResponse(BaseModel):
-    products: list[ProductResponse]
-    total: int
+    products: list[ProductListItem]
+    total: Optional[int] = None  # 游标分页时不统计总数
     page: int
     page_size: int
-    total_pages: int
\ No newline at end of file
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # 游标分页的下一页游标，为空表示没有更多
+
+class ProductBulkRowResult(BaseModel):
+    row: int  # 数据行号，从 1 开始（不含 CSV 表头）
+    success: bool
+    product_id: Optional[str] = None
+    error: Optional[str] = None
+
+class ProductBulkResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    results: list[ProductBulkRowResult]
+class CategoryFacet(BaseModel):
+    category_id: int
+    count: int
+
+class PriceBucket(BaseModel):
+    min_price: int  # 单位：分，包含
+    max_price: Optional[int] = None  # 单位：分，包含；最后一个桶没有上限
+    count: int
+
+class ProductFacetsResponse(BaseModel):
+    total: int  # 满足全部筛选条件的商品数
+    categories: list[CategoryFacet]  # 各分类的商品数（按价格区间筛选，不按分类筛选）
+    price_buckets: list[PriceBucket]  # 价格分布（按分类筛选，不按价格区间筛选）
@@ -1,12 +1,12 @@
 from pydantic import BaseModel, Field, field_validator
-from typing import Optional
+from typing import Optional, Dict
 from datetime import datetime
 
 class TransactionCreate(BaseModel):
     product_id: str = Field(..., description="商品ID")
 
 class TransactionSearch(BaseModel):
-    status: Optional[int] = Field(None, ge=0, le=1, description="交易状态")
+    status: Optional[int] = Field(None, ge=0, le=2, description="交易状态")
     category_id: Optional[int] = Field(None, gt=0, description="分类ID")
     start_date: Optional[datetime] = Field(None, description="开始日期")
     end_date: Optional[datetime] = Field(None, description="结束日期")
@@ -25,6 +25,9 @@ class TransactionResponse(BaseModel):
     counterparty_role: Optional[str] = None
     product_name: Optional[str] = None
     category_name: Optional[str] = None
+    product_image_path: Optional[str] = None
+    product_image_url: Optional[str] = None
+    thumbnails: Optional[Dict[str, Dict[str, str]]] = None  # 商品图片的缩略图 {尺寸: {webp/jpg: URL}}，由路由填入
     
     @field_validator('amount', mode='before')
     @classmethod
@@ -38,7 +41,8 @@ class TransactionResponse(BaseModel):
 
 class TransactionListResponse(BaseModel):
     transactions: list[TransactionResponse]
-    total: int
+    total: Optional[int] = None  # 游标分页时不统计总数
     page: int
     page_size: int
-    total_pages: int
\ No newline at end of file
+    total_pages: Optional[int] = None
+    next_cursor: Optional[str] = None  # 游标分页的下一页游标，为空表示没有更多
\ No newline at end of file
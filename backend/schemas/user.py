@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional
 from datetime import datetime
 
@@ -32,6 +32,16 @@ class UserProfile(BaseModel):
     class Config:
         from_attributes = True
 
+class UserPrincipal(BaseModel):
+    """已认证用户的只读信息，由 get_current_user 返回并缓存"""
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+    user_id: str
+    username: str
+    phone: str
+    campus_card: str
+    created_at: datetime
+
 class Token(BaseModel):
     access_token: str
     token_type: str
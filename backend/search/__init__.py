@@ -0,0 +1,50 @@
+import os
+from sqlalchemy import text, select, func
+from config import settings
+from .index import SearchIndex
+from .sync import IndexSync
+from .tokenizer import tokenize
+
+# 商品检索索引（每个进程一份，按商品变更日志同步其他进程的写入）
+product_index = SearchIndex()
+index_sync = IndexSync(
+    product_index,
+    interval=settings.SEARCH_SYNC_SECONDS,
+    margin=settings.SEARCH_SYNC_MARGIN_SECONDS,
+    retention=settings.PRODUCT_CHANGE_RETENTION_HOURS * 3600,
+)
+
+def load_or_build_index(db) -> str:
+    """启动时加载磁盘上的索引，不存在或已过期时从 products 表全量构建
+
+    只有正常关闭时才会写出索引文件，加载后立即删除，
+    因此进程异常退出后下次启动一定会从数据库重建，不会用到过期的索引。
+    加载的索引从保存时的变更日志位置继续同步；变更日志已被清理时同样重新构建。
+    """
+    path = settings.SEARCH_INDEX_PATH
+    now = db.execute(select(func.current_timestamp())).scalar()
+    try:
+        synced_at = product_index.load(path)
+        if synced_at is not None:
+            os.remove(path)
+            if index_sync.can_resume(synced_at, now):
+                index_sync.since = synced_at
+                return "loaded"
+    except Exception as e:
+        print(f"加载搜索索引失败，将重新构建: {e}")
+
+    # 先记下数据库时间再读取商品，构建期间的写入由变更日志补上
+    index_sync.reset(now)
+    rows = db.execute(text("""
+        SELECT product_id, name, description, status, category_id, price, seller_id, created_at
+        FROM products
+    """)).yield_per(5000)
+    product_index.build(rows)
+    return "built"
+
+def save_index():
+    """关闭时把索引写回磁盘"""
+    if product_index.ready:
+        product_index.save(settings.SEARCH_INDEX_PATH, index_sync.since)
+
+__all__ = ["product_index", "index_sync", "load_or_build_index", "save_index", "SearchIndex", "tokenize"]
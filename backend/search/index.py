@@ -0,0 +1,280 @@
+import heapq
+import json
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from .tokenizer import tokenize
+
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+# 商品名称中的词比描述中的词更重要
+NAME_WEIGHT = 2
+
+INDEX_FORMAT_VERSION = 2
+
+class IndexedProduct:
+    """索引中保存的商品信息：用于过滤和排序，避免再回表"""
+    __slots__ = ("terms", "length", "status", "category_id", "price", "seller_id", "created_ts")
+
+    def __init__(self, terms, length, status, category_id, price, seller_id, created_ts):
+        self.terms = terms
+        self.length = length
+        self.status = status
+        self.category_id = category_id
+        self.price = price
+        self.seller_id = seller_id
+        self.created_ts = created_ts
+
+
+def _timestamp(value) -> float:
+    if value is None:
+        return 0.0
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def _intersect(candidates: Set[str], posting: Dict[str, int]) -> Set[str]:
+    """遍历较小的一方求交集"""
+    if len(candidates) <= len(posting):
+        return {pid for pid in candidates if pid in posting}
+    return {pid for pid in posting if pid in candidates}
+
+
+def sort_key(sort_by: str, doc: IndexedProduct, product_id: str, score: float) -> tuple:
+    """检索结果的排序键（降序），相同时再按 product_id 降序"""
+    if sort_by == "price_asc":
+        return (-doc.price, doc.created_ts)
+    if sort_by == "price_desc":
+        return (doc.price, doc.created_ts)
+    if sort_by == "newest":
+        return (doc.created_ts, product_id)
+    return (score, doc.created_ts)
+
+
+class SearchIndex:
+    """商品全文检索的倒排索引（进程内，可持久化到本地磁盘）
+
+    - 商品名称和描述按 tokenizer.tokenize 分词
+    - 多个查询词之间为"与"关系，结果按 BM25 打分排序
+    - 索引中保存状态、分类、价格、卖家和发布时间，过滤和排序都在内存中完成
+    """
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.docs: Dict[str, IndexedProduct] = {}
+        self.total_length = 0
+        self.ready = False
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------
+    # 增量更新
+    # ------------------------------------------------------------
+    def add(self, product_id: str, name: str, description: Optional[str], status: int,
+            category_id: int, price: int, seller_id: str, created_at=None):
+        """添加或替换一个商品"""
+        term_freqs: Dict[str, int] = {}
+        for term in tokenize(name, with_unigrams=True):
+            term_freqs[term] = term_freqs.get(term, 0) + NAME_WEIGHT
+        for term in tokenize(description, with_unigrams=True):
+            term_freqs[term] = term_freqs.get(term, 0) + 1
+        length = sum(term_freqs.values())
+
+        with self._lock:
+            self._remove(product_id)
+            for term, tf in term_freqs.items():
+                self.postings.setdefault(term, {})[product_id] = tf
+            self.docs[product_id] = IndexedProduct(
+                tuple(term_freqs), length, status, category_id, price, seller_id, _timestamp(created_at)
+            )
+            self.total_length += length
+
+    def add_product(self, product):
+        """从 ORM 对象或查询结果行添加商品"""
+        self.add(
+            product.product_id, product.name, product.description, product.status,
+            product.category_id, product.price, product.seller_id, product.created_at
+        )
+
+    def remove(self, product_id: str):
+        """从索引中删除商品"""
+        with self._lock:
+            self._remove(product_id)
+
+    def _remove(self, product_id: str):
+        doc = self.docs.pop(product_id, None)
+        if doc is None:
+            return
+        for term in doc.terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(product_id, None)
+                if not posting:
+                    del self.postings[term]
+        self.total_length -= doc.length
+
+    def set_status(self, product_id: str, status: int):
+        """商品状态变化（下单、支付、下架）时同步更新"""
+        with self._lock:
+            doc = self.docs.get(product_id)
+            if doc is not None:
+                doc.status = status
+
+    # ------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------
+    def _snapshot(self, keyword: str):
+        """在锁内复制查询词的倒排表，返回 (倒排表列表, 文档表, 平均长度)；没有命中时返回 None
+
+        复制是 C 层面的字典拷贝，持锁时间很短；求交集和打分在锁外进行，
+        写操作（发布、下单等，在事件循环上执行）不会等待耗时的检索。
+        """
+        terms = list(dict.fromkeys(tokenize(keyword)))
+        if not terms:
+            return None
+        with self._lock:
+            if not self.docs:
+                return None
+            postings = []
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    return None
+                postings.append(dict(posting))
+            return postings, self.docs, self.total_length / len(self.docs)
+
+    def match(self, keyword: str) -> Dict[str, float]:
+        """返回同时包含所有查询词的商品 {product_id: BM25 分数}
+
+        命中多的词（如常见的二字词）要遍历大量商品，路由中应在线程池里调用。
+        """
+        snapshot = self._snapshot(keyword)
+        if snapshot is None:
+            return {}
+        postings, docs, avg_length = snapshot
+
+        # 从最短的倒排表开始求交集
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates = _intersect(candidates, posting)
+            if not candidates:
+                return {}
+
+        # 复制之后被删除的商品不再返回
+        lengths = {}
+        for product_id in candidates:
+            doc = docs.get(product_id)
+            if doc is not None:
+                lengths[product_id] = doc.length
+        doc_count = len(docs)
+        scores = dict.fromkeys(lengths, 0.0)
+        for posting in postings:
+            df = len(posting)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for product_id, length in lengths.items():
+                tf = posting[product_id]
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                scores[product_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def match_listings(self, keyword: str, exclude_seller_id: Optional[str] = None) -> List[Tuple[int, int]]:
+        """关键词命中的在售商品的 (分类, 价格)，用于分面统计"""
+        docs = self.docs
+        pairs = []
+        for product_id in self.match(keyword):
+            doc = docs.get(product_id)
+            if doc is not None and doc.status == 1 and doc.seller_id != exclude_seller_id:
+                pairs.append((doc.category_id, doc.price))
+        return pairs
+
+    def search(self, keyword: str, sort_by: str = "relevance", offset: int = 0, limit: int = 10,
+               category_id: Optional[int] = None, min_price: Optional[int] = None,
+               max_price: Optional[int] = None, exclude_seller_id: Optional[str] = None,
+               status: int = 1, after: Optional[tuple] = None) -> Tuple[List[str], int, Optional[tuple]]:
+        """检索在售商品，返回 (当前页的 product_id 列表, 命中总数, 下一页的 after)
+
+        价格单位为分，与数据库一致。结果按 (排序键, product_id) 降序排列，排序键见 sort_key；
+        after 为上一页最后一个结果的 (排序键, product_id)，传入后只返回排在它后面的结果（游标翻页，
+        代价与页深无关），此时 offset 应为 0。后面没有结果时返回的 after 为 None。
+        """
+        scores = self.match(keyword)
+        if not scores:
+            return [], 0, None
+
+        docs = self.docs
+        hits = []
+        total = 0
+        for product_id, score in scores.items():
+            doc = docs.get(product_id)
+            if doc is None or doc.status != status:
+                continue
+            if category_id and doc.category_id != category_id:
+                continue
+            if min_price is not None and doc.price < min_price:
+                continue
+            if max_price is not None and doc.price > max_price:
+                continue
+            if exclude_seller_id and doc.seller_id == exclude_seller_id:
+                continue
+            total += 1
+            hit = (sort_key(sort_by, doc, product_id, score), product_id)
+            if after is None or hit < after:
+                hits.append(hit)
+
+        top = heapq.nlargest(offset + limit + 1, hits)
+        page = top[offset:offset + limit]
+        next_after = page[-1] if len(top) > offset + limit else None
+        return [product_id for _, product_id in page], total, next_after
+
+    # ------------------------------------------------------------
+    # 构建与持久化
+    # ------------------------------------------------------------
+    def build(self, rows):
+        """用商品行全量重建索引"""
+        with self._lock:
+            self.postings = {}
+            self.docs = {}
+            self.total_length = 0
+            for row in rows:
+                self.add_product(row)
+            self.ready = True
+
+    def save(self, path: str, synced_at: Optional[datetime] = None):
+        """原子地写入磁盘（先写临时文件再重命名）
+
+        使用 JSON 格式，加载时不会执行任何代码；synced_at 为索引已同步到的变更日志时间。
+        """
+        with self._lock:
+            state = {
+                "version": INDEX_FORMAT_VERSION,
+                "synced_at": synced_at.isoformat() if synced_at else None,
+                "postings": self.postings,
+                "docs": {pid: [getattr(doc, f) for f in IndexedProduct.__slots__] for pid, doc in self.docs.items()},
+                "total_length": self.total_length,
+            }
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp_path, path)
+
+    def load(self, path: str) -> Optional[datetime]:
+        """从磁盘加载索引，返回保存时的 synced_at；文件不存在或版本不符时返回 None"""
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if not isinstance(state, dict) or state.get("version") != INDEX_FORMAT_VERSION or not state.get("synced_at"):
+            return None
+        docs = {}
+        for pid, (terms, length, status, category_id, price, seller_id, created_ts) in state["docs"].items():
+            docs[pid] = IndexedProduct(tuple(terms), length, status, category_id, price, seller_id, created_ts)
+        with self._lock:
+            self.postings = state["postings"]
+            self.docs = docs
+            self.total_length = state["total_length"]
+            self.ready = True
+        return datetime.fromisoformat(state["synced_at"])
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import select, delete, bindparam
+from starlette.concurrency import run_in_threadpool
+from database import AsyncSessionLocal
+from database.models import Product, ProductChange
+from .index import SearchIndex
+
+# 每次读取的商品数
+FETCH_BATCH = 1000
+# 删除过期变更记录的间隔（秒）
+PRUNE_INTERVAL = 3600
+
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class IndexSync:
+    """按商品变更日志（product_changes 表）同步本进程的搜索索引
+
+    - 每隔 interval 秒读取 changed_at >= since 的变更记录，重新读取这些商品并替换索引中的条目；
+      本进程自己的写入在提交后已直接更新过索引，再读一次结果相同
+    - since 取已读到的最新变更时间减去 margin 秒：变更时间是写入时间而不是提交时间，
+      提交较晚的记录在之后几轮中仍能读到；已处理的 change_id 记在 _seen 中，不会重复读取商品
+    - 时间都取自数据库，不受各服务器之间时钟差异的影响
+    - 每小时删除一次早于 since - retention 的变更记录
+    """
+
+    def __init__(self, index: SearchIndex, interval: float, margin: int, retention: int):
+        self.index = index
+        self.interval = interval
+        self.margin = timedelta(seconds=margin)
+        self.retention = timedelta(seconds=retention)
+        self.since: Optional[datetime] = None
+        self._seen: Dict[int, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_prune = 0.0
+        self.syncs = 0
+        self.refreshed_total = 0
+        self.last_sync_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def reset(self, now: datetime):
+        """全量构建索引前调用，now 为构建开始时的数据库时间"""
+        self.since = _to_datetime(now) - self.margin
+        self._seen = {}
+
+    def can_resume(self, synced_at: datetime, now: datetime) -> bool:
+        """磁盘上的索引能否接着变更日志同步（所需的变更记录还没有被删除）"""
+        return _to_datetime(synced_at) >= _to_datetime(now) - self.retention + self.margin
+
+    async def sync_once(self) -> int:
+        """读取一轮新的变更，返回更新的商品数"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(ProductChange.change_id, ProductChange.product_id, ProductChange.changed_at)
+                .where(ProductChange.changed_at >= self.since)
+            )).all()
+            fresh = [row for row in rows if row.change_id not in self._seen]
+            product_ids = list(dict.fromkeys(row.product_id for row in fresh))
+            products: List = []
+            for i in range(0, len(product_ids), FETCH_BATCH):
+                products.extend((await db.execute(
+                    select(
+                        Product.product_id, Product.name, Product.description, Product.status,
+                        Product.category_id, Product.price, Product.seller_id, Product.created_at
+                    ).where(Product.product_id.in_(bindparam("ids", expanding=True))),
+                    {"ids": product_ids[i:i + FETCH_BATCH]}
+                )).all())
+
+        if product_ids:
+            await run_in_threadpool(self._apply, product_ids, products)
+
+        for row in fresh:
+            self._seen[row.change_id] = _to_datetime(row.changed_at)
+        if rows:
+            latest = max(_to_datetime(row.changed_at) for row in rows)
+            self.since = max(self.since, latest - self.margin)
+            self._seen = {change_id: at for change_id, at in self._seen.items() if at >= self.since}
+        return len(product_ids)
+
+    def _apply(self, product_ids: List[str], products: List):
+        found = set()
+        for product in products:
+            self.index.add_product(product)
+            found.add(product.product_id)
+        for product_id in product_ids:
+            if product_id not in found:
+                self.index.remove(product_id)
+
+    async def prune(self) -> int:
+        """删除过期的变更记录"""
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(ProductChange).where(ProductChange.changed_at < self.since - self.retention)
+            )
+            await db.commit()
+        return result.rowcount
+
+    # ------------------------------------------------------------
+    # 后台任务
+    # ------------------------------------------------------------
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            start = time.perf_counter()
+            try:
+                self.refreshed_total += await self.sync_once()
+                if time.monotonic() - self._last_prune >= PRUNE_INTERVAL:
+                    self._last_prune = time.monotonic()
+                    await self.prune()
+                self.last_error = None
+            except Exception as e:
+                print(f"同步搜索索引失败: {e}")
+                self.last_error = str(e)
+            finally:
+                self.syncs += 1
+                self.last_sync_ms = (time.perf_counter() - start) * 1000
+
+    async def start(self):
+        if self.interval > 0 and self.since is not None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "since": self.since.isoformat() if self.since else None,
+            "syncs": self.syncs,
+            "refreshed_total": self.refreshed_total,
+            "last_sync_ms": round(self.last_sync_ms, 2),
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,34 @@
+import re
+from typing import List
+
+# 中日韩统一表意文字（含扩展A区与兼容区）
+CJK_PATTERN = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+TOKEN_RE = re.compile(rf"[{CJK_PATTERN}]+|[0-9a-z\u00c0-\u024f]+")
+CJK_RE = re.compile(rf"^[{CJK_PATTERN}]")
+
+def is_cjk(token: str) -> bool:
+    """判断词元是否由中文字符组成"""
+    return bool(CJK_RE.match(token))
+
+def tokenize(text: str, with_unigrams: bool = False) -> List[str]:
+    """分词：中文按二元组(bigram)切分，英文和数字按整词切分
+
+    例如 "iPad 9成新平板" -> ["ipad", "9", "成新", "新平", "平板"]
+    单个汉字组成的片段保留为一元词。建索引时传入 with_unigrams=True，
+    额外为每个汉字生成一元词，这样 "书"、"伞" 这类单字查询也能命中。
+    """
+    if not text:
+        return []
+
+    tokens = []
+    for run in TOKEN_RE.findall(text.lower()):
+        if is_cjk(run):
+            if len(run) == 1:
+                tokens.append(run)
+                continue
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            if with_unigrams:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
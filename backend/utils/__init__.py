@@ -1,7 +1,7 @@
-from .security import verify_password, get_password_hash, create_access_token, get_current_user
+from .security import verify_password, get_password_hash, create_access_token, get_current_user, password_hasher
 from .helpers import generate_user_id, generate_product_id, generate_transaction_id
 
 __all__ = [
-    "verify_password", "get_password_hash", "create_access_token", "get_current_user",
+    "verify_password", "get_password_hash", "create_access_token", "get_current_user", "password_hasher",
     "generate_user_id", "generate_product_id", "generate_transaction_id"
 ]
\ No newline at end of file
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Dict, Hashable, Optional, Tuple
+from config import settings
+
+class CountCache:
+    """按用户分组的计数缓存（带过期时间）
+
+    用于列表接口的总数：同一用户、同一组筛选条件在 ttl 秒内复用上一次的 COUNT 结果。
+    用户数据变化时调用 invalidate(owner) 清除该用户的全部计数；
+    没有显式失效的变化（如其他进程中的写入）最多延迟 ttl 秒反映到总数上。
+    """
+
+    def __init__(self, ttl: float, max_owners: int = 10000):
+        self.ttl = ttl
+        self.max_owners = max_owners
+        self._data: Dict[Hashable, Dict[Hashable, Tuple[int, float]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, owner: Hashable, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._data.get(owner, {}).get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, owner: Hashable, key: Hashable, value: int):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if owner not in self._data and len(self._data) >= self.max_owners:
+                # 超出容量时丢弃最早加入的用户
+                self._data.pop(next(iter(self._data)))
+            self._data.setdefault(owner, {})[key] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, *owners: Hashable):
+        with self._lock:
+            for owner in owners:
+                self._data.pop(owner, None)
+
+
+# 交易总数缓存：按用户保存各筛选条件下的总数（交易接口和订单超时任务共用）
+transaction_count_cache = CountCache(ttl=settings.TRANSACTION_COUNT_CACHE_TTL)
@@ -1,24 +1,16 @@
-import random
-import string
-from datetime import datetime
+from .id_generator import user_ids, product_ids, transaction_ids
 
 def generate_user_id() -> str:
     """生成10位用户ID"""
-    timestamp = str(int(datetime.now().timestamp()))[-6:]  # 取时间戳后6位
-    random_chars = ''.join(random.choices(string.digits, k=4))  # 4位随机数字
-    return timestamp + random_chars
+    return user_ids.next_id()
 
 def generate_product_id() -> str:
-    """生成12位商品ID"""
-    timestamp = str(int(datetime.now().timestamp()))[-7:]  # 取时间戳合7位
-    random_chars = ''.join(random.choices(string.digits, k=4))  # 4位随机数字
-    return 'P' + timestamp + random_chars  # P + 7 + 4 = 12
+    """生成12位商品ID（P + 11位）"""
+    return product_ids.next_id()
 
 def generate_transaction_id() -> str:
-    """生成15位交易ID"""
-    timestamp = str(int(datetime.now().timestamp()))[-10:]  # 取时间戳后10位
-    random_chars = ''.join(random.choices(string.digits, k=4))  # 4位随机数字
-    return 'T' + timestamp + random_chars
+    """生成15位交易ID（T + 14位）"""
+    return transaction_ids.next_id()
 
 def validate_phone(phone: str) -> bool:
     """验证手机号格式"""
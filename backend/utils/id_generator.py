@@ -0,0 +1,318 @@
+import asyncio
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import engine
+from database.models import IdWorkerLease
+
+# 自定义纪元 2024-01-01 00:00:00 UTC（毫秒），41 位时间戳可用到 2093 年
+EPOCH_MS = 1704067200000
+TIMESTAMP_BITS = 41
+WORKER_BITS = 6  # 最多 63 个进程同时生成 ID（最大的 worker id 留给合成数据）
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+
+# 只用数字和大写字母：按字符串排序与数值顺序一致，MySQL 不区分大小写的排序规则下也不会冲突
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def encode_base36(value: int, width: int) -> str:
+    chars = []
+    for _ in range(width):
+        value, remainder = divmod(value, 36)
+        chars.append(ALPHABET[remainder])
+    if value:
+        raise ValueError("ID 超出长度限制")
+    return "".join(reversed(chars))
+
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+class WorkerIdUnavailable(HTTPException):
+    """服务中后台任务没能在租约失效前续约或重新申请到 worker id，暂时不能生成 ID
+
+    是 HTTPException，路由中的 except HTTPException 会原样抛出，客户端收到 503 后重试。
+    """
+
+    def __init__(self, reason: Optional[str]):
+        super().__init__(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="服务暂时不可用，请稍后重试")
+        self.reason = reason
+
+
+class WorkerIdAllocator:
+    """为当前进程分配一个 worker id（数据库中的租约，多台服务器之间也不会重复）
+
+    - id_worker_leases 表中每个 worker id 一行 (持有者, 续约时间)；进程占用一个还没有行、
+      或超过 lease_seconds 未续约的 worker id，用带条件的 INSERT / UPDATE 保证只有一个进程能占用
+    - 服务中（start() 之后）每 lease_seconds/12 由后台任务在线程池中续约，续约失败或租约被接手时
+      也由后台任务重新申请；get() 只读取缓存的 worker id，不访问数据库也不等待锁，
+      租约已失效时抛出 WorkerIdUnavailable
+    - 脚本中距上次成功续约超过 lease_seconds/6 时在 get() 里同步续约
+    - 超过 lease_seconds/2 没有续约成功就不再使用这个 worker id，重新申请（其他进程要在过期
+      lease_seconds 之后才能接手，两者之间留有余量）
+    - 配置了 ID_WORKER_ID 时使用固定值，同样占用租约；该值正被其他进程使用时报错
+    - MAX_WORKER_ID 留给按历史时间生成 ID 的 HistoricalIdGenerator，不会分配给服务
+    - fork 出的子进程会重新申请；脚本应在开启写事务之前先调用一次 get()
+      （申请和续约使用单独的连接，SQLite 上会等待其他写事务结束）
+    """
+
+    def __init__(self, lease_seconds: int, fixed_id: Optional[int] = None):
+        self.lease_seconds = lease_seconds
+        self.fixed_id = fixed_id
+        self.owner = ""
+        self._worker_id: Optional[int] = None
+        self._pid: Optional[int] = None
+        self._renew_due = 0.0
+        self._valid_until = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._background_pid: Optional[int] = None
+        self._mutex = threading.Lock()
+        self.renewals = 0
+        self.last_error: Optional[str] = None
+
+    def get(self) -> int:
+        if self._background_pid == os.getpid():
+            # 服务中：续约和重新申请都由后台任务完成，这里可能在事件循环上被调用
+            worker_id = self._worker_id
+            if worker_id is None or time.monotonic() >= self._valid_until:
+                raise WorkerIdUnavailable(self.last_error)
+            return worker_id
+        if self._pid == os.getpid() and time.monotonic() < self._renew_due:
+            return self._worker_id
+        with self._mutex:
+            if self._pid != os.getpid():
+                # 新进程（或 fork 出的子进程）：重新申请
+                self._pid = os.getpid()
+                self._worker_id = None
+                self.owner = f"{socket.gethostname()[:60]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            now = time.monotonic()
+            if self._worker_id is not None and now >= self._renew_due and now < self._valid_until:
+                self._renew()
+            if self._worker_id is None or time.monotonic() >= self._valid_until:
+                self._acquire()
+        return self._worker_id
+
+    def _mark_renewed(self, started: float):
+        self._renew_due = started + self.lease_seconds / 6
+        self._valid_until = started + self.lease_seconds / 2
+
+    def _renew(self) -> bool:
+        started = time.monotonic()
+        try:
+            with engine.begin() as connection:
+                renewed = connection.execute(
+                    update(IdWorkerLease)
+                    .where(IdWorkerLease.worker_id == self._worker_id, IdWorkerLease.owner == self.owner)
+                    .values(renewed_at=func.current_timestamp())
+                ).rowcount == 1
+        except Exception as e:
+            # 数据库暂时不可用：在 _valid_until 之前继续使用当前 worker id
+            print(f"worker id 续约失败: {e}")
+            self.last_error = str(e)
+            self._renew_due = min(time.monotonic() + 1, self._valid_until)
+            return False
+        if renewed:
+            self._mark_renewed(started)
+            self.renewals += 1
+            self.last_error = None
+        else:
+            # 租约已被其他进程接手
+            print(f"worker id {self._worker_id} 的租约已失效，重新申请")
+            self._worker_id = None
+        return renewed
+
+    def _acquire(self):
+        if self.fixed_id is not None:
+            if not 0 <= self.fixed_id < MAX_WORKER_ID:
+                raise ValueError(f"ID_WORKER_ID 必须在 0-{MAX_WORKER_ID - 1} 之间")
+            candidates = [self.fixed_id]
+        else:
+            candidates = list(range(MAX_WORKER_ID))
+
+        with engine.connect() as connection:
+            now = _to_datetime(connection.execute(select(func.current_timestamp())).scalar())
+            leases = {row.worker_id: row for row in connection.execute(
+                select(IdWorkerLease.worker_id, IdWorkerLease.owner, IdWorkerLease.renewed_at)
+            )}
+        cutoff = now - timedelta(seconds=self.lease_seconds)
+
+        for worker_id in candidates:
+            lease = leases.get(worker_id)
+            if lease is not None and lease.owner != self.owner and _to_datetime(lease.renewed_at) >= cutoff:
+                continue
+            started = time.monotonic()
+            try:
+                with engine.begin() as connection:
+                    if lease is None:
+                        connection.execute(insert(IdWorkerLease).values(
+                            worker_id=worker_id, owner=self.owner, renewed_at=func.current_timestamp()
+                        ))
+                        claimed = True
+                    else:
+                        conditions = [IdWorkerLease.worker_id == worker_id, IdWorkerLease.owner == lease.owner]
+                        if lease.owner != self.owner:
+                            # 只有原持有者在此期间没有续约时才能接手
+                            conditions.append(IdWorkerLease.renewed_at < cutoff)
+                        claimed = connection.execute(
+                            update(IdWorkerLease).where(*conditions)
+                            .values(owner=self.owner, renewed_at=func.current_timestamp())
+                        ).rowcount == 1
+            except IntegrityError:
+                claimed = False
+            if claimed:
+                self._worker_id = worker_id
+                self._mark_renewed(started)
+                return
+
+        if self.fixed_id is not None:
+            raise RuntimeError(
+                f"worker id {self.fixed_id} 正被其他进程使用（ID_WORKER_ID 配置重复，"
+                f"或上次异常退出的进程的租约尚未过期，最多等待 {self.lease_seconds} 秒）"
+            )
+        raise RuntimeError(f"没有可用的 worker id（同时运行的进程超过 {MAX_WORKER_ID} 个）")
+
+    def release(self):
+        """正常退出时释放租约，其他进程可以立即使用这个 worker id"""
+        if self._worker_id is None or self._pid != os.getpid():
+            return
+        with engine.begin() as connection:
+            connection.execute(
+                delete(IdWorkerLease)
+                .where(IdWorkerLease.worker_id == self._worker_id, IdWorkerLease.owner == self.owner)
+            )
+        self._worker_id = None
+        self._renew_due = self._valid_until = 0.0
+
+    # ------------------------------------------------------------
+    # 后台续约
+    # ------------------------------------------------------------
+    async def run(self):
+        while True:
+            # 在 get() 认为需要续约（lease_seconds/6）之前就续约；失败后 1 秒重试
+            await asyncio.sleep(1 if self.last_error else self.lease_seconds / 12)
+            await run_in_threadpool(self._refresh)
+
+    def _refresh(self):
+        with self._mutex:
+            if self._worker_id is not None and time.monotonic() < self._valid_until:
+                self._renew()
+            if self._worker_id is None or time.monotonic() >= self._valid_until:
+                try:
+                    self._acquire()
+                    self.last_error = None
+                except Exception as e:
+                    print(f"重新申请 worker id 失败: {e}")
+                    self.last_error = str(e)
+
+    async def start(self) -> int:
+        """启动时申请 worker id 并开始后台续约，申请失败时服务无法启动"""
+        worker_id = await run_in_threadpool(self.get)
+        self._background_pid = os.getpid()
+        self._task = asyncio.create_task(self.run())
+        return worker_id
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._background_pid = None
+        await run_in_threadpool(self.release)
+
+    def stats(self) -> dict:
+        return {
+            "worker_id": self._worker_id,
+            "owner": self.owner,
+            "renewals": self.renewals,
+            "last_error": self.last_error,
+        }
+
+
+class _SnowflakeLayout:
+    """ID 的位布局：时间戳(41 位) | worker id(6 位) | 序号，编码为定长的 36 进制字符串
+
+    - 每毫秒最多 2^sequence_bits 个 ID，用完后借用下一毫秒，不阻塞
+    - 时间戳小于上一次时（时钟回拨）继续沿用上一次的时间戳递增，ID 不重复且保持递增
+    - 按字符串排序即按生成时间排序，插入时主键索引基本是顺序追加
+    """
+
+    def __init__(self, prefix: str, length: int, sequence_bits: int):
+        width = length - len(prefix)
+        if TIMESTAMP_BITS + WORKER_BITS + sequence_bits > (36 ** width - 1).bit_length() - 1:
+            raise ValueError(f"{length} 位 ID 放不下 {sequence_bits} 位序号")
+        self.prefix = prefix
+        self.width = width
+        self.sequence_bits = sequence_bits
+        self.max_sequence = (1 << sequence_bits) - 1
+        self.last_ms = -1
+        self.sequence = 0
+        self.clock_backwards = 0
+        self._lock = threading.Lock()
+
+    def _compose(self, now_ms: int, worker_id: int) -> str:
+        """调用方持有 self._lock"""
+        if now_ms > self.last_ms:
+            self.last_ms = now_ms
+            self.sequence = 0
+        else:
+            if now_ms < self.last_ms:
+                self.clock_backwards += 1
+            self.sequence += 1
+            if self.sequence > self.max_sequence:
+                self.last_ms += 1
+                self.sequence = 0
+        value = (((self.last_ms << WORKER_BITS) | worker_id) << self.sequence_bits) | self.sequence
+        return self.prefix + encode_base36(value, self.width)
+
+
+class SnowflakeGenerator(_SnowflakeLayout):
+    """服务使用的 ID 生成器：当前时间 + 本进程的 worker id"""
+
+    def __init__(self, prefix: str, length: int, sequence_bits: int, allocator: WorkerIdAllocator):
+        super().__init__(prefix, length, sequence_bits)
+        self.allocator = allocator
+        self._pid = os.getpid()
+
+    def next_id(self) -> str:
+        worker_id = self.allocator.get()
+        with self._lock:
+            if self._pid != os.getpid():
+                # fork 后的子进程有新的 worker id，时间戳和序号从头开始
+                self._pid = os.getpid()
+                self.last_ms = -1
+            return self._compose(int(time.time() * 1000) - EPOCH_MS, worker_id)
+
+
+class HistoricalIdGenerator(_SnowflakeLayout):
+    """按给定的历史时间生成 ID（合成测试数据）
+
+    使用保留的 worker id MAX_WORKER_ID，状态与服务的生成器相互独立，不会与服务生成的 ID 重复。
+    """
+
+    def next_id(self, timestamp: float) -> str:
+        """timestamp 为秒，需按非递减顺序传入"""
+        with self._lock:
+            return self._compose(int(timestamp * 1000) - EPOCH_MS, MAX_WORKER_ID)
+
+
+worker_ids = WorkerIdAllocator(settings.ID_WORKER_LEASE_SECONDS, settings.ID_WORKER_ID)
+
+# 长度与 users / products / transactions 表的主键列一致
+user_ids = SnowflakeGenerator("", 10, 4, worker_ids)  # 每进程每毫秒 16 个
+product_ids = SnowflakeGenerator("P", 12, 9, worker_ids)  # 每进程每毫秒 512 个
+transaction_ids = SnowflakeGenerator("T", 15, 12, worker_ids)  # 每进程每毫秒 4096 个
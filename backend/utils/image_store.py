@@ -0,0 +1,260 @@
+import asyncio
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set
+from sqlalchemy import select, func, delete, bindparam
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import AsyncSessionLocal
+from database.models import Product, ImageThumbnail
+
+# 文件名为内容的 SHA-256（前 32 位十六进制），同一个文件名的内容永远不变
+CONTENT_HASH_LENGTH = 32
+CONTENT_HASH_NAME = re.compile(rf"^[0-9a-f]{{{CONTENT_HASH_LENGTH}}}\.")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+THUMBNAIL_SUBDIR = "thumbs"
+TEMP_SUFFIX = ".part"
+
+
+def is_content_hashed(name: str) -> bool:
+    return bool(CONTENT_HASH_NAME.match(name))
+
+
+class ImageStore:
+    """按内容哈希寻址的图片存储
+
+    - 图片文件名为内容哈希，按前两位分目录保存：uploads/ab/ab12....jpg，
+      缩略图保存在 uploads/thumbs/ab/ 下；同一张图片只存一份
+    - 引用关系以 products.image_path 为准，回收时按 image_path 统计每个文件的引用数
+    - 后台回收任务删除超过宽限期仍未被任何商品引用的图片及其缩略图
+    - 旧版本平铺在 uploads/ 下的文件仍可访问，未被引用时同样会被回收
+    """
+
+    def __init__(self, root: str, grace_seconds: int, interval_seconds: int):
+        self.root = Path(root)
+        self.thumb_root = self.root / THUMBNAIL_SUBDIR
+        self.grace_seconds = grace_seconds
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.gc_runs = 0
+        self.last_gc_at: Optional[float] = None
+        self.last_gc_ms = 0.0
+        self.last_deleted = 0
+        self.last_reclaimed_bytes = 0
+        self.total_deleted = 0
+        self.total_reclaimed_bytes = 0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------
+    def _shard(self, name: str) -> str:
+        return name[:2]
+
+    def path(self, name: str) -> Path:
+        """图片的保存位置（新文件写入这里）"""
+        if is_content_hashed(name):
+            return self.root / self._shard(name) / name
+        return self.root / name
+
+    def thumb_dir(self, name: str) -> Path:
+        """图片缩略图所在目录"""
+        if is_content_hashed(name):
+            return self.thumb_root / self._shard(name)
+        return self.thumb_root
+
+    def temp_path(self, token: str) -> Path:
+        return self.root / f".{token}{TEMP_SUFFIX}"
+
+    def resolve(self, file_path: str) -> Optional[Path]:
+        """把 URL 中的路径（name 或 thumbs/name）映射到磁盘文件，不存在时返回 None
+
+        内容哈希命名但还在平铺目录下的文件（分目录之前上传的）也能找到。
+        """
+        if file_path.startswith(f"{THUMBNAIL_SUBDIR}/"):
+            name = file_path[len(THUMBNAIL_SUBDIR) + 1:]
+            candidates = [self.thumb_dir(name) / name, self.thumb_root / name]
+        else:
+            name = file_path
+            candidates = [self.path(name), self.root / name]
+        for candidate in candidates:
+            if candidate.is_file():
+                return candidate
+        return None
+
+    def save(self, tmp_path: Path, name: str) -> bool:
+        """把写好的临时文件放到正式位置，返回是否为新文件
+
+        已存在相同内容时删除临时文件，并刷新已有文件的修改时间，使其重新获得完整的回收宽限期。
+        """
+        target = self.path(name)
+        if target.exists():
+            os.remove(tmp_path)
+            os.utime(target)
+            return False
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_path, target)
+        return True
+
+    def touch(self, name: Optional[str]):
+        """商品引用图片时刷新修改时间，避免与正在进行的回收竞争"""
+        if not name:
+            return
+        path = self.resolve(name)
+        if path is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+
+    def iter_images(self) -> Iterator[Path]:
+        """遍历所有原图（分目录和旧的平铺文件）"""
+        if not self.root.exists():
+            return
+        for entry in self.root.iterdir():
+            if entry.is_dir() and entry.name != THUMBNAIL_SUBDIR:
+                for path in entry.iterdir():
+                    if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS:
+                        yield path
+            elif entry.is_file() and entry.suffix.lower() in IMAGE_EXTENSIONS:
+                yield entry
+
+    # ------------------------------------------------------------
+    # 引用与回收
+    # ------------------------------------------------------------
+    async def reference_counts(self) -> Dict[str, int]:
+        """{图片文件名: 引用它的商品数}"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Product.image_path, func.count())
+                .where(Product.image_path.isnot(None))
+                .group_by(Product.image_path)
+            )).all()
+        return {image_path: count for image_path, count in rows}
+
+    def _remove(self, path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            os.remove(path)
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _remove_thumbnails(self, name: str) -> int:
+        reclaimed = 0
+        for directory in {self.thumb_dir(name), self.thumb_root}:
+            if not directory.is_dir():
+                continue
+            for path in directory.glob(f"{name}_*"):
+                reclaimed += self._remove(path)
+            reclaimed += self._remove(directory / f"{name}.json")
+        return reclaimed
+
+    def sweep(self, referenced: Set[str], dry_run: bool = False) -> Dict[str, int]:
+        """删除超过宽限期且未被引用的图片、缩略图和残留的临时文件（同步，放在线程池中执行），removed 为删除的图片名"""
+        cutoff = time.time() - self.grace_seconds
+        deleted = 0
+        reclaimed = 0
+        removed: List[str] = []
+
+        for path in list(self.iter_images()):
+            if path.name in referenced:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if stat.st_mtime > cutoff:
+                continue
+            deleted += 1
+            if dry_run:
+                reclaimed += stat.st_size
+                continue
+            reclaimed += self._remove(path)
+            reclaimed += self._remove_thumbnails(path.name)
+            removed.append(path.name)
+
+        # 上传中断留下的临时文件
+        if self.root.exists():
+            for path in self.root.glob(f".*{TEMP_SUFFIX}"):
+                try:
+                    if path.stat().st_mtime <= cutoff and not dry_run:
+                        reclaimed += self._remove(path)
+                except FileNotFoundError:
+                    pass
+
+        return {"deleted": deleted, "reclaimed_bytes": reclaimed, "removed": removed}
+
+    async def collect(self, dry_run: bool = False) -> Dict[str, int]:
+        """执行一次回收，返回删除的图片数和回收的字节数"""
+        start = time.perf_counter()
+        referenced = set(await self.reference_counts())
+        result = await run_in_threadpool(self.sweep, referenced, dry_run)
+        removed = result.pop("removed")
+        if removed:
+            # 缩略图文件已删除，同时删除缩略图记录
+            async with AsyncSessionLocal() as db:
+                for i in range(0, len(removed), 1000):
+                    await db.execute(
+                        delete(ImageThumbnail).where(ImageThumbnail.image_path.in_(bindparam("names", expanding=True))),
+                        {"names": removed[i:i + 1000]}
+                    )
+                await db.commit()
+        if not dry_run:
+            self.gc_runs += 1
+            self.last_gc_at = time.time()
+            self.last_gc_ms = (time.perf_counter() - start) * 1000
+            self.last_deleted = result["deleted"]
+            self.last_reclaimed_bytes = result["reclaimed_bytes"]
+            self.total_deleted += result["deleted"]
+            self.total_reclaimed_bytes += result["reclaimed_bytes"]
+        return result
+
+    # ------------------------------------------------------------
+    # 后台任务
+    # ------------------------------------------------------------
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                result = await self.collect()
+                self.last_error = None
+                if result["deleted"]:
+                    print(f"图片回收：删除 {result['deleted']} 张未引用的图片，释放 {result['reclaimed_bytes']} 字节")
+            except Exception as e:
+                print(f"图片回收失败: {e}")
+                self.last_error = str(e)
+
+    def start(self):
+        if self.interval_seconds > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "gc_runs": self.gc_runs,
+            "last_gc_at": self.last_gc_at,
+            "last_gc_ms": round(self.last_gc_ms, 2),
+            "last_deleted": self.last_deleted,
+            "last_reclaimed_bytes": self.last_reclaimed_bytes,
+            "total_deleted": self.total_deleted,
+            "total_reclaimed_bytes": self.total_reclaimed_bytes,
+            "last_error": self.last_error,
+        }
+
+
+image_store = ImageStore(
+    settings.UPLOAD_DIR,
+    grace_seconds=settings.IMAGE_GC_GRACE_HOURS * 3600,
+    interval_seconds=settings.IMAGE_GC_INTERVAL_MINUTES * 60,
+)
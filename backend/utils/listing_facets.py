@@ -0,0 +1,185 @@
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import select, update, func, false, text
+from starlette.concurrency import run_in_threadpool
+from config import settings
+from database import engine, IS_MYSQL
+from database.listings import BUCKET_EDGES, check_facet_counts, repair_facet_counts
+from database.models import FacetCount, ProductListing
+
+
+class ListingFacets:
+    """在售商品的分面计数：各分类的商品数和价格分布
+
+    - 计数保存在 facet_counts 表，每个 (分类, 价格分桶) 分成若干行，与 product_listings 在同一事务中增减
+      （database/listings.py），所有 worker 和服务器读到的计数相同，写入提交后立即可见
+    - 价格分布直接读分桶计数；没有价格区间或价格区间与分桶边界对齐时，各分类的商品数由分桶计数相加得到，
+      否则在 product_listings 上按价格区间统计（沿价格索引只读区间内的行）
+    - 后台任务每 reconcile_seconds 按读模型核对一次，修正直接写数据库的脚本或手工 SQL 造成的偏差
+    """
+
+    def __init__(self, bucket_edges: List[int], reconcile_seconds: int):
+        self.bucket_edges = bucket_edges
+        self.reconcile_seconds = reconcile_seconds
+        self._bucket_index = {edge: i for i, edge in enumerate([0] + bucket_edges)}
+        self._task: Optional[asyncio.Task] = None
+        self.served = 0
+        self.range_counts = 0
+        self.reconciles = 0
+        self.last_reconcile_ms = 0.0
+        self.last_drift = 0
+        self.last_error: Optional[str] = None
+
+    def aligned(self, min_price: Optional[int], max_price: Optional[int]) -> bool:
+        """价格区间是否正好由若干个完整的分桶组成"""
+        return (min_price or 0) in self._bucket_index and (max_price is None or max_price + 1 in self._bucket_index)
+
+    async def facets(self, db, category_id: Optional[int] = None, min_price: Optional[int] = None,
+                     max_price: Optional[int] = None, exclude: Iterable[Tuple[int, int]] = ()) -> dict:
+        """按浏览商品的筛选条件统计，价格单位为分
+
+        exclude 为不计入的商品 (分类, 价格)，即当前用户自己的在售商品（浏览商品时不显示）。
+        """
+        low = min_price or 0
+        rows = (await db.execute(
+            select(FacetCount.category_id, FacetCount.bucket_min, FacetCount.listing_count)
+        )).all()
+        buckets = [0] * (len(self.bucket_edges) + 1)
+        categories: Dict[int, int] = {}
+        for cid, bucket, count in rows:
+            i = self._bucket_index.get(bucket)
+            if i is None:
+                continue
+            if not category_id or cid == category_id:
+                buckets[i] += count
+            if bucket >= low and (max_price is None or bucket <= max_price):
+                categories[cid] = categories.get(cid, 0) + count
+
+        if not self.aligned(min_price, max_price):
+            # 价格区间落在分桶中间，按区间重新统计各分类的商品数
+            query = select(ProductListing.category_id, func.count())\
+                .where(ProductListing.price >= low).group_by(ProductListing.category_id)
+            if max_price is not None:
+                query = query.where(ProductListing.price <= max_price)
+            categories = dict((await db.execute(query)).all())
+            self.range_counts += 1
+        self.served += 1
+
+        excluded = count_facets(exclude, self.bucket_edges, category_id, min_price, max_price)
+        for cid, count in excluded["category_counts"].items():
+            categories[cid] = categories.get(cid, 0) - count
+        categories = {cid: max(count, 0) for cid, count in categories.items()}
+        buckets = [max(count - removed, 0) for count, removed in zip(buckets, excluded["bucket_counts"])]
+        return _facets_result(categories, buckets, self.bucket_edges, category_id)
+
+    # ------------------------------------------------------------
+    # 定期核对
+    # ------------------------------------------------------------
+    def reconcile(self) -> Optional[int]:
+        """核对并修正分面计数，返回修正的分桶数；其他进程正在核对时返回 None（同步，在线程池中调用）
+
+        计数和读模型在同一事务中读取，差额累加到计数上，之后提交的正常写入不受影响。
+        同一时刻只有一个进程修正，否则同一差额会被加两次：MySQL 上用 GET_LOCK（拿不到时跳过本次），
+        SQLite 上先执行一条空的 UPDATE 取得写锁，核对期间写入等待（统计在秒级以内）。
+        """
+        start = time.perf_counter()
+        with engine.connect() as connection:
+            if IS_MYSQL:
+                locked = connection.execute(text("SELECT GET_LOCK('facet_counts_reconcile', 0)")).scalar()
+                connection.commit()
+                if not locked:
+                    return None
+            try:
+                with connection.begin():
+                    if not IS_MYSQL:
+                        connection.execute(update(FacetCount).where(false()).values(listing_count=FacetCount.listing_count))
+                    mismatches = check_facet_counts(connection)
+                    repair_facet_counts(connection, mismatches)
+            finally:
+                if IS_MYSQL:
+                    connection.execute(text("SELECT RELEASE_LOCK('facet_counts_reconcile')"))
+                    connection.commit()
+        self.reconciles += 1
+        self.last_reconcile_ms = (time.perf_counter() - start) * 1000
+        self.last_drift = sum(abs(row["expected"] - row["actual"]) for row in mismatches)
+        return len(mismatches)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            try:
+                fixed = await run_in_threadpool(self.reconcile)
+                self.last_error = None
+                if fixed:
+                    print(f"分面计数核对：修正 {fixed} 个分桶，偏差 {self.last_drift} 件")
+            except Exception as e:
+                print(f"分面计数核对失败: {e}")
+                self.last_error = str(e)
+
+    def start(self):
+        if self.reconcile_seconds > 0:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "served": self.served,
+            "range_counts": self.range_counts,
+            "reconciles": self.reconciles,
+            "last_reconcile_ms": round(self.last_reconcile_ms, 2),
+            "last_drift": self.last_drift,
+            "last_error": self.last_error,
+        }
+
+
+def count_facets(pairs: Iterable[Tuple[int, int]], bucket_edges: List[int], category_id: Optional[int] = None,
+                 min_price: Optional[int] = None, max_price: Optional[int] = None) -> dict:
+    """直接统计一组商品的 (分类, 价格)：关键词搜索的命中结果，或需要从计数中扣除的商品"""
+    low = min_price or 0
+    category_counts: Dict[int, int] = {}
+    bucket_counts = [0] * (len(bucket_edges) + 1)
+    for cid, price in pairs:
+        if price >= low and (max_price is None or price <= max_price):
+            category_counts[cid] = category_counts.get(cid, 0) + 1
+        if not category_id or cid == category_id:
+            bucket_counts[bisect_right(bucket_edges, price)] += 1
+    return {"category_counts": category_counts, "bucket_counts": bucket_counts}
+
+
+def facets_from_pairs(pairs: Iterable[Tuple[int, int]], bucket_edges: List[int], category_id: Optional[int] = None,
+                      min_price: Optional[int] = None, max_price: Optional[int] = None) -> dict:
+    counted = count_facets(pairs, bucket_edges, category_id, min_price, max_price)
+    return _facets_result(counted["category_counts"], counted["bucket_counts"], bucket_edges, category_id)
+
+
+def _facets_result(categories: Dict[int, int], buckets: List[int], bucket_edges: List[int],
+                   category_id: Optional[int]) -> dict:
+    if category_id:
+        total = categories.get(category_id, 0)
+    else:
+        total = sum(categories.values())
+    bounds = [0] + bucket_edges
+    return {
+        "total": total,
+        "categories": [
+            {"category_id": cid, "count": count}
+            for cid, count in sorted(categories.items()) if count > 0
+        ],
+        "price_buckets": [
+            {"min_price": low, "max_price": high - 1 if high is not None else None, "count": count}
+            for low, high, count in zip(bounds, bucket_edges + [None], buckets)
+        ],
+    }
+
+
+listing_facets = ListingFacets(BUCKET_EDGES, settings.FACET_RECONCILE_MINUTES * 60)
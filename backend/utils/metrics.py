@@ -0,0 +1,265 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+
+# 直方图的桶（秒 / 条）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# 当前请求的数据库统计 [语句数, 耗时]，由中间件在请求开始时设置
+_request_db: ContextVar[Optional[List[float]]] = ContextVar("request_db", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...], label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        # labels -> [每个桶的计数..., +Inf 计数, 总和]
+        self.values: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, labels: Tuple = ()):
+        data = self.values.get(labels)
+        if data is None:
+            data = self.values[labels] = [0] * (len(self.buckets) + 2)
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+        for labels, data in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, data):
+                cumulative += count
+                bucket_labels = _format_labels(self.label_names, labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative:g}")
+            labels_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{labels_text} {data[-1]:g}")
+            lines.append(f"{self.name}_count{labels_text} {cumulative:g}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内的请求与数据库指标，按 Prometheus 文本格式导出
+
+    - 请求指标由 MetricsMiddleware 记录，按路由模板归类
+    - 数据库指标来自 SQLAlchemy 的 before/after_cursor_execute 事件，同时累加到当前请求上
+    - 连接池指标和 gauge() 登记的指标在导出时读取
+    - 后台任务的指标（如过期订单的处理）由任务自己记录
+    多进程部署时每个 worker 各自统计。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = []
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.requests = Counter("http_requests_total", "HTTP 请求数", ("method", "route", "status"))
+        self.latency = Histogram(
+            "http_request_duration_seconds", "HTTP 请求耗时", LATENCY_BUCKETS, ("method", "route")
+        )
+        self.request_db_statements = Histogram(
+            "http_request_db_statements", "每个请求执行的 SQL 语句数", STATEMENT_BUCKETS, ("method", "route")
+        )
+        self.request_db_seconds = Histogram(
+            "http_request_db_duration_seconds", "每个请求的 SQL 总耗时", LATENCY_BUCKETS, ("method", "route")
+        )
+        self.db_statements = Histogram(
+            "db_statement_duration_seconds", "SQL 语句耗时", LATENCY_BUCKETS, ("engine", "operation")
+        )
+        self.pool_checkouts = Counter("db_pool_checkouts_total", "连接池借出连接次数", ("engine",))
+        self.order_expiry_sweeps = Histogram(
+            "order_expiry_sweep_duration_seconds", "每批过期订单的处理耗时", LATENCY_BUCKETS, ("source",)
+        )
+        self.orders_expired = Counter("order_expiry_expired_total", "超时未支付而取消的订单数", ("source",))
+        self._gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+    # ------------------------------------------------------------
+    # 请求
+    # ------------------------------------------------------------
+    def begin_request(self):
+        self.in_flight += 1
+        stats = [0, 0.0]
+        return _request_db.set(stats), stats
+
+    def end_request(self, token, stats: List[float], method: str, route: str, status: int, seconds: float):
+        _request_db.reset(token)
+        self.in_flight -= 1
+        with self._lock:
+            self.requests.inc((method, route, status))
+            self.latency.observe(seconds, (method, route))
+            self.request_db_statements.observe(stats[0], (method, route))
+            self.request_db_seconds.observe(stats[1], (method, route))
+
+    # ------------------------------------------------------------
+    # 数据库
+    # ------------------------------------------------------------
+    def instrument_engine(self, engine, name: str):
+        """给同步引擎（异步引擎传 async_engine.sync_engine）注册 SQL 计时和连接池事件"""
+        self._engines.append((name, engine))
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._metrics_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - context._metrics_start
+            operation = statement.lstrip()[:6].upper()
+            if operation not in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+                operation = "OTHER"
+            stats = _request_db.get()
+            if stats is not None:
+                stats[0] += 1
+                stats[1] += elapsed
+            with self._lock:
+                self.db_statements.observe(elapsed, (name, operation))
+
+        @event.listens_for(engine, "checkout")
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._lock:
+                self.pool_checkouts.inc((name,))
+
+    # ------------------------------------------------------------
+    # 后台任务
+    # ------------------------------------------------------------
+    def gauge(self, name: str, help_text: str, getter: Callable[[], float]):
+        """登记一个在导出时读取的 gauge"""
+        self._gauges.append((name, help_text, getter))
+
+    def record_order_sweep(self, source: str, seconds: float, expired: int):
+        """source 为 queue（本进程队列中到期的订单）或 rescan（从数据库查到的超时订单）"""
+        with self._lock:
+            self.order_expiry_sweeps.observe(seconds, (source,))
+            self.orders_expired.inc((source,), expired)
+
+    def _gauge_lines(self) -> List[str]:
+        lines = []
+        for name, help_text, getter in self._gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {getter():g}"]
+        return lines
+
+    def _pool_lines(self) -> List[str]:
+        gauges = {
+            "db_pool_size": ("连接池大小", "size"),
+            "db_pool_checked_out": ("已借出的连接数", "checkedout"),
+            "db_pool_checked_in": ("池中空闲的连接数", "checkedin"),
+            "db_pool_overflow": ("超出 pool_size 的连接数", "overflow"),
+        }
+        lines = []
+        for metric, (help_text, method) in gauges.items():
+            values = []
+            for name, engine in self._engines:
+                getter = getattr(engine.pool, method, None)
+                if callable(getter):
+                    values.append(f'{metric}{{engine="{name}"}} {getter():g}')
+            if values:
+                lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"] + values
+        return lines
+
+    # ------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------
+    def render(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP http_requests_in_flight 正在处理的请求数",
+                "# TYPE http_requests_in_flight gauge",
+                f"http_requests_in_flight {self.in_flight}",
+                "# HELP process_start_time_seconds 进程启动时间",
+                "# TYPE process_start_time_seconds gauge",
+                f"process_start_time_seconds {self.started_at:.3f}",
+            ]
+            for metric in (self.requests, self.latency, self.request_db_statements, self.request_db_seconds,
+                           self.db_statements, self.pool_checkouts, self.order_expiry_sweeps, self.orders_expired):
+                lines += metric.render()
+        lines += self._pool_lines()
+        lines += self._gauge_lines()
+        return "\n".join(lines) + "\n"
+
+
+def route_template(scope) -> str:
+    """请求匹配到的路由模板（/api/products/{product_id}），作为指标标签
+
+    路由匹配后 scope["route"] 为匹配到的路由；未匹配的请求（404）统一归为 unmatched，避免标签爆炸。
+    较新的 FastAPI 中 scope["route"] 是 include_router 之前的路由，path 不含前缀，
+    这时用路径参数还原出路由自身对应的那段路径，把实际路径中它前面的部分作为前缀补上（本项目的前缀都是固定字符串）。
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if not isinstance(template, str):
+        return "unmatched"
+    try:
+        own_path = route.path_format.format(**scope.get("path_params", {}))
+    except (AttributeError, KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if own_path and path.endswith(own_path):
+        return path[:len(path) - len(own_path)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """记录每个 HTTP 请求的路由、状态码、耗时和数据库开销（纯 ASGI 中间件，不缓冲响应体）"""
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        start = time.perf_counter()
+        token, stats = self.registry.begin_request()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.end_request(
+                token, stats, scope["method"], route_template(scope), status_code, time.perf_counter() - start
+            )
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,267 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, bindparam, func
+from config import settings
+from database import AsyncSessionLocal
+from database.models import Product, Transaction
+from database.listings import refresh_listings
+from database.changes import record_product_changes
+from search import product_index
+from utils.count_cache import transaction_count_cache
+from utils.metrics import metrics
+
+# 超过支付时限多久仍未支付的订单才由定期查找处理，正常情况下它们已由登记它们的进程处理
+RESCAN_GRACE_SECONDS = 60
+
+class OrderExpiryScheduler:
+    """未支付订单的超时取消调度器
+
+    - 用最小堆保存 (到期时间, 交易ID, 商品ID)，后台任务睡到最早的到期时间再醒来
+    - 到期的订单按批处理：交易状态改为 2（已过期），商品状态恢复为 1（在售）
+    - 支付成功的订单调用 discard 移除；堆中对应的元素在出堆时跳过
+    - 启动时从 transactions 表中的未支付订单重建队列，进程重启不会漏掉订单
+    - 每 rescan_seconds 从 transactions 表查找超过支付时限仍未处理的订单并过期：
+      其他进程登记的订单在该进程异常退出后，不必等到某个进程重启才被处理
+    - 到期时间使用 time.monotonic()，不受系统时间调整影响
+    - 每批的处理耗时和过期订单数记录到 /metrics（utils/metrics.py）
+    """
+
+    def __init__(self, ttl_seconds: int, batch_size: int, rescan_seconds: int = 0, max_sleep: float = 60.0):
+        self.ttl_seconds = ttl_seconds
+        self.batch_size = batch_size
+        self.rescan_seconds = rescan_seconds
+        self.max_sleep = max_sleep
+        self._next_rescan = 0.0
+        self._heap: List[Tuple[float, str, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.expired_total = 0
+        self.rescanned_total = 0
+        self.sweeps = 0
+        self.last_sweep_ms = 0.0
+        self.max_sweep_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    # ------------------------------------------------------------
+    # 队列操作
+    # ------------------------------------------------------------
+    def schedule(self, transaction_id: str, product_id: str, delay: Optional[float] = None):
+        """登记一个未支付订单，delay 为距离过期的秒数（默认整个支付时限）"""
+        if delay is None:
+            delay = self.ttl_seconds
+        deadline = time.monotonic() + max(delay, 0)
+        self._deadlines[transaction_id] = deadline
+        heapq.heappush(self._heap, (deadline, transaction_id, product_id))
+        # 新订单比当前最早的到期时间还早时唤醒后台任务重新计时
+        if self._wakeup is not None and self._heap[0][1] == transaction_id:
+            self._wakeup.set()
+
+    def discard(self, transaction_id: str):
+        """订单已支付，不再需要过期处理"""
+        self._deadlines.pop(transaction_id, None)
+
+    @property
+    def pending(self) -> int:
+        return len(self._deadlines)
+
+    def _pop_due(self) -> List[Tuple[str, str]]:
+        now = time.monotonic()
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            deadline, transaction_id, product_id = heapq.heappop(self._heap)
+            if self._deadlines.get(transaction_id) != deadline:
+                continue  # 已支付或被重新登记
+            del self._deadlines[transaction_id]
+            due.append((transaction_id, product_id))
+        return due
+
+    def _next_delay(self) -> float:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        delay = self.max_sleep
+        if self.rescan_seconds > 0:
+            delay = min(delay, self._next_rescan - time.monotonic())
+        if self._heap:
+            delay = min(delay, self._heap[0][0] - time.monotonic())
+        return max(delay, 0)
+
+    # ------------------------------------------------------------
+    # 数据库操作
+    # ------------------------------------------------------------
+    async def rebuild(self):
+        """从 transactions 表加载所有未支付订单"""
+        async with AsyncSessionLocal() as db:
+            db_now = (await db.execute(select(func.current_timestamp()))).scalar()
+            rows = (await db.execute(
+                select(Transaction.transaction_id, Transaction.product_id, Transaction.created_at)
+                .where(Transaction.status == 0)
+            )).all()
+
+        db_now = _to_datetime(db_now)
+        self._heap = []
+        self._deadlines = {}
+        for row in rows:
+            age = (db_now - _to_datetime(row.created_at)).total_seconds() if row.created_at else 0
+            self.schedule(row.transaction_id, row.product_id, self.ttl_seconds - age)
+        return len(rows)
+
+    async def find_overdue(self) -> List[Tuple[str, str]]:
+        """transactions 表中超过支付时限 RESCAN_GRACE_SECONDS 仍未支付的订单（最多 batch_size 个）"""
+        async with AsyncSessionLocal() as db:
+            db_now = _to_datetime((await db.execute(select(func.current_timestamp()))).scalar())
+            cutoff = db_now - timedelta(seconds=self.ttl_seconds + RESCAN_GRACE_SECONDS)
+            rows = (await db.execute(
+                select(Transaction.transaction_id, Transaction.product_id)
+                .where(Transaction.status == 0, Transaction.created_at < cutoff)
+                .limit(self.batch_size)
+            )).all()
+        return [(row.transaction_id, row.product_id) for row in rows]
+
+    async def rescan(self) -> int:
+        """处理 find_overdue 找到的订单，直到没有遗漏，返回过期的订单数"""
+        expired = 0
+        while True:
+            due = await self.find_overdue()
+            count = await self._sweep(due, "rescan") if due else 0
+            for transaction_id, _ in due:
+                self.discard(transaction_id)
+            expired += count
+            if len(due) < self.batch_size or not count:
+                return expired
+
+    async def _sweep(self, due: List[Tuple[str, str]], source: str) -> int:
+        start = time.perf_counter()
+        expired = 0
+        try:
+            expired = await self.expire(due)
+            return expired
+        finally:
+            self.sweeps += 1
+            self.last_sweep_ms = (time.perf_counter() - start) * 1000
+            self.max_sweep_ms = max(self.max_sweep_ms, self.last_sweep_ms)
+            metrics.record_order_sweep(source, self.last_sweep_ms / 1000, expired)
+
+    async def expire(self, due: List[Tuple[str, str]]) -> int:
+        """把一批到期订单标记为已过期，并释放对应商品"""
+        transaction_ids = [transaction_id for transaction_id, _ in due]
+        async with AsyncSessionLocal() as db:
+            # 锁住仍未支付的订单，与并发的支付请求互斥
+            rows = (await db.execute(
+                select(Transaction.transaction_id, Transaction.product_id, Transaction.buyer_id, Transaction.seller_id)
+                .where(Transaction.transaction_id.in_(bindparam("ids", expanding=True)), Transaction.status == 0)
+                .with_for_update(),
+                {"ids": transaction_ids}
+            )).all()
+            if not rows:
+                await db.rollback()
+                return 0
+
+            expired_ids = [row.transaction_id for row in rows]
+            product_ids = [row.product_id for row in rows]
+            await db.execute(
+                update(Transaction)
+                .where(Transaction.transaction_id.in_(bindparam("ids", expanding=True)), Transaction.status == 0)
+                .values(status=2)
+                .execution_options(synchronize_session=False),
+                {"ids": expired_ids}
+            )
+            await db.execute(
+                update(Product)
+                .where(Product.product_id.in_(bindparam("ids", expanding=True)), Product.status == 0)
+                .values(status=1)
+                .execution_options(synchronize_session=False),
+                {"ids": product_ids}
+            )
+            # 释放的商品重新上架
+            await refresh_listings(db, product_ids)
+            await record_product_changes(db, product_ids)
+            await db.commit()
+
+        for row in rows:
+            # 订单状态变化后买卖双方的交易总数缓存失效
+            transaction_count_cache.invalidate(row.buyer_id, row.seller_id)
+        for product_id in product_ids:
+            product_index.set_status(product_id, 1)
+        return len(expired_ids)
+
+    # ------------------------------------------------------------
+    # 后台任务
+    # ------------------------------------------------------------
+    async def run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            due = self._pop_due()
+            while due:
+                try:
+                    self.expired_total += await self._sweep(due, "queue")
+                    self.last_error = None
+                except Exception as e:
+                    # 数据库暂时不可用时稍后重试这一批
+                    print(f"处理过期订单失败: {e}")
+                    self.last_error = str(e)
+                    for transaction_id, product_id in due:
+                        self.schedule(transaction_id, product_id, delay=5)
+                    break
+                due = self._pop_due()
+
+            if self.rescan_seconds > 0 and time.monotonic() >= self._next_rescan:
+                self._next_rescan = time.monotonic() + self.rescan_seconds
+                try:
+                    count = await self.rescan()
+                    self.expired_total += count
+                    self.rescanned_total += count
+                    if count:
+                        print(f"过期订单：从数据库中找到并取消 {count} 个超时未处理的订单")
+                except Exception as e:
+                    print(f"查找超时订单失败: {e}")
+                    self.last_error = str(e)
+
+    async def start(self):
+        count = await self.rebuild()
+        # 启动时已加载全部未支付订单，第一次查找在一个间隔之后
+        self._next_rescan = time.monotonic() + self.rescan_seconds
+        self._task = asyncio.create_task(self.run())
+        return count
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.pending,
+            "expired_total": self.expired_total,
+            "rescanned_total": self.rescanned_total,
+            "sweeps": self.sweeps,
+            "last_sweep_ms": round(self.last_sweep_ms, 2),
+            "max_sweep_ms": round(self.max_sweep_ms, 2),
+            "last_error": self.last_error,
+        }
+
+
+def _to_datetime(value) -> datetime:
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+
+order_expiry = OrderExpiryScheduler(
+    ttl_seconds=settings.ORDER_PAYMENT_TIMEOUT_MINUTES * 60,
+    batch_size=settings.ORDER_EXPIRY_BATCH_SIZE,
+    rescan_seconds=settings.ORDER_EXPIRY_RESCAN_MINUTES * 60,
+)
@@ -0,0 +1,31 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+def encode_cursor(kind: str, *values: Any) -> str:
+    """把最后一行的排序键编码为不透明的游标字符串
+
+    kind 用来区分排序方式，避免把 newest 的游标拿去翻 price_asc 的页。
+    """
+    payload = [kind] + [v.isoformat(sep=" ") if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(token: str, kind: str, size: int) -> List[Any]:
+    """解析游标，返回排序键列表；格式不对时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("无效的分页游标")
+
+    if not isinstance(payload, list) or len(payload) != size + 1 or payload[0] != kind:
+        raise ValueError("分页游标与当前排序方式不匹配")
+    return payload[1:]
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    """游标中的时间以字符串保存，取出时转换回 datetime"""
+    if not isinstance(value, str):
+        raise ValueError("无效的分页游标")
+    return datetime.fromisoformat(value)
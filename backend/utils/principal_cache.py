@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+from config import settings
+from schemas.user import UserPrincipal
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 版本号在标记文件中的宽度（定长写入，读取时不会读到写了一半的内容）
+VERSION_WIDTH = 20
+
+class PrincipalCache:
+    """token -> 已认证用户的 LRU 缓存，带过期时间
+
+    - 每个进程一份，容量满时淘汰最久未使用的 token
+    - 缓存有效期取 AUTH_CACHE_TTL 与 token 剩余有效期中较小的一个
+    - 每个用户有一个单调递增的版本号：查库前先读取版本号（version），与查到的用户一起缓存；
+      用户资料变化时调用 invalidate_user，版本号加一并清掉本进程的缓存
+    - 配置了共享目录时，版本号保存在该用户的标记文件中（加锁递增），多个 worker 共享；
+      命中缓存时最多每 check_interval 秒读一次标记文件，版本号变化就当作未命中，重新查库
+    """
+
+    def __init__(self, max_size: int, ttl: int, shared_dir: Optional[str] = None, check_interval: float = 1.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_dir = shared_dir or None
+        self.check_interval = check_interval
+        # token -> [用户, 过期时间, 版本号, 上次检查标记文件的时间]
+        self._entries: "OrderedDict[str, list]" = OrderedDict()
+        self._tokens_by_user: Dict[str, Set[str]] = {}
+        self._versions: Dict[str, int] = {}  # 本进程已知的各用户最新版本号
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.marker_reads = 0
+
+    def start(self):
+        """启动时创建共享目录"""
+        if self.shared_dir:
+            os.makedirs(self.shared_dir, exist_ok=True)
+
+    def get(self, token: str) -> Optional[UserPrincipal]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            principal, expires_at, version, checked_at = entry
+            if expires_at <= time.time() or version < self._versions.get(principal.user_id, 0):
+                self._pop(token)
+                self.misses += 1
+                return None
+            now = time.monotonic()
+            check = self.shared_dir is not None and now - checked_at >= self.check_interval
+            if not check:
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return principal
+
+        current = self.version(principal.user_id)
+        with self._lock:
+            if current != version:
+                self._pop(token)
+                self.misses += 1
+                return None
+            if token in self._entries:
+                self._entries[token][3] = now
+                self._entries.move_to_end(token)
+            self.hits += 1
+        return principal
+
+    def put(self, token: str, principal: UserPrincipal, token_expires_at: Optional[float] = None, version: int = 0):
+        """version 为查库之前调用 version() 得到的版本号"""
+        now = time.time()
+        expires_at = now + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            if version < self._versions.get(principal.user_id, 0):
+                # 查库期间用户资料又被修改，查到的可能是旧数据，不缓存
+                return
+            self._pop(token)
+            self._entries[token] = [principal, expires_at, version, time.monotonic()]
+            self._tokens_by_user.setdefault(principal.user_id, set()).add(token)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+
+    def version(self, user_id: str) -> int:
+        """用户当前的版本号"""
+        if not self.shared_dir:
+            with self._lock:
+                return self._versions.get(user_id, 0)
+        try:
+            with open(os.path.join(self.shared_dir, user_id), "rb") as f:
+                data = f.read(VERSION_WIDTH)
+        except FileNotFoundError:
+            data = b""
+        version = int(data) if data.strip() else 0
+        with self._lock:
+            self.marker_reads += 1
+            if version > self._versions.get(user_id, 0):
+                self._versions[user_id] = version
+        return version
+
+    def invalidate_user(self, user_id: str):
+        """用户信息变更后调用，使该用户所有 token 的缓存失效"""
+        version = self._bump_marker(user_id) if self.shared_dir else None
+        with self._lock:
+            if version is None:
+                version = self._versions.get(user_id, 0) + 1
+            self._versions[user_id] = max(version, self._versions.get(user_id, 0))
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._pop(token)
+            self.invalidations += 1
+
+    def _bump_marker(self, user_id: str) -> int:
+        """标记文件中的版本号加一（加排他锁，多个进程同时修改时不会丢失）"""
+        fd = os.open(os.path.join(self.shared_dir, user_id), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, VERSION_WIDTH)
+            data = os.read(fd, VERSION_WIDTH)
+            version = (int(data) if data.strip() else 0) + 1
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, str(version).zfill(VERSION_WIDTH).encode())
+            return version
+        finally:
+            os.close(fd)  # 关闭文件即释放锁
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "marker_reads": self.marker_reads,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
+
+    def _pop(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        user_id = entry[0].user_id
+        tokens = self._tokens_by_user.get(user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[user_id]
+
+principal_cache = PrincipalCache(
+    max_size=settings.AUTH_CACHE_SIZE,
+    ttl=settings.AUTH_CACHE_TTL,
+    shared_dir=settings.AUTH_CACHE_SHARED_DIR,
+    check_interval=settings.AUTH_CACHE_CHECK_SECONDS,
+)
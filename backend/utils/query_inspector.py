@@ -0,0 +1,235 @@
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
+from sqlalchemy import event
+from config import settings
+from utils.metrics import route_template
+
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE")
+STATEMENT_PREVIEW = 300  # 日志中 SQL 的最大长度
+
+
+class QueryBudgetExceeded(Exception):
+    """请求执行的 SQL 条数超过路由声明的预算（QUERY_BUDGET_MODE=raise 时抛出）"""
+
+
+def query_budget(limit: int):
+    """声明路由每个请求最多执行的 SQL 条数（包括依赖项中的查询）
+
+    用法（放在 @router.get 等装饰器下面）：
+        @router.get("/{product_id}")
+        @query_budget(1)
+        async def get_product_detail(...):
+    """
+    def decorator(func):
+        func.__query_budget__ = limit
+        return func
+    return decorator
+
+
+@lru_cache(maxsize=2048)
+def statement_shape(statement: str) -> str:
+    """把 SQL 归一成"形状"：去掉字面量、占位符风格和 IN 列表长度的差异"""
+    shape = re.sub(r"\s+", " ", statement).strip()
+    shape = re.sub(r"'(?:[^']|'')*'", "?", shape)
+    shape = re.sub(r"%\(\w+\)s|%s|:\w+|\?", "?", shape)
+    shape = re.sub(r"\b\d+(?:\.\d+)?\b", "?", shape)
+    shape = re.sub(r"\(\s*\?(?:\s*,\s*\?)+\s*\)", "(?)", shape)
+    return shape
+
+
+def explain_rows(conn, statement: str, parameters) -> List[dict]:
+    """在同一连接上执行 EXPLAIN（SQLite 为 EXPLAIN QUERY PLAN），每行计划返回一个字典
+
+    直接用 DBAPI 游标，不触发事件也不影响当前事务；不是 SELECT/UPDATE/DELETE 的语句返回空列表。
+    """
+    if statement.lstrip()[:6].upper() not in EXPLAINABLE:
+        return []
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        columns = [c[0] for c in cursor.description or ()]
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def _preview(statement: str) -> str:
+    statement = re.sub(r"\s+", " ", statement).strip()
+    if len(statement) > STATEMENT_PREVIEW:
+        return statement[:STATEMENT_PREVIEW] + "..."
+    return statement
+
+
+class RequestQueries:
+    """单个请求内执行过的 SQL"""
+
+    __slots__ = ("scope", "count", "shapes", "budget_warned")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.count = 0
+        self.shapes: Dict[str, int] = {}
+        self.budget_warned = False
+
+    @property
+    def budget(self) -> Optional[int]:
+        return getattr(self.scope.get("endpoint"), "__query_budget__", None)
+
+
+_current: ContextVar[Optional[RequestQueries]] = ContextVar("request_queries", default=None)
+
+
+class QueryInspector:
+    """SQL 诊断：慢查询日志、N+1 检测和按路由的查询预算
+
+    - 慢查询：执行时间超过 slow_ms 的语句连同参数和执行计划（EXPLAIN）一起打印，生产环境也可开启
+    - N+1：同一请求内同一形状的语句执行次数达到 n_plus_one_threshold 时，请求结束后打印告警
+    - 查询预算：路由用 @query_budget(n) 声明上限，超出时按 budget_mode 告警（warn）或
+      直接抛出 QueryBudgetExceeded（raise，用于开发和测试，让超预算的请求返回 500）
+    """
+
+    def __init__(self, slow_ms: int = 0, explain: bool = True, n_plus_one_threshold: int = 0,
+                 budget_mode: str = "off"):
+        if budget_mode not in ("off", "warn", "raise"):
+            raise ValueError("QUERY_BUDGET_MODE 只能是 off / warn / raise")
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.budget_mode = budget_mode
+        self._lock = threading.Lock()
+        self.slow_queries = 0
+        self.n_plus_one = 0
+        self.budget_exceeded = 0
+        self.recent_slow = deque(maxlen=20)
+        self.max_statements: Dict[str, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.slow_ms > 0 or self.tracks_requests
+
+    @property
+    def tracks_requests(self) -> bool:
+        return self.n_plus_one_threshold > 0 or self.budget_mode != "off"
+
+    # ------------------------------------------------------------
+    # 请求
+    # ------------------------------------------------------------
+    def begin_request(self, scope):
+        return _current.set(RequestQueries(scope))
+
+    def end_request(self, token):
+        queries = _current.get()
+        _current.reset(token)
+        if queries is None or not queries.count:
+            return
+        route = route_template(queries.scope)
+        key = f"{queries.scope['method']} {route}"
+        with self._lock:
+            if queries.count > self.max_statements.get(key, 0):
+                self.max_statements[key] = queries.count
+        if self.n_plus_one_threshold > 0:
+            for shape, count in queries.shapes.items():
+                if count >= self.n_plus_one_threshold:
+                    self.n_plus_one += 1
+                    print(f"可能的 N+1 查询：{queries.scope['method']} {route} 中同一语句执行了 {count} 次: {_preview(shape)}")
+
+    # ------------------------------------------------------------
+    # 数据库事件
+    # ------------------------------------------------------------
+    def instrument_engine(self, engine):
+        """给同步引擎（异步引擎传 async_engine.sync_engine）注册诊断事件"""
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            context._inspector_start = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed_ms = (time.perf_counter() - context._inspector_start) * 1000
+            queries = _current.get()
+            if self.slow_ms > 0 and elapsed_ms >= self.slow_ms:
+                self._log_slow(conn, statement, parameters, executemany, elapsed_ms, queries)
+            if queries is not None and self.tracks_requests:
+                self._track(queries, statement)
+
+    def _track(self, queries: RequestQueries, statement: str):
+        queries.count += 1
+        if self.n_plus_one_threshold > 0:
+            shape = statement_shape(statement)
+            queries.shapes[shape] = queries.shapes.get(shape, 0) + 1
+
+        budget = queries.budget if self.budget_mode != "off" else None
+        if budget is None or queries.count <= budget or queries.budget_warned:
+            return
+        queries.budget_warned = True
+        self.budget_exceeded += 1
+        route = route_template(queries.scope)
+        message = f"{queries.scope['method']} {route} 超出查询预算：第 {queries.count} 条 SQL，预算 {budget} 条: {_preview(statement)}"
+        if self.budget_mode == "raise":
+            raise QueryBudgetExceeded(message)
+        print(f"查询预算告警：{message}")
+
+    def _log_slow(self, conn, statement, parameters, executemany, elapsed_ms, queries):
+        route = route_template(queries.scope) if queries is not None else "-"
+        plan = self._explain(conn, statement, parameters) if self.explain and not executemany else []
+        self.slow_queries += 1
+        self.recent_slow.append({
+            "at": time.time(),
+            "route": route,
+            "ms": round(elapsed_ms, 2),
+            "statement": _preview(statement),
+        })
+        print(f"慢查询 {elapsed_ms:.1f}ms [{route}]: {_preview(statement)} 参数: {parameters!r:.200}")
+        for line in plan:
+            print(f"    {line}")
+
+    def _explain(self, conn, statement: str, parameters) -> List[str]:
+        try:
+            plan = explain_rows(conn, statement, parameters)
+        except Exception as e:
+            return [f"EXPLAIN 失败: {e}"]
+        return [" | ".join(f"{name}={value}" for name, value in row.items()) for row in plan]
+
+    def stats(self) -> dict:
+        return {
+            "slow_ms": self.slow_ms,
+            "slow_queries": self.slow_queries,
+            "n_plus_one": self.n_plus_one,
+            "budget_mode": self.budget_mode,
+            "budget_exceeded": self.budget_exceeded,
+            "recent_slow": list(self.recent_slow),
+            "max_statements": dict(self.max_statements),
+        }
+
+
+class QueryInspectorMiddleware:
+    """为每个请求建立 SQL 记录上下文（纯 ASGI 中间件）"""
+
+    def __init__(self, app, inspector: QueryInspector):
+        self.app = app
+        self.inspector = inspector
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = self.inspector.begin_request(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.inspector.end_request(token)
+
+
+query_inspector = QueryInspector(
+    slow_ms=settings.SLOW_QUERY_MS,
+    explain=settings.SLOW_QUERY_EXPLAIN,
+    n_plus_one_threshold=settings.N_PLUS_ONE_THRESHOLD,
+    budget_mode=settings.QUERY_BUDGET_MODE,
+)
@@ -1,16 +1,20 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
 from database.models import User
-from schemas.user import TokenData
+from schemas.user import TokenData, UserPrincipal
+from utils.principal_cache import principal_cache
 from config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -21,6 +25,45 @@ def get_password_hash(password: str) -> str:
     """生成密码哈希"""
     return pwd_context.hash(password)
 
+class PasswordHasher:
+    """在专用线程池中执行 bcrypt，避免单次 100~300ms 的计算阻塞事件循环
+
+    bcrypt 计算时会释放 GIL，线程池即可并行。排队和执行中的任务数超过
+    queue_limit 时直接返回 503，登录高峰不会把请求无限堆积在队列里。
+    """
+
+    def __init__(self, workers: int, queue_limit: int):
+        self.queue_limit = queue_limit
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def _run(self, func, *args):
+        if self.pending >= self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="服务繁忙，请稍后再试",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """验证密码；哈希的代价因子与当前配置不一致时同时返回新的哈希"""
+        return await self._run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """创建访问令牌"""
     to_encode = data.copy()
@@ -33,8 +76,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """获取当前用户"""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> UserPrincipal:
+    """获取当前用户
+
+    命中缓存时既不解析 JWT 也不查库；未命中时解析 token、查询用户并写入缓存。
+    """
+    if settings.AUTH_CACHE_ENABLED:
+        principal = principal_cache.get(token)
+        if principal is not None:
+            return principal
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -50,8 +101,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.user_id == token_data.user_id).first()
+    # 先取版本号再查库：查库期间用户资料被修改时，这次查到的结果不会留在缓存中
+    version = principal_cache.version(token_data.user_id) if settings.AUTH_CACHE_ENABLED else 0
+    user = (await db.execute(select(User).where(User.user_id == token_data.user_id))).scalars().first()
     if user is None:
         raise credentials_exception
     
-    return user
\ No newline at end of file
+    principal = UserPrincipal.model_validate(user)
+    if settings.AUTH_CACHE_ENABLED:
+        principal_cache.put(token, principal, payload.get("exp"), version)
+    return principal
+
+async def get_admin_user(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
+    """要求当前用户是管理员（config.ADMIN_USER_IDS）"""
+    admin_ids = {user_id.strip() for user_id in settings.ADMIN_USER_IDS.split(",") if user_id.strip()}
+    if current_user.user_id not in admin_ids:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="需要管理员权限"
+        )
+    return current_user
@@ -0,0 +1,104 @@
+import mimetypes
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+from typing import Optional, Tuple
+import anyio
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 旧的非内容哈希文件名可能被覆盖，每次都要用 ETag 重新验证
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单个 Range（bytes=start-end / bytes=-suffix），返回闭区间 (start, end)
+
+    多段 Range 不支持，返回 None 表示按整个文件响应；范围无法满足时抛出 ValueError。
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("无法满足的范围")
+        return max(size - suffix, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("无法满足的范围")
+    return start, end
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in header.split(","))
+
+async def _read_file(path: Path, start: int, length: int):
+    async with await anyio.open_file(path, "rb") as f:
+        await f.seek(start)
+        while length > 0:
+            chunk = await f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def file_response(request: Request, path: Path, etag: str, cache_control: str,
+                  accel_redirect: Optional[str] = None) -> Response:
+    """返回文件，支持 If-None-Match（304）、Range / If-Range（206）和 HEAD
+
+    path 必须是已经校验过的文件路径，etag 需带双引号。
+    accel_redirect 不为空时只返回响应头，由前面的 nginx 通过 X-Accel-Redirect 用 sendfile 发送文件内容。
+    """
+    stat = os.stat(path)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if accel_redirect:
+        headers["X-Accel-Redirect"] = accel_redirect
+        return Response(media_type=media_type, headers=headers)
+
+    size = stat.st_size
+    start, end = 0, size - 1
+    status_code = 200
+    range_header = request.headers.get("range")
+    # If-Range 与当前 ETag 不一致时说明文件变了，返回完整文件
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["Content-Range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    length = end - start + 1 if size else 0
+    headers["Content-Length"] = str(length)
+    if request.method == "HEAD":
+        return Response(status_code=status_code, media_type=media_type, headers=headers)
+    return StreamingResponse(
+        _read_file(path, start, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers
+    )
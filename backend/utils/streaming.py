@@ -0,0 +1,119 @@
+import codecs
+from typing import AsyncIterable, AsyncIterator, Dict, List
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+async def iter_lines(chunks: AsyncIterable[bytes], encoding: str = "utf-8") -> AsyncIterator[str]:
+    """把异步字节流按行切分（保留换行符），内存中只保留未完成的一行"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="strict")
+    buffer = ""
+    first = True
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        if first and text:
+            text = text.lstrip("\ufeff")  # 去掉 Excel 导出 CSV 常带的 BOM
+            first = False
+        buffer += text
+        lines = buffer.splitlines(keepends=True)
+        # 最后一段没有换行符时可能还不完整，留到下一个分块
+        buffer = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+async def iter_csv_records(lines: AsyncIterable[str]) -> AsyncIterator[str]:
+    """把行合并成完整的 CSV 记录：引号内的换行属于同一条记录"""
+    record = ""
+    async for line in lines:
+        record += line
+        if record.count('"') % 2 == 0:
+            yield record
+            record = ""
+    if record:
+        yield record
+
+
+class _FilePartCollector:
+    """MultipartParser 的回调：只收集指定表单字段的数据"""
+
+    def __init__(self, field_name: str):
+        self.field_name = field_name.encode("utf-8")
+        self.headers: Dict[bytes, bytes] = {}
+        self.header_field = b""
+        self.header_value = b""
+        self.in_file = False
+        self.found = False
+        self.done = False
+        self.data: List[bytes] = []
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+
+    def on_part_begin(self):
+        self.headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        if not self.found and options.get(b"name") == self.field_name and b"filename" in options:
+            self.in_file = True
+            self.found = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.in_file:
+            self.data.append(data[start:end])
+
+    def on_part_end(self):
+        if self.in_file:
+            self.in_file = False
+            self.done = True
+
+
+async def iter_form_file(content_type: str, chunks: AsyncIterable[bytes], field_name: str) -> AsyncIterator[bytes]:
+    """从 multipart/form-data 请求体中流式取出一个文件字段的内容
+
+    与 UploadFile 不同，文件不会先整体缓存到内存或临时文件，调用方可以边收边检查大小。
+    请求格式错误或找不到该字段时抛出 ValueError。
+    """
+    media_type, params = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or not params.get(b"boundary"):
+        raise ValueError("请求格式必须是 multipart/form-data")
+
+    collector = _FilePartCollector(field_name)
+    parser = MultipartParser(params[b"boundary"], collector.callbacks())
+    async for chunk in chunks:
+        parser.write(chunk)
+        if collector.data:
+            data = b"".join(collector.data)
+            collector.data.clear()
+            yield data
+        if collector.done:
+            return
+    parser.finalize()
+    if not collector.found:
+        raise ValueError(f"缺少上传文件字段 {field_name}")
+    if not collector.done:
+        raise ValueError("上传的文件不完整")
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from sqlalchemy import select, bindparam
+from config import settings
+from database import AsyncSessionLocal
+from database.models import ImageThumbnail
+from utils.image_store import ImageStore, image_store, THUMBNAIL_SUBDIR
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # 未安装 Pillow 时不生成缩略图，商品仍然使用原图
+    Image = None
+
+# 缩略图格式：WebP 体积最小，JPEG 兼容不支持 WebP 的浏览器
+THUMBNAIL_FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+# 没有缩略图的图片多久后重新查询一次（其他 worker 可能刚生成完）
+MISSING_RECHECK_SECONDS = 30
+# 后台每次查询的图片数
+LOAD_BATCH = 500
+
+def parse_sizes(value: str) -> List[int]:
+    return sorted({int(size) for size in value.split(",") if size.strip()})
+
+def manifest_path(thumb_dir: Path, image_name: str) -> Path:
+    return thumb_dir / f"{image_name}.json"
+
+def render_thumbnails(source_path: str, thumb_dir: str, sizes: List[int]) -> Dict[str, Dict[str, str]]:
+    """生成一张图片的全部缩略图（在子进程中执行）
+
+    先按 EXIF 方向旋转，再丢掉 EXIF 等元数据（拍摄地点、设备信息不会随缩略图泄露）。
+    每个文件先写临时文件再重命名，最后写入清单文件，清单存在即表示全部缩略图已生成。
+    返回 {尺寸: {格式: 相对 uploads 目录的路径}}。
+    """
+    source = Path(source_path)
+    thumb_dir = Path(thumb_dir)
+    thumb_dir.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(source) as original:
+        original.seek(0)  # GIF 只取第一帧
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    image.info = {}
+
+    variants: Dict[str, Dict[str, str]] = {}
+    for size in sizes:
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for ext, options in THUMBNAIL_FORMATS.items():
+            output = resized
+            if ext == "jpg" and has_alpha:
+                # JPEG 不支持透明通道，铺白色背景
+                output = Image.new("RGB", resized.size, (255, 255, 255))
+                output.paste(resized, mask=resized.getchannel("A"))
+            name = f"{source.name}_{size}.{ext}"
+            tmp_path = thumb_dir / f".{name}.tmp"
+            output.save(tmp_path, **options)
+            os.replace(tmp_path, thumb_dir / name)
+            variants.setdefault(str(size), {})[ext] = f"{THUMBNAIL_SUBDIR}/{name}"
+
+    manifest = {"source": source.name, "variants": variants}
+    target = manifest_path(thumb_dir, source.name)
+    tmp_path = target.with_name(f".{target.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, target)
+    return variants
+
+
+class ThumbnailPipeline:
+    """商品图片缩略图流水线
+
+    - 上传完成后调用 submit，缩略图在进程池中生成，不占用事件循环和 Web 进程的 GIL；
+      生成完写入 image_thumbnails 表，多个 worker 和回填脚本生成的缩略图都能查到
+    - variants 在序列化商品时调用，只查进程内的 LRU 缓存，不读文件也不查数据库：
+      缓存中没有的图片先返回 None，同时排队由后台任务批量查表后放入缓存，之后的请求即可返回缩略图
+    - 启动时预加载最近生成的 cache_size 条记录；查不到的图片同样缓存，MISSING_RECHECK_SECONDS 秒后再查
+    - 原图和缩略图的位置由 ImageStore 决定
+    """
+
+    def __init__(self, store: ImageStore, sizes: List[int], workers: int, cache_size: int, enabled: bool = True):
+        self.store = store
+        self.sizes = sizes
+        self.workers = workers
+        self.cache_size = cache_size
+        self.enabled = enabled and Image is not None and bool(sizes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks = set()
+        # 图片 -> (缩略图 URL，查不到时为 None；放入缓存的时间)
+        self._cache: "OrderedDict[str, Tuple[Optional[Dict[str, Dict[str, str]]], float]]" = OrderedDict()
+        self._queued: Set[str] = set()
+        self._lock = threading.Lock()  # 同步接口的响应在线程池中序列化，缓存可能被多个线程访问
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loader: Optional[asyncio.Task] = None
+        self.generated = 0
+        self.failed = 0
+        self.cache_misses = 0
+        self.loaded = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def submit(self, image_name: str):
+        """在后台为刚上传的图片生成缩略图（需在事件循环中调用），已有缩略图的图片不会重新生成"""
+        if not self.enabled:
+            return
+        task = asyncio.create_task(self.generate(image_name))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def generate(self, image_name: str) -> Optional[Dict[str, Dict[str, str]]]:
+        loop = asyncio.get_running_loop()
+        try:
+            # 重复上传的图片已经有缩略图
+            recorded = await self._fetch([image_name])
+            if image_name in recorded:
+                self._remember(image_name, recorded[image_name])
+                return recorded[image_name]
+            variants = await loop.run_in_executor(
+                self._get_executor(), render_thumbnails,
+                str(self.store.resolve(image_name) or self.store.path(image_name)),
+                str(self.store.thumb_dir(image_name)), self.sizes
+            )
+            async with AsyncSessionLocal() as db:
+                await db.merge(ImageThumbnail(image_path=image_name, variants=json.dumps(variants)))
+                await db.commit()
+        except Exception as e:
+            self.failed += 1
+            print(f"生成缩略图失败 {image_name}: {e}")
+            return None
+        self.generated += 1
+        self._remember(image_name, variants)
+        return variants
+
+    def variants(self, image_path: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+        """返回 {尺寸: {格式: URL}}，缩略图尚未生成或还不在缓存中时返回 None"""
+        if not image_path or not self.enabled:
+            return None
+        with self._lock:
+            entry = self._cache.get(image_path)
+            if entry is not None:
+                self._cache.move_to_end(image_path)
+                urls, cached_at = entry
+                if urls is not None or time.monotonic() - cached_at < MISSING_RECHECK_SECONDS:
+                    return urls
+            self.cache_misses += 1
+            if image_path in self._queued or self._loop is None:
+                return None
+            self._queued.add(image_path)
+        self._loop.call_soon_threadsafe(self._start_loader)
+        return None
+
+    # ------------------------------------------------------------
+    # 缓存
+    # ------------------------------------------------------------
+    def _remember(self, image_name: str, variants: Optional[Dict[str, Dict[str, str]]]):
+        urls = None
+        if variants is not None:
+            urls = {
+                size: {ext: f"/api/uploads/{path}" for ext, path in formats.items()}
+                for size, formats in variants.items()
+            }
+        with self._lock:
+            self._cache[image_name] = (urls, time.monotonic())
+            self._cache.move_to_end(image_name)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    async def _fetch(self, image_names: List[str]) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """从 image_thumbnails 表读取一批图片的缩略图"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(ImageThumbnail.image_path, ImageThumbnail.variants)
+                .where(ImageThumbnail.image_path.in_(bindparam("names", expanding=True))),
+                {"names": image_names}
+            )).all()
+        return {row.image_path: json.loads(row.variants) for row in rows}
+
+    def _start_loader(self):
+        if self._loader is None or self._loader.done():
+            self._loader = asyncio.create_task(self._load_queued())
+
+    async def _load_queued(self):
+        """批量查询排队的图片，直到队列为空"""
+        while True:
+            with self._lock:
+                names = list(islice(self._queued, LOAD_BATCH))
+            if not names:
+                return
+            try:
+                found = await self._fetch(names)
+            except Exception as e:
+                print(f"读取缩略图记录失败: {e}")
+                found = {}
+            for name in names:
+                self._remember(name, found.get(name))
+                self.loaded += name in found
+            with self._lock:
+                self._queued.difference_update(names)
+
+    # ------------------------------------------------------------
+    # 启动与关闭
+    # ------------------------------------------------------------
+    async def start(self) -> int:
+        """预加载最近生成的缩略图，返回加载的条数"""
+        self._loop = asyncio.get_running_loop()
+        if not self.enabled:
+            return 0
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(ImageThumbnail.image_path, ImageThumbnail.variants)
+                .order_by(ImageThumbnail.created_at.desc())
+                .limit(self.cache_size)
+            )).all()
+        # 从旧到新放入，最近生成的在 LRU 的末端
+        for row in reversed(rows):
+            self._remember(row.image_path, json.loads(row.variants))
+        return len(rows)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._tasks),
+            "generated": self.generated,
+            "failed": self.failed,
+            "cached": len(self._cache),
+            "cache_misses": self.cache_misses,
+            "loaded": self.loaded,
+        }
+
+
+thumbnail_pipeline = ThumbnailPipeline(
+    image_store,
+    parse_sizes(settings.THUMBNAIL_SIZES),
+    settings.THUMBNAIL_WORKERS,
+    settings.THUMBNAIL_CACHE_SIZE,
+    settings.THUMBNAIL_ENABLED,
+)
+
+
+def add_thumbnails(items: List[dict], image_field: str, selected: Optional[FrozenSet[str]] = None) -> List[dict]:
+    """组装列表响应前给每一行填上 thumbnails（读缩略图缓存，缓存中没有的在后台加载）
+
+    items 中的图片文件名在 image_field 字段；按 fields 只返回部分字段且不包含 thumbnails 时不查缓存。
+    """
+    if selected is None or "thumbnails" in selected:
+        for item in items:
+            item["thumbnails"] = thumbnail_pipeline.variants(item.get(image_field))
+    return items
@@ -108,6 +108,7 @@ const productAPI = {
         if (params.min_price) query.append('min_price', params.min_price);
         if (params.max_price) query.append('max_price', params.max_price);
         if (params.sort_by) query.append('sort_by', params.sort_by);
+        if (params.cursor !== undefined) query.append('cursor', params.cursor);
         if (params.page) query.append('page', params.page);
         const pageSize = params.page_size || 10;
         query.append('page_size', pageSize);
@@ -186,6 +187,7 @@ const transactionAPI = {
         if (params.category_id) query.append('category_id', params.category_id);
         if (params.start_date) query.append('start_date', params.start_date);
         if (params.end_date) query.append('end_date', params.end_date);
+        if (params.cursor !== undefined) query.append('cursor', params.cursor);
         if (params.page) query.append('page', params.page);
         if (params.page_size) query.append('page_size', params.page_size);
         
@@ -197,6 +199,19 @@ const transactionAPI = {
 };
 
 // 工具函数
+// 商品图片地址：优先使用不小于 size 的 WebP 缩略图，缩略图还没生成时使用原图
+function getProductImageUrl(product, size = 400) {
+    const thumbnails = product.thumbnails;
+    if (thumbnails) {
+        const sizes = Object.keys(thumbnails).map(Number).sort((a, b) => a - b);
+        const fit = sizes.find(s => s >= size) || sizes[sizes.length - 1];
+        if (fit && thumbnails[fit].webp) {
+            return `http://localhost:8000${thumbnails[fit].webp}`;
+        }
+    }
+    return `http://localhost:8000/api/uploads/${product.image_path}`;
+}
+
 function showAlert(message, type = 'danger') {
     const alertHtml = `
         <div class="alert alert-${type} alert-dismissible fade show" role="alert">
@@ -263,6 +278,7 @@ function getTransactionStatusText(status) {
     switch (status) {
         case 0: return '未支付';
         case 1: return '已成交';
+        case 2: return '已过期';
         default: return '未知状态';
     }
 }
@@ -272,6 +288,7 @@ function getTransactionStatusClass(status) {
     switch (status) {
         case 0: return 'status-pending';
         case 1: return 'status-completed';
+        case 2: return 'status-expired';
         default: return '';
     }
 }
@@ -316,7 +333,7 @@ function generateProductCard(product) {
                     <!-- 左侧图片区域 -->
                     <div class="col-md-3 position-relative">
                         ${product.image_path ?
-                            `<img src="http://localhost:8000/api/uploads/${product.image_path}?t=${new Date(product.updated_at || product.created_at).getTime()}"
+                            `<img src="${getProductImageUrl(product, 200)}"
                                  class="card-img product-img w-100"
                                  style="
                                      height: 100px;
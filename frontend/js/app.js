@@ -328,7 +328,7 @@ async function showProductDetail(productId) {
             <div class="row">
                 <div class="col-md-6">
                     ${product.image_path ? 
-                        `<img src="http://localhost:8000/api/uploads/${product.image_path}"  class="img-fluid rounded" alt="${product.name}" onerror="this.src='data:image/svg+xml,%3Csvg xmlns=\'http://www.w3.org/2000/svg\' width=\'400\' height=\'400\'%3E%3Crect fill=\'%23f0f0f0\' width=\'400\' height=\'400\'/%3E%3Ctext fill=\'%23999\' x=\'50%25\' y=\'50%25\' dominant-baseline=\'middle\' text-anchor=\'middle\'%3E暂无图片%3C/text%3E%3C/svg%3E'">` :
+                        `<img src="${getProductImageUrl(product, 800)}"  class="img-fluid rounded" alt="${product.name}" onerror="this.src='data:image/svg+xml,%3Csvg xmlns=\'http://www.w3.org/2000/svg\' width=\'400\' height=\'400\'%3E%3Crect fill=\'%23f0f0f0\' width=\'400\' height=\'400\'/%3E%3Ctext fill=\'%23999\' x=\'50%25\' y=\'50%25\' dominant-baseline=\'middle\' text-anchor=\'middle\'%3E暂无图片%3C/text%3E%3C/svg%3E'">` :
                         `<div class="bg-light p-5 text-center rounded">暂无图片</div>`
                     }
                 </div>
@@ -544,14 +544,7 @@ async function submitEditProductForm() {
         // 关闭模态框并刷新列表
         bootstrap.Modal.getInstance(document.getElementById('editProductModal')).hide();
         showAlert('商品更新成功！', 'success');
-        // 强制刷新图片（添加时间戳防止缓存）
-        if (imagePath) {
-            const imgElements = document.querySelectorAll(`img[src*="${productId}"]`);
-            imgElements.forEach(img => {
-                const src = img.src.split('?')[0];
-                img.src = `${src}?t=${new Date().getTime()}`;
-            });
-        }
+        // 新图片的文件名是内容哈希，URL 随内容变化，刷新列表即可显示新图片
         loadMyProducts(currentProductPage);
     } catch (error) {
         showAlert(error.message);